@@ -0,0 +1,167 @@
+from nnsim.simulator import Simulator
+from .tb import WSArchTB, aggregate_stats
+
+# Only the ws_2d datapath has an analytical model, the other variants are
+# left to the cycle-accurate run.
+
+# Clock of the array, to turn estimated cycles into time
+CLOCK_MHZ = 200
+# Depth of the PE channel banks in WSArch
+PE_CHN_DEPTH = 32
+
+def estimate_raw_stats(image_size, filter_size, in_chn, out_chn,
+        arr_x, arr_y, chn_per_word):
+    # Closed-form counts for one layer mapped onto the array in a single
+    # pass: in_chn across the PE rows and out_chn across the PE columns.
+    # Returns the raw_stats of every module that WSArchTB aggregates.
+    if in_chn != arr_y or out_chn != arr_x:
+        raise ValueError("ws_2d maps in_chn onto arr_y and out_chn onto arr_x")
+    if arr_x % chn_per_word or arr_y % chn_per_word:
+        raise ValueError("Array dimensions must be a multiple of chn_per_word")
+
+    fmap_per_iteration = image_size[0]*image_size[1]
+    num_iteration = filter_size[0]*filter_size[1]
+    num_weights = num_iteration*arr_x*arr_y
+
+    # Every output pixel of every iteration passes through each PE column
+    num_ifmap = num_iteration*fmap_per_iteration*arr_y
+    num_psum = num_iteration*fmap_per_iteration*arr_x
+    num_mac = num_iteration*fmap_per_iteration*arr_x*arr_y
+
+    deserializer = {'dram_rd' : fmap_per_iteration*(arr_y + arr_x) + num_weights}
+    serializer = {'dram_wr' : fmap_per_iteration*arr_x}
+    # GLBs of the size WSArchTB gives them
+    ifmap_glb = {'size' : (fmap_per_iteration*arr_y//chn_per_word,
+                           chn_per_word),
+                 'ifmap_glb_rd' : num_ifmap,
+                 'ifmap_glb_wr' : fmap_per_iteration*arr_y}
+    # Biases are written once, then every iteration but the last writes back
+    psum_glb = {'size' : (fmap_per_iteration*arr_x//chn_per_word,
+                          chn_per_word),
+                'psum_glb_rd' : num_psum, 'psum_glb_wr' : num_psum}
+    weights_glb = {'size' : (0, 0), 'weight_glb_rd' : 0, 'weight_glb_wr' : 0}
+    filter_noc = {'noc_multicast' : num_weights}
+    ifmap_noc = {'noc_multicast' : num_ifmap}
+    psum_rd_noc = {'noc_multicast' : num_psum}
+    psum_wr_noc = {'noc_multicast' : num_psum}
+    # The first use of a weight comes from the filter channel, the rest are
+    # RF reads. Only PEs below the first row pop psums from a channel.
+    pe_array = {'pe_mac' : num_mac,
+                'pe_chn_pop' : num_mac - num_psum,
+                'pe_chn_push' : num_mac,
+                'pe_rf_rd' : num_mac - num_weights,
+                'pe_rf_wr' : num_weights}
+
+    return [deserializer, serializer, ifmap_glb, psum_glb, weights_glb,
+            filter_noc, ifmap_noc, psum_rd_noc, psum_wr_noc, pe_array]
+
+def estimate_cycles(image_size, filter_size, in_chn, out_chn,
+        arr_x, arr_y, chn_per_word):
+    # Replays the pipeline of WSArchTB (default GLB latency) word by word
+    # instead of tick by tick: every stream moves one word per cycle and
+    # each word waits for the words it depends on. This reproduces the
+    # simulated cycle count exactly on the shapes in the tests.
+    in_sets = arr_y//chn_per_word
+    out_sets = arr_x//chn_per_word
+    fmap_per_iteration = image_size[0]*image_size[1]
+    num_iteration = filter_size[0]*filter_size[1]
+
+    # The input channel carries one word per cycle while the GLBs are
+    # loaded with ifmaps and biases, then the weights
+    load = fmap_per_iteration*(in_sets + out_sets)
+
+    # Issue cycles of the ifmap GLB reads (zero padding too takes a slot)
+    # and of the psum GLB reads, one word per cycle each. The ifmaps can be
+    # read the cycle after the last one is written, the psums after the
+    # load.
+    ifmap_rd = {}
+    last_ifmap_rd = load - out_sets + 1
+    last_psum_rd = load + 1
+    # Cycle the psum of a column set could leave the last PE row, and the
+    # cycle it is pushed to the psum GLB/output, one word per cycle
+    ready = {}
+    psum_wr = {}
+    last_psum_wr = None
+
+    for iteration in range(num_iteration):
+        for pixel in range(fmap_per_iteration):
+            n = iteration*fmap_per_iteration + pixel
+            for in_set in range(in_sets):
+                cycle = last_ifmap_rd + 1
+                if n >= PE_CHN_DEPTH:
+                    # Row in_set*chn_per_word of every column has to pop
+                    # the pixel a full channel earlier
+                    cycle = max(cycle, max(ready[n - PE_CHN_DEPTH, out_set]
+                        - arr_y + in_set*chn_per_word
+                        for out_set in range(out_sets)) - 1)
+                ifmap_rd[n, in_set] = last_ifmap_rd = cycle
+            for out_set in range(out_sets):
+                cycle = last_psum_rd + 1
+                if iteration > 0:
+                    # The psum of the iteration before has to be written
+                    cycle = max(cycle, psum_wr[n - fmap_per_iteration,
+                        out_set] + 2)
+                if n >= PE_CHN_DEPTH:
+                    cycle = max(cycle, ready[n - PE_CHN_DEPTH, out_set]
+                        - arr_y - 1)
+                last_psum_rd = cycle
+                # Reads reach the first PE row three cycles after issue.
+                # The weights arrive in order after the load, the last
+                # column of a set gates it.
+                col = (out_set + 1)*chn_per_word - 1
+                fire = None
+                for in_set in range(in_sets):
+                    weight = load + (iteration*arr_x + col)*in_sets + \
+                            in_set + 4
+                    start = max(ifmap_rd[n, in_set] + 3, weight)
+                    if in_set == 0:
+                        start = max(start, last_psum_rd + 3)
+                    # The psum descends one PE row per cycle
+                    start -= in_set*chn_per_word
+                    fire = start if fire is None else max(fire, start)
+                ready[n, out_set] = fire + arr_y
+                if last_psum_wr is None:
+                    last_psum_wr = ready[n, out_set]
+                else:
+                    last_psum_wr = max(last_psum_wr + 1, ready[n, out_set])
+                psum_wr[n, out_set] = last_psum_wr
+
+    # Through the serializer and the stimulus to the finish check
+    return last_psum_wr + 2
+
+def cycles_to_us(cycles, clock_mhz=CLOCK_MHZ):
+    return cycles/float(clock_mhz)
+
+def estimate(image_size, filter_size, in_chn, out_chn, arr_x, arr_y,
+        chn_per_word):
+    raw_stats_list = estimate_raw_stats(image_size, filter_size, in_chn,
+            out_chn, arr_x, arr_y, chn_per_word)
+    cycles = estimate_cycles(image_size, filter_size, in_chn, out_chn,
+            arr_x, arr_y, chn_per_word)
+    return aggregate_stats(raw_stats_list), cycles
+
+def validate(image_size, filter_size, in_chn, out_chn, arr_x, arr_y,
+        chn_per_word, compiled=True):
+    # Cycle-accurate reference for estimate(). WSArchTB sizes the array
+    # from the channel counts.
+    if in_chn != arr_y or out_chn != arr_x:
+        raise ValueError("ws_2d maps in_chn onto arr_y and out_chn onto arr_x")
+
+    tb = WSArchTB(image_size, filter_size, in_chn, out_chn, chn_per_word)
+    sim = Simulator(tb, False, compiled)
+    sim.reset()
+    sim.run(None)
+
+    raw_stats = aggregate_stats([sub_module.raw_stats
+        for sub_module in tb.dut.sub_modules + tb.stimulus.sub_modules])
+    return raw_stats, sim.clk_ticks
+
+if __name__ == "__main__":
+    import sys
+    layer = ((4, 4), (3, 3), 4, 8, 8, 4, 4)
+    stats, cycles = estimate(*layer)
+    print("estimate: cyc %d (%.2f us)" % (cycles, cycles_to_us(cycles)),
+            stats)
+    if '--validate' in sys.argv:
+        ref_stats, ref_cycles = validate(*layer)
+        print("simulation: cyc %d" % ref_cycles, ref_stats)
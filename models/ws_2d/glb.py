@@ -1,9 +1,11 @@
 from nnsim.module import Module
-from nnsim.ram import SRAM, RD, WR
-from nnsim.channel import Channel
+from nnsim.ram import SRAM, BankedSRAM, RequestTracker, RD, WR
+
+import numpy as np
 
 class IFMapGLB(Module):
-    def instantiate(self, wr_chn, rd_chn, glb_depth, chn_per_word):
+    def instantiate(self, wr_chn, rd_chn, glb_depth, chn_per_word, latency=1,
+            outstanding=2):
         self.wr_chn = wr_chn
         self.rd_chn = rd_chn
         self.chn_per_word = chn_per_word
@@ -13,8 +15,9 @@ class IFMapGLB(Module):
         self.raw_stats = {'size' : (glb_depth, chn_per_word), 'ifmap_glb_rd': 0, 'ifmap_glb_wr': 0}
 
 
-        self.sram = SRAM(glb_depth, chn_per_word)
-        self.last_read = Channel(3)
+        self.sram = SRAM(glb_depth, chn_per_word, latency=latency)
+        self.tracker = RequestTracker(self.sram, outstanding)
+        self.zero_word = np.zeros(chn_per_word, dtype=self.sram.data.dtype)
 
         self.image_size = (0, 0)
         self.filter_size = (0, 0)
@@ -34,6 +37,9 @@ class IFMapGLB(Module):
         self.fmap_sets = fmap_sets
         self.fmap_per_iteration = fmap_per_iteration
 
+        self.curr_set = 0
+        self.fmap_idx = 0
+        self.iteration = 0
         self.read_ctr = 0
 
     def tick(self):
@@ -63,8 +69,9 @@ class IFMapGLB(Module):
                     self.fmap_idx = 0
                     self.wr_done = True
         else:
-            # Read from GLB and deal with SRAM latency
-            if self.rd_chn.vacancy(1) and self.iteration < num_iteration:
+            # Read from GLB, the tracker covers the SRAM latency
+            if self.iteration < num_iteration and \
+                    self.tracker.can_issue(self.rd_chn):
 
                 self.read_ctr += 1
                 #print("ifmap glb read ctr ", self.read_ctr)
@@ -75,14 +82,13 @@ class IFMapGLB(Module):
                 if (ifmap_x < 0) or (ifmap_x >= self.image_size[0]) or \
                         (ifmap_y < 0) or (ifmap_y >= self.image_size[1]):
                     # print("ifmap req zero: iter, fmap idx ", self.iteration, self.fmap_idx)
-                    self.last_read.push(True)
+                    self.tracker.skip(self.zero_word)
                 else:
                     fmap_idx = (ifmap_y*self.image_size[0]) + ifmap_x
                     addr = self.fmap_sets*fmap_idx + self.curr_set
                     # print("addr fmap idx, addr: ", fmap_idx, addr)
                     #print("ifmap req glb: iter, fmap idx, addr ", self.iteration, self.fmap_idx, addr)
-                    self.sram.request(RD, addr)
-                    self.last_read.push(False)
+                    self.tracker.read(addr)
                 self.curr_set += 1
                 if self.curr_set == self.fmap_sets:
                     self.curr_set = 0
@@ -92,17 +98,16 @@ class IFMapGLB(Module):
                     self.fmap_idx = 0
                     self.iteration += 1
 
-            # Process the last read sent to the GLB SRAM
-            if self.last_read.valid():
-                is_zero = self.last_read.pop()
-                data = [0]*self.chn_per_word if is_zero else \
-                        [e for e in self.sram.response()]
+            # Pass on the oldest read once it is back
+            if self.tracker.valid():
+                data = self.tracker.pop()
                 #print("ifmap rd glb", data, self.iteration)
                 self.rd_chn.push(data)
                 self.raw_stats['ifmap_glb_rd'] += len(data)
 
 class PSumGLB(Module):
-    def instantiate(self, dram_wr_chn, noc_wr_chn, rd_chn, glb_depth, chn_per_word):
+    def instantiate(self, dram_wr_chn, noc_wr_chn, rd_chn, glb_depth, chn_per_word,
+            banks=None, interleave='low', latency=1, outstanding=2):
         self.dram_wr_chn = dram_wr_chn
         self.noc_wr_chn = noc_wr_chn
         self.rd_chn = rd_chn
@@ -112,8 +117,15 @@ class PSumGLB(Module):
         self.stat_type = 'show'
         self.raw_stats = {'size' : (glb_depth, chn_per_word), 'psum_glb_rd': 0, 'psum_glb_wr': 0}
 
-        self.sram = SRAM(glb_depth, chn_per_word, nports=2)
-        self.last_read = Channel(3)
+        # Reads (port 0) and writes (port 1) go to the same cycle. With banks
+        # they only do if they hit different banks, a conflicting write
+        # waits for the next cycle.
+        if banks is None:
+            self.sram = SRAM(glb_depth, chn_per_word, nports=2, latency=latency)
+        else:
+            self.sram = BankedSRAM(glb_depth, chn_per_word, banks, interleave,
+                    nports=2, latency=latency)
+        self.tracker = RequestTracker(self.sram, outstanding, port=0)
 
         self.filter_size = (0, 0)
         self.fmap_sets = 0
@@ -126,6 +138,8 @@ class PSumGLB(Module):
         self.wr_set = 0
         self.fmap_wr_idx = 0
         self.wr_done = False
+        self.rd_ctr = 0
+        self.noc_wr_ctr = 0
 
     def configure(self, filter_size, fmap_sets, fmap_per_iteration):
         self.wr_done = False
@@ -141,9 +155,12 @@ class PSumGLB(Module):
         self.wr_set = 0
         self.fmap_wr_idx = 0
         self.wr_done = False
+        self.rd_ctr = 0
+        self.noc_wr_ctr = 0
 
     def tick(self):
         num_iteration = self.filter_size[0]*self.filter_size[1]
+        psums_per_iteration = self.fmap_sets*self.fmap_per_iteration
 
         if not self.wr_done:
             # Write to GLB
@@ -151,7 +168,7 @@ class PSumGLB(Module):
                 data = self.dram_wr_chn.pop()
                 self.raw_stats['psum_glb_wr'] += len(data)
                 # print "psum_glb wr"
-                # Write ifmap to glb
+                # Write ifmap to glb, nothing else accesses the SRAM yet
                 addr = self.fmap_sets*self.fmap_wr_idx + self.wr_set
                 self.wr_set += 1
                 self.sram.request(WR, addr, data, port=1)
@@ -165,40 +182,20 @@ class PSumGLB(Module):
                     self.wr_done = True
                 #print ("psum orig write, fmap_sets, fmap_wr_idx, wr_set, addr, data: ",self.fmap_sets, self.fmap_wr_idx, self.wr_set, addr, data)
         else:
-            # Read from GLB and deal with SRAM latency
-            # print self.rd_chn.vacancy(1), self.rd_chn.rd_ptr.rd(), self.rd_chn.wr_ptr.rd()
-            if self.rd_chn.vacancy(1) and self.iteration < num_iteration:
-                addr = self.fmap_sets*self.fmap_rd_idx + self.rd_set
-                #print("psum req glb", self.iteration, self.fmap_rd_idx, self.rd_set)
-                self.sram.request(RD, addr, port=0)
-                self.last_read.push(False)
-                self.rd_set += 1
-
-                if self.rd_set == self.fmap_sets:
-                    self.rd_set = 0
-                    self.fmap_rd_idx += 1
-                if self.fmap_rd_idx == self.fmap_per_iteration:
-                    self.fmap_rd_idx = 0
-                    self.iteration += 1
-
-            # Process the last read sent to the GLB SRAM
-            if self.last_read.valid():
-                is_zero = self.last_read.pop()
-                data = [0]*self.chn_per_word if is_zero else \
-                        [e for e in self.sram.response()]
-                self.rd_chn.push(data)
-                self.raw_stats['psum_glb_rd'] += len(data)
-                #print("psum rd glb: data", data)
-
-            if self.noc_wr_chn.valid():
+            # Updated psums from the PE array go first: a read stalled by a
+            # bank conflict only delays the array, a stalled write could let
+            # the next iteration read a stale psum
+            written = self.noc_wr_ctr
+            addr = self.fmap_sets*self.fmap_wr_idx + self.wr_set
+            if self.noc_wr_chn.valid() and \
+                    self.sram.request(WR, addr, self.noc_wr_chn.peek(), port=1):
                 data = self.noc_wr_chn.pop()
                 #print("psum_to_glb: ", self.fmap_wr_idx, self.wr_set, data)
 
                 self.raw_stats['psum_glb_wr'] += len(data)
-                addr = self.fmap_sets*self.fmap_wr_idx + self.wr_set
                 #print("noc psum wr glb", self.fmap_wr_idx, self.wr_set, data)
+                self.noc_wr_ctr += 1
                 self.wr_set += 1
-                self.sram.request(WR, addr, data, port=1)
                 if self.wr_set == self.fmap_sets:
                     self.wr_set = 0
                     self.fmap_wr_idx += 1
@@ -207,6 +204,33 @@ class PSumGLB(Module):
                     #self.sram.dump()
                     self.fmap_wr_idx = 0
 
+            # Read from GLB, the tracker covers the SRAM latency. A psum of
+            # the next iteration is only read once the array wrote it back
+            # in an earlier cycle (the PE psum channels are deep enough for
+            # the reads to run ahead when weights arrive late).
+            addr = self.fmap_sets*self.fmap_rd_idx + self.rd_set
+            if self.iteration < num_iteration and \
+                    self.rd_ctr - psums_per_iteration < written and \
+                    self.tracker.can_issue(self.rd_chn) and \
+                    self.tracker.read(addr):
+                #print("psum req glb", self.iteration, self.fmap_rd_idx, self.rd_set)
+                self.rd_ctr += 1
+                self.rd_set += 1
+
+                if self.rd_set == self.fmap_sets:
+                    self.rd_set = 0
+                    self.fmap_rd_idx += 1
+                if self.fmap_rd_idx == self.fmap_per_iteration:
+                    self.fmap_rd_idx = 0
+                    self.iteration += 1
+
+            # Pass on the oldest read once it is back
+            if self.tracker.valid():
+                data = self.tracker.pop()
+                self.rd_chn.push(data)
+                self.raw_stats['psum_glb_rd'] += len(data)
+                #print("psum rd glb: data", data)
+
 class WeightsGLB(Module):
     def instantiate(self, wr_chn, rd_chn):
         self.wr_chn = wr_chn
@@ -0,0 +1,185 @@
+import numpy as np
+
+from nnsim.module import Module
+from nnsim.channel import Channel
+from nnsim.simulator import Simulator
+from nnsim.layers import open_layer
+from nnsim.passes import plan_passes
+from .ws import WSArch
+from .stimulus import Stimulus
+from .tb import aggregate_stats
+
+# Whole-network driver. Every conv layer is tiled onto one fixed WSArch the
+# way ws_2d_passes does by hand: output channel groups of arr_x filters in
+# the outer loop, input channel groups of arr_y channels in the inner loop,
+# with the first input pass seeded by the bias and every later one by the
+# partial sums of the pass before. The module tree is instantiated once and
+# only reset and reconfigured between passes.
+
+def channel_slice(tensor, axis, lo, size):
+    # tensor[..., lo:lo+size, ...] along axis, zero padded up to size
+    index = [ slice(None) ]*tensor.ndim
+    index[axis] = slice(lo, lo + size)
+    part = np.asarray(tensor[tuple(index)]).astype(np.int64)
+    pad = [ (0, 0) ]*tensor.ndim
+    pad[axis] = (0, size - part.shape[axis])
+    return np.pad(part, pad, 'constant')
+
+class NetworkTB(Module):
+    def instantiate(self, arr_x=8, arr_y=4, chn_per_word=4,
+            image_size=(4, 4), batched_pe=False):
+        # image_size is the largest ifmap of the network and sizes the GLBs
+        self.name = 'tb'
+        self.arr_x = arr_x
+        self.arr_y = arr_y
+        self.chn_per_word = chn_per_word
+        self.image_size = image_size
+
+        self.input_chn = Channel()
+        self.output_chn = Channel()
+
+        self.stat_type = 'show'
+        self.raw_stats = {}
+
+        ifmap_glb_depth = image_size[0]*image_size[1]*arr_y//chn_per_word
+        psum_glb_depth = image_size[0]*image_size[1]*arr_x//chn_per_word
+
+        self.stimulus = Stimulus(self.arr_x, self.arr_y, self.chn_per_word,
+            self.input_chn, self.output_chn)
+        self.dut = WSArch(self.arr_x, self.arr_y, self.input_chn,
+                self.output_chn, self.chn_per_word, ifmap_glb_depth,
+                psum_glb_depth, batched_pe)
+
+        self.tensors = None
+        self.ofmap = None
+        self.configuration_done = True
+
+    def load(self, ifmap, weights, bias):
+        # Queue one pass; it is configured on the first tick after reset
+        self.tensors = (ifmap, weights, bias)
+        self.configuration_done = False
+
+    def tick(self):
+        if not self.configuration_done:
+            ifmap, weights, bias = self.tensors
+            self.ofmap = self.stimulus.load(ifmap, weights, bias)
+            self.dut.configure(ifmap.shape[:2], weights.shape[:2],
+                    self.arr_y, self.arr_x)
+            self.configuration_done = True
+
+    def totals(self):
+        return aggregate_stats([sub_module.raw_stats
+            for sub_module in self.dut.sub_modules + self.stimulus.sub_modules])
+
+class Network(object):
+    def __init__(self, arr_x=8, arr_y=4, chn_per_word=4, image_size=(4, 4),
+            batched_pe=False, compiled=True):
+        self.tb = NetworkTB(arr_x, arr_y, chn_per_word, image_size,
+                batched_pe)
+        self.sim = Simulator(self.tb, False, compiled)
+
+    def run_pass(self, ifmap, weights, bias, nticks=None):
+        self.sim.reset()
+        self.tb.load(ifmap, weights, bias)
+        self.sim.run(nticks)
+        return self.tb.ofmap, self.sim.clk_ticks, self.sim.finish_msg
+
+    def run_layer(self, ifmap, weights, bias, nticks=None):
+        # Returns the ofmap, the cycles over all passes and the first
+        # failing Finish message (or "Success")
+        arr_x, arr_y = self.tb.arr_x, self.tb.arr_y
+        image_size = self.tb.image_size
+        if ifmap.shape[0]*ifmap.shape[1] > image_size[0]*image_size[1]:
+            raise ValueError("A %dx%d ifmap does not fit GLBs sized for %dx%d"
+                    % (ifmap.shape[0], ifmap.shape[1], image_size[0],
+                        image_size[1]))
+        in_chn, out_chn = weights.shape[2], weights.shape[3]
+        ofmap = np.zeros(ifmap.shape[:2] + (out_chn,), dtype=np.int64)
+        cycles = 0
+        result = "Success"
+        psum = None
+        for out_lo, in_lo in plan_passes(in_chn, out_chn, arr_x, arr_y):
+            if in_lo == 0:
+                psum = channel_slice(bias, 0, out_lo, arr_x)
+            w = channel_slice(channel_slice(weights, 2, in_lo, arr_y), 3,
+                    out_lo, arr_x)
+            psum, ticks, msg = self.run_pass(
+                    channel_slice(ifmap, 2, in_lo, arr_y), w, psum, nticks)
+            cycles += ticks
+            if msg != "Success" and result == "Success":
+                result = msg if msg is not None else "Timeout"
+            if msg is None:
+                break
+            ofmap[:, :, out_lo:out_lo + arr_x] = psum[:, :,
+                    :out_chn - out_lo]
+        return ofmap, cycles, result
+
+    def run(self, ifmap, layers, activation=None, nticks=None):
+        # layers: [(name, weights, bias), ...]. Each ofmap, passed through
+        # activation if given, is the next layer's ifmap. Returns one row
+        # per layer plus a 'total' row with cycles and aggregate stats.
+        rows = []
+        total = { 'layer' : 'total', 'cycles' : 0, 'result' : "Success" }
+        for name, weights, bias in layers:
+            if ifmap.shape[2] != weights.shape[2]:
+                raise ValueError("Layer %s: ifmap has %d channels, weights "
+                        "expect %d" % (name, ifmap.shape[2], weights.shape[2]))
+            before = self.tb.totals()
+            ofmap, cycles, result = self.run_layer(ifmap, weights, bias,
+                    nticks)
+            after = self.tb.totals()
+
+            row = { 'layer' : name, 'image_size' : ifmap.shape[:2],
+                    'filter_size' : weights.shape[:2],
+                    'in_chn' : weights.shape[2], 'out_chn' : weights.shape[3],
+                    'passes' : len(plan_passes(weights.shape[2],
+                        weights.shape[3], self.tb.arr_x, self.tb.arr_y)),
+                    'cycles' : cycles, 'result' : result }
+            row.update({ k : after[k] - before[k] for k in after })
+            rows.append(row)
+
+            total['cycles'] += cycles
+            if total['result'] == "Success":
+                total['result'] = result
+            if result != "Success":
+                break
+            ifmap = ofmap if activation is None else activation(ofmap)
+        total.update(self.tb.totals())
+        rows.append(total)
+        return rows
+
+def load_network(layers):
+    # Manifest layers (nnsim.layers) as run() arguments: the first layer's
+    # ifmap feeds the network, later layers only contribute their filters
+    tensors = [ open_layer(layer) for layer in layers ]
+    return tensors[0][0], [ (layer['name'], weights, bias)
+            for layer, (_, weights, bias) in zip(layers, tensors) ]
+
+def relu(ofmap, shift=0):
+    return np.maximum(ofmap, 0) >> shift
+
+if __name__ == "__main__":
+    # python -m models.ws_2d.network net.json [--arr-x 8 --arr-y 4]
+    import argparse
+    import contextlib
+    import os
+    import sys
+    from nnsim.layers import load_manifest
+    from nnsim.sweep import write_csv
+    parser = argparse.ArgumentParser()
+    parser.add_argument('manifest')
+    parser.add_argument('--arr-x', type=int, default=8)
+    parser.add_argument('--arr-y', type=int, default=4)
+    parser.add_argument('--chn-per-word', type=int, default=4)
+    parser.add_argument('--shift', type=int, default=0,
+            help="ReLU and right shift applied between layers")
+    args = parser.parse_args()
+
+    ifmap, layers = load_network(load_manifest(args.manifest))
+    network = Network(args.arr_x, args.arr_y, args.chn_per_word,
+            ifmap.shape[:2])
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        rows = network.run(ifmap, layers,
+                lambda ofmap: relu(ofmap, args.shift))
+    write_csv(rows, sys.stdout)
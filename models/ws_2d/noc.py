@@ -1,5 +1,7 @@
 from nnsim.module import Module
 
+import numpy as np
+
 class WeightsNoC(Module):
     def instantiate(self, rd_chn, wr_chns, chn_per_word):
         self.chn_per_word = chn_per_word
@@ -27,18 +29,14 @@ class WeightsNoC(Module):
     def tick(self):
         # Dispatch filters to PE columns. (PE is responsible for pop)
         if self.rd_chn.valid():
-            vacancy = True
             ymin = self.curr_set*self.chn_per_word
             ymax = ymin + self.chn_per_word
-            for y in range(ymin, ymax):
-                vacancy = vacancy and self.wr_chns[y][self.curr_filter].vacancy()
-            if vacancy:
+            group = (slice(ymin, ymax), self.curr_filter)
+            if self.wr_chns.all_vacant(group):
                 data = self.rd_chn.pop()
                 # print("filter_to_pe: ", self.curr_filter, data)
                 self.raw_stats['noc_multicast'] += len(data)
-                for y in range(ymin, ymax):
-                    # print("writing weights to y, curr_filter, data: ", y, self.curr_filter, data[y])
-                    self.wr_chns[y][self.curr_filter].push(data[y])
+                self.wr_chns.multicast_push(group, data)
 
                 self.curr_set += 1
                 if self.curr_set == self.filter_sets:
@@ -76,19 +74,14 @@ class IFMapNoC(Module):
             # Dispatch ifmap read if space is available and not at edge
             ymin = self.curr_set*self.chn_per_word
             ymax = ymin + self.chn_per_word
-            vacancy = True
-            for y in range(ymin, ymax):
-                for x in range(self.arr_x):
-                    vacancy = vacancy and self.wr_chns[y][x].vacancy()
-
-            if vacancy:
+            group = (slice(ymin, ymax), slice(0, self.arr_x))
+            if self.wr_chns.all_vacant(group):
                 data = self.rd_chn.pop()
                 self.raw_stats['noc_multicast'] += len(data)
                 #print("ifmap_to_pe", ymin, ymax, data)
-                for y in range(ymin, ymax):
-                    for x in range(self.arr_x):
-                        #print("writing ifmap to y, x, data: ", y, x, data[y-ymin])
-                        self.wr_chns[y][x].push(data[y-ymin])
+                # Each word element goes to every PE in its row
+                self.wr_chns.multicast_push(group,
+                        np.reshape(data, (-1, 1)))
 
                 self.curr_set += 1
                 if self.curr_set == self.ifmap_sets:
@@ -122,17 +115,12 @@ class PSumRdNoC(Module):
             # Dispatch ifmap read if space is available and not at edge
             xmin = self.curr_set*self.chn_per_word
             xmax = xmin + self.chn_per_word
-            vacancy = True
-            for x in range(xmin, xmax):
-                vacancy = vacancy and self.wr_chns[x].vacancy()
-
-            if vacancy:
+            group = slice(xmin, xmax)
+            if self.wr_chns.all_vacant(group):
                 data = self.rd_chn.pop()
                 self.raw_stats['noc_multicast'] += len(data)
                 # print("psum_to_pe", xmin, xmax, data)
-                for x in range(xmin, xmax):
-                    # print("writing psum to x, data: ", x, data[x-xmin])
-                    self.wr_chns[x].push(data[x-xmin])
+                self.wr_chns.multicast_push(group, data)
 
                 self.curr_set += 1
                 if self.curr_set == self.psum_sets:
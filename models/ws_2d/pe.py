@@ -2,6 +2,8 @@ from nnsim.module import Module, HWError
 from nnsim.reg import Reg
 from nnsim.channel import Channel
 
+import numpy as np
+
 
 class PE(Module):
     def instantiate(self, loc_x, loc_y,
@@ -62,3 +64,72 @@ class PE(Module):
                     self.raw_stats['pe_rf_rd'] -= 1 # weight pop -> not an rf read for first use
                     self.raw_stats['pe_rf_wr'] += 1
                     self.iteration += 1
+
+class PEArray(Module):
+    # Batched model of the whole arr_y x arr_x PE grid, cycle-equivalent to
+    # one PE per location. Controller state is held in NumPy arrays and
+    # every PE that can fire this cycle does so in one vectorized step.
+    # Channels must be ChannelBanks shaped like the array, with the psum
+    # bank having one extra row (row y feeds PE row y, row y+1 takes its
+    # output).
+    def instantiate(self, arr_x, arr_y,
+            ifmap_chns, filter_chns, psum_chns):
+        self.arr_x = arr_x
+        self.arr_y = arr_y
+
+        self.stat_type = 'aggregate'
+        self.raw_stats = {'pe_mac' : 0, 'pe_chn_pop' : 0, 'pe_chn_push' : 0, 'pe_rf_rd' : 0, 'pe_rf_wr' : 0}
+
+        # IO channels
+        self.ifmap_chns = ifmap_chns
+        self.filter_chns = filter_chns
+        self.psum_chns = psum_chns
+
+        # Fired PEs expressed as masks over the psum bank
+        self.psum_in_mask = np.zeros((arr_y+1, arr_x), dtype=bool)
+        self.psum_out_mask = np.zeros((arr_y+1, arr_x), dtype=bool)
+
+        # PE controller state (set by configure)
+        self.fmap_per_iteration = 0
+        self.num_iteration = 0
+
+        self.fmap_idx = None
+        self.iteration = None
+
+    def configure(self, fmap_per_iteration, num_iteration):
+        self.fmap_per_iteration = fmap_per_iteration
+        self.num_iteration = num_iteration
+
+        self.fmap_idx = np.zeros((self.arr_y, self.arr_x), dtype=np.int64)
+        self.iteration = np.zeros((self.arr_y, self.arr_x), dtype=np.int64)
+
+    def tick(self):
+        psum_occupancy = self.psum_chns.occupancy_nd
+        fire = (psum_occupancy[:-1] > 0) & self.ifmap_chns.valid_mask() & \
+                self.filter_chns.valid_mask() & \
+                (self.psum_chns.depth - psum_occupancy[1:] > 0)
+        if not fire.any():
+            return
+
+        self.psum_in_mask[:-1] = fire
+        self.psum_out_mask[1:] = fire
+        in_psum = self.psum_chns.masked_pop(self.psum_in_mask)
+        ifmap = self.ifmap_chns.masked_pop(fire)
+        weight = self.filter_chns.masked_peek(fire)
+        self.psum_chns.masked_push(self.psum_out_mask, in_psum+ifmap*weight)
+
+        num_fired = int(np.count_nonzero(fire))
+        self.raw_stats['pe_chn_pop'] += int(np.count_nonzero(fire[1:])) # getting in psum from PE above
+        self.raw_stats['pe_rf_rd'] += num_fired
+        self.raw_stats['pe_mac'] += num_fired
+        self.raw_stats['pe_chn_push'] += num_fired
+
+        self.fmap_idx[fire] += 1
+        done = fire & (self.fmap_idx == self.fmap_per_iteration)
+        if done.any():
+            num_done = int(np.count_nonzero(done))
+            self.fmap_idx[done] = 0
+            self.filter_chns.masked_free(done)
+            self.raw_stats['pe_rf_rd'] -= num_done # weight pop -> not an rf read for first use
+            self.raw_stats['pe_rf_wr'] += num_done
+            self.iteration[done] += 1
@@ -4,6 +4,44 @@ from nnsim.simulator import Finish
 
 import numpy as np
 
+def input_stream(ifmap, weights, bias, arr_x, arr_y, chn_per_word):
+    # DRAM word stream of one layer: every pixel's ifmap words followed by
+    # the bias words, then the filter words per filter position. Words are
+    # contiguous slices of the tensors, so ifmap/weights can be memory
+    # mapped and only the rows currently being sent are ever touched.
+    # bias may also hold per-pixel partial sums (H, W, out_chn) when a
+    # layer is split into several input channel passes.
+    in_sets = arr_y//chn_per_word
+    out_sets = arr_x//chn_per_word
+    image_size = ifmap.shape[:2]
+    filter_size = weights.shape[:2]
+
+    bias_words = None
+    if np.ndim(bias) == 1:
+        bias_words = np.reshape(bias[:out_sets*chn_per_word],
+                (out_sets, chn_per_word)).astype(np.int64)
+    for y in range(image_size[1]):
+        for x in range(image_size[0]):
+            pixel = np.reshape(ifmap[x, y, :in_sets*chn_per_word],
+                    (in_sets, chn_per_word)).astype(np.int64)
+            for word in pixel:
+                yield word
+            if np.ndim(bias) == 3:
+                bias_words = np.reshape(bias[x, y, :out_sets*chn_per_word],
+                        (out_sets, chn_per_word)).astype(np.int64)
+            for word in bias_words:
+                yield word
+
+    for f_y in range(filter_size[1]):
+        for f_x in range(filter_size[0]):
+            # (arr_x, in_sets, chn_per_word): one row per PE column
+            taps = weights[f_x, f_y, :in_sets*chn_per_word, :arr_x]
+            taps = np.reshape(np.transpose(taps),
+                    (arr_x, in_sets, chn_per_word)).astype(np.int64)
+            for words in taps:
+                for word in words:
+                    yield word
+
 class InputSerializer(Module):
     def instantiate(self, arch_input_chn, arr_x, arr_y, chn_per_word):
         # PE static configuration (immutable)
@@ -13,92 +51,28 @@ class InputSerializer(Module):
 
         self.arch_input_chn = arch_input_chn
 
-        self.ifmap = None
-        self.weights = None
-        self.bias = None
-
-        self.image_size = (0, 0)
-        self.filter_size = (0, 0)
+        self.stream = iter(())
+        self.next_word = None
 
-        self.ifmap_psum_done = True
         self.pass_done = Reg(False)
 
-        # State Counters
-        self.curr_set = 0
-        self.curr_filter = 0
-        self.iteration = 0
-        self.fmap_idx = 0
-
     def configure(self, ifmap, weights, bias, image_size, filter_size):
-        self.ifmap = ifmap
-        self.weights = weights
-        self.bias = bias
+        self.stream = input_stream(ifmap, weights, bias, self.arr_x,
+                self.arr_y, self.chn_per_word)
+        self.next_word = next(self.stream, None)
 
-        self.image_size = image_size
-        self.filter_size = filter_size
-
-        self.ifmap_psum_done = False
-        self.pass_done.wr(False)
+        self.pass_done.wr(self.next_word is None)
 
     def tick(self):
         if self.pass_done.rd():
             return
 
-        in_sets = self.arr_y//self.chn_per_word
-        out_sets = self.arr_x//self.chn_per_word
-        fmap_per_iteration = self.image_size[0]*self.image_size[1]
-        num_iteration = self.filter_size[0]*self.filter_size[1]
-
-        if not self.ifmap_psum_done:
-            if self.arch_input_chn.vacancy():
-                # print "input append"
-
-                x = self.fmap_idx % self.image_size[0]
-                y = self.fmap_idx // self.image_size[0]
-
-                if self.curr_set < in_sets:
-                    cmin = self.curr_set*self.chn_per_word
-                    cmax = cmin + self.chn_per_word
-                    # Write ifmap to glb
-                    data = np.array([ self.ifmap[x, y, c] for c in range(cmin, cmax) ])
-                else:
-                    cmin = (self.curr_set - in_sets)*self.chn_per_word
-                    cmax = cmin + self.chn_per_word
-                    # Write bias to glb
-                    data = np.array([ self.bias[c] for c in range(cmin, cmax) ])
-                self.arch_input_chn.push(data)
-                self.curr_set += 1
-
-                if self.curr_set == (in_sets+out_sets):
-                    self.curr_set = 0
-                    self.fmap_idx += 1
-                if self.fmap_idx == fmap_per_iteration:
-                    self.fmap_idx = 0
-                    self.ifmap_psum_done = True
-                    # print "---- Wrote inputs and biases ----"
-        else:
-            f_x = self.iteration % self.filter_size[0]
-            f_y = self.iteration // self.filter_size[0]
-
-            # Push filters to PE columns. (PE is responsible for pop)
-            if self.arch_input_chn.vacancy() and self.iteration < num_iteration:
-                cmin = self.curr_set*self.chn_per_word
-                cmax = cmin + self.chn_per_word
-                data = np.array([self.weights[f_x, f_y, c, self.curr_filter] \
-                        for c in range(cmin, cmax) ])
-
-                self.arch_input_chn.push(data)
-                self.curr_set += 1
-                if self.curr_set == in_sets:
-                    self.curr_set = 0
-                    self.curr_filter += 1
-                if self.curr_filter == self.arr_x:
-                    self.curr_filter = 0
-                    # print "---- Wrote weights iteration: %d ----" % self.iteration
-                    self.iteration += 1
-                if self.iteration == num_iteration:
-                    # print "---- Wrote all weights ----"
-                    self.pass_done.wr(True)
+        if self.arch_input_chn.vacancy():
+            self.arch_input_chn.push(self.next_word)
+            self.next_word = next(self.stream, None)
+            if self.next_word is None:
+                # print "---- Wrote all weights ----"
+                self.pass_done.wr(True)
 
 
 class InputDeserializer(Module):
@@ -188,7 +162,9 @@ class OutputDeserializer(Module):
         self.arch_output_chn = arch_output_chn
 
         self.ofmap = None
+        self.column = None
         self.reference = None
+        self.mismatch = False
 
         self.image_size = (0, 0)
 
@@ -197,9 +173,13 @@ class OutputDeserializer(Module):
 
         self.pass_done = Reg(False)
 
-    def configure(self, ofmap, reference, image_size):
+    def configure(self, ofmap, reference, image_size, out_chn):
+        # reference(y) gives output column y, which is checked as soon as
+        # it is complete. ofmap may be None to only check the outputs.
         self.ofmap = ofmap
+        self.column = np.zeros((image_size[0], out_chn)).astype(np.int64)
         self.reference = reference
+        self.mismatch = False
 
         self.image_size = image_size
 
@@ -208,6 +188,16 @@ class OutputDeserializer(Module):
 
         self.pass_done.wr(False)
 
+    def check_column(self, y):
+        if self.ofmap is not None:
+            self.ofmap[:, y] = self.column
+        reference = self.reference(y)
+        if not np.all(self.column == reference):
+            print(self.column)
+            print(reference)
+            print(self.column-reference)
+            self.mismatch = True
+
     def tick(self):
         if self.pass_done.rd():
             return
@@ -224,20 +214,18 @@ class OutputDeserializer(Module):
             if self.curr_set < out_sets:
                 cmin = self.curr_set*self.chn_per_word
                 cmax = cmin + self.chn_per_word
-                for c in range(cmin, cmax):
-                    self.ofmap[x, y, c] = data[c-cmin]
+                self.column[x, cmin:cmax] = data
             self.curr_set += 1
 
             if self.curr_set == out_sets:
                 self.curr_set = 0
                 self.fmap_idx += 1
+                if x == self.image_size[0] - 1:
+                    self.check_column(y)
             if self.fmap_idx == fmap_per_iteration:
                 self.fmap_idx = 0
                 self.pass_done.wr(True)
-                if np.all(self.ofmap == self.reference):
+                if not self.mismatch:
                     raise Finish("Success")
                 else:
-                    print(self.ofmap)
-                    print(self.reference)
-                    print(self.ofmap-self.reference)
                     raise Finish("Validation Failed")
@@ -1,22 +1,39 @@
 from nnsim.module import Module
 from nnsim.channel import Channel
+from nnsim.layers import layer_shape
+from nnsim.costs import CostModel
+from nnsim.dram import DRAM
 from .ws import WSArch
 from .stimulus import Stimulus
 
-ALU_ENERGY_FACTOR = 1 # reference
-RF_ENERGY_FACTOR = 1
-PE_ENERGY_FACTOR = 2
-GLB_ENERGY_FACTOR = 6
-DRAM_ENERGY_FACTOR = 200
+def aggregate_stats(raw_stats_list, cost_model=None):
+    # Totals and energy over the raw_stats of every DUT and stimulus module,
+    # shared by WSArchTB and the analytical estimator. The default cost
+    # model is the reference design point (65nm, 32 bit); GLB accesses are
+    # charged at the size of each GLB (see CostModel.stats).
+    if cost_model is None:
+        cost_model = CostModel().init()
+    return cost_model.stats(raw_stats_list)
 
 class WSArchTB(Module):
-    def instantiate(self):
+    def instantiate(self, image_size=(4, 4), filter_size=(3, 3), in_chn=4,
+            out_chn=8, chn_per_word=4, ifmap_glb_depth=None,
+            psum_glb_depth=None, batched_pe=False, layer=None,
+            cost_model=None, psum_glb_banks=None, psum_glb_interleave='low',
+            glb_latency=1, glb_outstanding=None, dram=None):
         self.name = 'tb'
-        self.image_size = (4, 4)
-        self.filter_size = (3, 3)
-        self.in_chn = 4
-        self.out_chn = 8
-        self.chn_per_word = 4
+        # A layer manifest entry (nnsim.layers) replaces the random
+        # stimulus and fixes the layer shape
+        self.layer = layer
+        self.cost_model = CostModel().init() if cost_model is None \
+                else cost_model
+        if layer is not None:
+            image_size, filter_size, in_chn, out_chn = layer_shape(layer)
+        self.image_size = image_size
+        self.filter_size = filter_size
+        self.in_chn = in_chn
+        self.out_chn = out_chn
+        self.chn_per_word = chn_per_word
 
         self.arr_x = self.out_chn
         self.arr_y = self.in_chn
@@ -24,101 +41,55 @@ class WSArchTB(Module):
         self.input_chn = Channel()
         self.output_chn = Channel()
 
+        # dram: keyword arguments of a cycle-level DRAM (nnsim.dram) between
+        # the stimulus and the chip, None for an ideal one word per cycle
+        # link. Words are chn_per_word elements of the cost model's width.
+        if dram is None:
+            self.dram = None
+            stim_input_chn = self.input_chn
+            stim_output_chn = self.output_chn
+        else:
+            dram = dict(dram)
+            dram.setdefault('word_bytes', self.chn_per_word* \
+                    self.cost_model.args['bitwidth']//8)
+            stim_input_chn = Channel()
+            stim_output_chn = Channel()
+            self.dram = DRAM(stim_input_chn, self.input_chn, self.output_chn,
+                    stim_output_chn, **dram)
+
         self.stat_type = 'show'
         self.raw_stats = {}
 
-        ifmap_glb_depth = self.image_size[0]*self.image_size[1]* \
-                self.in_chn//self.chn_per_word
+        if ifmap_glb_depth is None:
+            ifmap_glb_depth = self.image_size[0]*self.image_size[1]* \
+                    self.in_chn//self.chn_per_word
         print("ifmap glb depth:", ifmap_glb_depth)
-        psum_glb_depth = self.image_size[0]*self.image_size[1]* \
-                self.out_chn//self.chn_per_word
+        if psum_glb_depth is None:
+            psum_glb_depth = self.image_size[0]*self.image_size[1]* \
+                    self.out_chn//self.chn_per_word
         print("psum glb depth:", psum_glb_depth)
         print("weight glb depth: 0")
 
         self.stimulus = Stimulus(self.arr_x, self.arr_y, self.chn_per_word,
-            self.input_chn, self.output_chn)
+            stim_input_chn, stim_output_chn)
         self.dut = WSArch(self.arr_x, self.arr_y, self.input_chn,
                 self.output_chn, self.chn_per_word, ifmap_glb_depth,
-                psum_glb_depth)
+                psum_glb_depth, batched_pe, psum_glb_banks,
+                psum_glb_interleave, glb_latency, glb_outstanding)
 
         self.configuration_done = False
 
     def tick(self):
         if not self.configuration_done:
-            self.stimulus.configure(self.image_size, self.filter_size, self.in_chn, self.out_chn)
+            self.stimulus.configure(self.image_size, self.filter_size, self.in_chn, self.out_chn, self.layer)
             self.dut.configure(self.image_size, self.filter_size, self.in_chn, self.out_chn)
             self.configuration_done = True
 
-        noc_multicast_list = [] # list of (sub_module, key) tuples for NoC multicasts
-        memory_access_list = [] # list of (sub_module, key) tuples for memory access stats
-        pe_mac_comp_list = [] # list of (sub_module, key) tuples for PE MAC stats
-
-        ###  collect (sub_module, key) for the comp/memory stats we wish to aggregate
-
-        for sub_module in (self.dut.sub_modules + self.stimulus.sub_modules):
-            sub_module_stats = sub_module.raw_stats
-            for key in sub_module_stats:
-                if (key.find('pe_mac') != -1):
-                    pe_mac_comp_list.append((sub_module, key))
-                if (key.find('rd') != -1) or (key.find('wr') != -1):
-                    memory_access_list.append((sub_module, key))
-                if (key.find('noc') != -1):
-                    noc_multicast_list.append((sub_module, key))
-
-        ### aggregate PE MAC comp stats; find PE computation energy
-
-        total_pe_mac_comp = 0
-        for tup in pe_mac_comp_list:
-            sub_module, key = tup[0], tup[1]
-            total_pe_mac_comp += sub_module.raw_stats[key]
-
-        self.raw_stats['pe_comp_energy'] = total_pe_mac_comp * 2 * ALU_ENERGY_FACTOR
-
-        ### aggregate memory access stats for each type of memory access
-
-        dram_mem_acc = 0
-        glb_mem_acc = 0
-        rf_mem_acc = 0
-
-        for tup in memory_access_list:
-            sub_module, key = tup[0], tup[1]
-            if (key.find('dram') != -1):
-                dram_mem_acc += sub_module.raw_stats[key]
-            if (key.find('glb') != -1):
-                glb_mem_acc += sub_module.raw_stats[key]
-            if (key.find('rf') != -1):
-                rf_mem_acc += sub_module.raw_stats[key]
-
-        self.raw_stats['dram_mem_acc'] = dram_mem_acc
-        self.raw_stats['glb_mem_acc'] = glb_mem_acc
-        self.raw_stats['rf_mem_acc'] = rf_mem_acc
-
-        self.raw_stats['total_mem_acc'] = self.raw_stats['dram_mem_acc'] + \
-                self.raw_stats['glb_mem_acc'] + self.raw_stats['rf_mem_acc']
-
-        ### aggregate channel usage stats for NoC multicasts
-
-        noc_multicasts = 0
-
-        for tup in noc_multicast_list:
-            sub_module, key = tup[0], tup[1]
-            noc_multicasts += sub_module.raw_stats[key]
-
-        self.raw_stats['total_noc_multicasts'] = noc_multicasts
-
-        ### scale memory access stats by energy factors to determine the energy stats
-
-        self.raw_stats['dram_energy'] = self.raw_stats['dram_mem_acc'] * DRAM_ENERGY_FACTOR
-        self.raw_stats['glb_energy'] = self.raw_stats['glb_mem_acc'] * GLB_ENERGY_FACTOR
-        self.raw_stats['rf_energy'] = self.raw_stats['rf_mem_acc'] * RF_ENERGY_FACTOR
-
-        self.raw_stats['data_energy'] = self.raw_stats['dram_energy'] + \
-                self.raw_stats['glb_energy'] + self.raw_stats['rf_energy']
-
-        self.raw_stats['comp_energy'] = self.raw_stats['pe_comp_energy']
-
-        ### total energy = data energy + comp energy
-        self.raw_stats['total_energy'] = self.raw_stats['data_energy'] + self.raw_stats['comp_energy']
+        sub_modules = self.dut.sub_modules + self.stimulus.sub_modules
+        if self.dram is not None:
+            sub_modules = sub_modules + [self.dram]
+        self.raw_stats.update(aggregate_stats([sub_module.raw_stats
+            for sub_module in sub_modules], self.cost_model))
 
 
 if __name__ == "__main__":
@@ -1,22 +1,28 @@
 from nnsim.module import Module, ModuleList
 from nnsim.reg import Reg
-from nnsim.channel import Channel
+from nnsim.channel import Channel, ChannelBank
+from nnsim.ram import read_queue
 
-from .pe import PE
+from .pe import PE, PEArray
 from .serdes import InputDeserializer, OutputSerializer
 from .glb import IFMapGLB, WeightsGLB, PSumGLB
 from .noc import IFMapNoC, WeightsNoC, PSumRdNoC, PSumWrNoC
 
+import numpy as np
+
 class WSArch(Module):
     def instantiate(self, arr_x, arr_y,
             input_chn, output_chn,
             chn_per_word,
-            ifmap_glb_depth, psum_glb_depth):
+            ifmap_glb_depth, psum_glb_depth, batched_pe=False,
+            psum_glb_banks=None, psum_glb_interleave='low', glb_latency=1,
+            glb_outstanding=None):
         # PE static configuration (immutable)
         self.name = 'chip'
         self.arr_x = arr_x
         self.arr_y = arr_y
         self.chn_per_word = chn_per_word
+        self.batched_pe = batched_pe
         
         self.stat_type = 'show'
 
@@ -35,46 +41,51 @@ class WSArch(Module):
         self.psum_output_chn = Channel()
         self.serializer = OutputSerializer(self.output_chn, self.psum_output_chn)
 
-        # Instantiate GLB and GLB channels
-        self.ifmap_rd_chn = Channel(3)
+        # Instantiate GLB and GLB channels. Each GLB keeps up to
+        # glb_outstanding reads in flight through its glb_latency cycle SRAM
+        # (a function of the address for a variable latency, see
+        # nnsim.ram.SRAM).
+        glb_outstanding, rd_chn_depth = read_queue(glb_latency,
+                glb_outstanding)
+        self.ifmap_rd_chn = Channel(rd_chn_depth)
         self.ifmap_glb = IFMapGLB(self.ifmap_wr_chn, self.ifmap_rd_chn,
-                ifmap_glb_depth, chn_per_word)
+                ifmap_glb_depth, chn_per_word, glb_latency, glb_outstanding)
 
-        self.psum_rd_chn = Channel(3)
+        self.psum_rd_chn = Channel(rd_chn_depth)
         self.psum_noc_wr_chn = Channel()
         self.psum_glb = PSumGLB(self.psum_wr_chn, self.psum_noc_wr_chn, self.psum_rd_chn,
-                psum_glb_depth, chn_per_word)
+                psum_glb_depth, chn_per_word, psum_glb_banks,
+                psum_glb_interleave, glb_latency, glb_outstanding)
 
         self.weights_rd_chn = Channel()
         self.weights_glb = WeightsGLB(self.weights_wr_chn, self.weights_rd_chn)
 
-        # PE Array and local channel declaration
-        self.pe_array = ModuleList()
-        self.pe_ifmap_chns = ModuleList()
-        self.pe_filter_chns = ModuleList()
-        self.pe_psum_chns = ModuleList()
-        self.pe_psum_chns.append(ModuleList())
-        for x in range(self.arr_x):
-            self.pe_psum_chns[0].append(Channel(32))
+        # PE Array and local channel declaration. PE row y reads psums from
+        # pe_psum_chns[y] and writes them to pe_psum_chns[y+1]. The batched
+        # PE array does its arithmetic directly on the banks' data rings, so
+        # those hold int64 instead of arbitrary objects.
+        chn_dtype = np.int64 if self.batched_pe else object
+        self.pe_ifmap_chns = ChannelBank((self.arr_y, self.arr_x), 32, chn_dtype)
+        self.pe_filter_chns = ChannelBank((self.arr_y, self.arr_x), 32, chn_dtype)
+        self.pe_psum_chns = ChannelBank((self.arr_y+1, self.arr_x), 32, chn_dtype)
 
         # Actual array instantiation
-        for y in range(self.arr_y):
-            self.pe_array.append(ModuleList())
-            self.pe_ifmap_chns.append(ModuleList())
-            self.pe_filter_chns.append(ModuleList())
-            self.pe_psum_chns.append(ModuleList())
-            for x in range(self.arr_x):
-                self.pe_ifmap_chns[y].append(Channel(32))
-                self.pe_filter_chns[y].append(Channel(32))
-                self.pe_psum_chns[y+1].append(Channel(32))
-                self.pe_array[y].append(
-                    PE(x, y,
-                        self.pe_ifmap_chns[y][x],
-                        self.pe_filter_chns[y][x],
-                        self.pe_psum_chns[y][x],
-                        self.pe_psum_chns[y+1][x]
+        if self.batched_pe:
+            self.pe_array = PEArray(self.arr_x, self.arr_y,
+                    self.pe_ifmap_chns, self.pe_filter_chns, self.pe_psum_chns)
+        else:
+            self.pe_array = ModuleList()
+            for y in range(self.arr_y):
+                self.pe_array.append(ModuleList())
+                for x in range(self.arr_x):
+                    self.pe_array[y].append(
+                        PE(x, y,
+                            self.pe_ifmap_chns[y][x],
+                            self.pe_filter_chns[y][x],
+                            self.pe_psum_chns[y][x],
+                            self.pe_psum_chns[y+1][x]
+                        )
                     )
-                )
 
         # Setup NoC to deliver weights, ifmaps and psums
         self.filter_noc = WeightsNoC(self.weights_rd_chn, self.pe_filter_chns, self.chn_per_word)
@@ -105,6 +116,9 @@ class WSArch(Module):
         
         print("PE array size:", self.arr_y*self.arr_x)
 
-        for y in range(self.arr_y):
-            for x in range(self.arr_x):
-                self.pe_array[y][x].configure(fmap_per_iteration, num_iteration)
+        if self.batched_pe:
+            self.pe_array.configure(fmap_per_iteration, num_iteration)
+        else:
+            for y in range(self.arr_y):
+                for x in range(self.arr_x):
+                    self.pe_array[y][x].configure(fmap_per_iteration, num_iteration)
@@ -1,9 +1,9 @@
 from nnsim.module import Module
-from nnsim.ram import SRAM, RD, WR
-from nnsim.channel import Channel
+from nnsim.ram import SRAM, RequestTracker, RD, WR
 
 class IFMapGLB(Module):
-    def instantiate(self, wr_chn, rd_chn, glb_depth, chn_per_word):
+    def instantiate(self, wr_chn, rd_chn, glb_depth, chn_per_word, latency=1,
+            outstanding=2):
         self.wr_chn = wr_chn
         self.rd_chn = rd_chn
         self.chn_per_word = chn_per_word
@@ -13,8 +13,8 @@ class IFMapGLB(Module):
         self.raw_stats = {'size' : (glb_depth, chn_per_word), 'rd': 0, 'wr': 0}
 
 
-        self.sram = SRAM(glb_depth, chn_per_word)
-        self.last_read = Channel(3)
+        self.sram = SRAM(glb_depth, chn_per_word, latency=latency)
+        self.tracker = RequestTracker(self.sram, outstanding)
 
         self.image_size = (0, 0)
         self.filter_size = (0, 0)
@@ -92,32 +92,30 @@ class IFMapGLB(Module):
             
             fmap_indices = [0,1,4,5,1,2,5,6,2,3,6,7,4,5,8,9,5,6,9,10,6,7,10,11,8,9,12,13,9,10,13,14,10,11,14,15]
                     
-            if self.rd_chn.vacancy(1) and self.iteration < num_iteration: # 9 iterations
+            if self.iteration < num_iteration and \
+                    self.tracker.can_issue(self.rd_chn): # 9 iterations
                
                 fmap_idx = fmap_indices[self.fmap_idx_ctr]
                 addr = fmap_idx
                     
                 #print("addr fmap idx, addr: ", fmap_idx, addr)
                 print("ifmap req glb: fmap_idx_ctr, addr ", self.fmap_idx_ctr, addr)
-                self.sram.request(RD, addr)
-                self.last_read.push(False)
+                self.tracker.read(addr)
                     
                 self.fmap_idx_ctr += 1
                 
                 if (self.fmap_idx_ctr % 4) == 0:
                     self.iteration += 1
                 
-            if self.last_read.valid():                
-                if self.last_read.pop():
-                    pass # do nothing
-                else: # push data to ifmap NOC
-                    data = [e for e in self.sram.response()]
-                    print("ifmap rd glb", data)
-                    self.rd_chn.push(data)
-                    self.raw_stats['rd'] += len(data)
+            if self.tracker.valid(): # push data to ifmap NOC
+                data = self.tracker.pop()
+                print("ifmap rd glb", data)
+                self.rd_chn.push(data)
+                self.raw_stats['rd'] += len(data)
 
 class PSumGLB(Module):
-    def instantiate(self, dram_wr_chn, noc_wr_chn, rd_chn, glb_depth, chn_per_word):
+    def instantiate(self, dram_wr_chn, noc_wr_chn, rd_chn, glb_depth, chn_per_word,
+            latency=1, outstanding=2):
         self.dram_wr_chn = dram_wr_chn
         self.noc_wr_chn = noc_wr_chn
         self.rd_chn = rd_chn
@@ -127,8 +125,8 @@ class PSumGLB(Module):
         self.stat_type = 'show'
         self.raw_stats = {'size' : (glb_depth, chn_per_word), 'rd': 0, 'wr': 0}
 
-        self.sram = SRAM(glb_depth, chn_per_word, nports=2)
-        self.last_read = Channel(3)
+        self.sram = SRAM(glb_depth, chn_per_word, nports=2, latency=latency)
+        self.tracker = RequestTracker(self.sram, outstanding, port=0)
 
         self.filter_size = (0, 0)
         self.fmap_sets = 0
@@ -181,13 +179,12 @@ class PSumGLB(Module):
                     self.wr_done = True
                 #print ("psum orig write, fmap_sets, fmap_wr_idx, wr_set, addr, data: ",self.fmap_sets, self.fmap_wr_idx, self.wr_set, addr, data)
         else:
-            # Read from GLB and deal with SRAM latency
-            # print self.rd_chn.vacancy(1), self.rd_chn.rd_ptr.rd(), self.rd_chn.wr_ptr.rd()
-            if self.rd_chn.vacancy(1) and self.iteration < num_iteration:
+            # Read from GLB, the tracker covers the SRAM latency
+            if self.iteration < num_iteration and \
+                    self.tracker.can_issue(self.rd_chn):
                 addr = self.fmap_sets*self.fmap_rd_idx + self.rd_set
                 # print "psum req glb", self.iteration, self.fmap_rd_idx, self.rd_set
-                self.sram.request(RD, addr, port=0)
-                self.last_read.push(False)
+                self.tracker.read(addr)
                 self.rd_set += 1
 
                 if self.rd_set == self.fmap_sets:
@@ -197,11 +194,9 @@ class PSumGLB(Module):
                     self.fmap_rd_idx = 0
                     self.iteration += 1
 
-            # Process the last read sent to the GLB SRAM
-            if self.last_read.valid():
-                is_zero = self.last_read.pop()
-                data = [0]*self.chn_per_word if is_zero else \
-                        [e for e in self.sram.response()]
+            # Pass on the oldest read once it is back
+            if self.tracker.valid():
+                data = self.tracker.pop()
                 self.rd_chn.push(data)
                 self.raw_stats['rd'] += len(data)
                 print("psum rd glb: data", data)
@@ -4,13 +4,21 @@ from .ws import WSArch
 from .stimulus import Stimulus
 
 class WSArchTB(Module):
-    def instantiate(self):
+    def instantiate(self, image_size=(4, 4), filter_size=(3, 3), in_chn=4,
+            out_chn=8, chn_per_word=4, ifmap_glb_depth=None,
+            psum_glb_depth=None, glb_latency=1, glb_outstanding=None):
+        # One input word per pixel of a 4x4 image, any number of output words
+        if (tuple(image_size), tuple(filter_size), in_chn, chn_per_word) != \
+                ((4, 4), (3, 3), 4, 4) or out_chn % chn_per_word:
+            raise ValueError("%s only supports a 4x4 image, a 3x3 filter, "
+                    "in_chn=chn_per_word=4 and out_chn a multiple of 4"
+                    % __package__)
         self.name = 'tb'
-        self.image_size = (4, 4)
-        self.filter_size = (3, 3)
-        self.in_chn = 4
-        self.out_chn = 8
-        self.chn_per_word = 4
+        self.image_size = image_size
+        self.filter_size = filter_size
+        self.in_chn = in_chn
+        self.out_chn = out_chn
+        self.chn_per_word = chn_per_word
 
         self.arr_x = self.out_chn
         self.arr_y = self.in_chn
@@ -18,18 +26,20 @@ class WSArchTB(Module):
         self.input_chn = Channel()
         self.output_chn = Channel()
 
-        ifmap_glb_depth = self.image_size[0]*self.image_size[1]* \
-                self.in_chn//self.chn_per_word
+        if ifmap_glb_depth is None:
+            ifmap_glb_depth = self.image_size[0]*self.image_size[1]* \
+                    self.in_chn//self.chn_per_word
         print("ifmap glb depth:", ifmap_glb_depth)
-        psum_glb_depth = self.image_size[0]*self.image_size[1]* \
-                self.out_chn//self.chn_per_word
+        if psum_glb_depth is None:
+            psum_glb_depth = self.image_size[0]*self.image_size[1]* \
+                    self.out_chn//self.chn_per_word
         print("psum glb depth:", psum_glb_depth)
 
         self.stimulus = Stimulus(self.arr_x, self.arr_y, self.chn_per_word,
             self.input_chn, self.output_chn)
         self.dut = WSArch(self.arr_x, self.arr_y, self.input_chn,
                 self.output_chn, self.chn_per_word, ifmap_glb_depth,
-                psum_glb_depth)
+                psum_glb_depth, glb_latency, glb_outstanding)
 
         self.configuration_done = False
 
@@ -0,0 +1,98 @@
+from nnsim.module import Module
+
+class DMA(Module):
+    # Moves data between DRAM and the chip pass after pass, without waiting
+    # for the array to finish a pass before loading the next one: ifmaps
+    # and initial psums go into the free region of the ping-pong GLBs,
+    # weights on to the PE columns (whose filter channels hold the next
+    # pass's weights behind the current ones) and the outputs of the array
+    # back to DRAM. Replaces the InputDeserializer/OutputSerializer pair
+    # and counts how much of the loading hides behind an earlier pass.
+    def instantiate(self, dram_rd_chn, dram_wr_chn, ifmap_chn, weights_chn,
+            psum_chn, output_chn, arr_x, arr_y, chn_per_word):
+        self.name = 'dma'
+        self.arr_x = arr_x
+        self.arr_y = arr_y
+        self.chn_per_word = chn_per_word
+
+        self.stat_type = 'aggregate'
+        # dma_overlap_cycles: load cycles while an earlier pass still had
+        # outputs to write back
+        self.raw_stats = {'dram_rd' : 0, 'dram_wr' : 0, 'dma_load_cycles' : 0,
+                'dma_overlap_cycles' : 0}
+
+        self.dram_rd_chn = dram_rd_chn
+        self.dram_wr_chn = dram_wr_chn
+        self.ifmap_chn = ifmap_chn
+        self.weights_chn = weights_chn
+        self.psum_chn = psum_chn
+        self.output_chn = output_chn
+
+        self.image_size = (0, 0)
+        self.filter_size = (0, 0)
+
+        self.fmap_idx = 0
+        self.curr_set = 0
+        self.weights_ctr = 0
+        self.load_pass = 0
+
+        self.output_ctr = 0
+        self.store_pass = 0
+
+    def configure(self, image_size, filter_size):
+        self.image_size = image_size
+        self.filter_size = filter_size
+
+        self.fmap_idx = 0
+        self.curr_set = 0
+        self.weights_ctr = 0
+        self.load_pass = 0
+
+        self.output_ctr = 0
+        self.store_pass = 0
+
+    def tick(self):
+        in_sets = self.arr_y//self.chn_per_word
+        out_sets = self.arr_x//self.chn_per_word
+        fmap_per_iteration = self.image_size[0]*self.image_size[1]
+        num_iteration = self.filter_size[0]*self.filter_size[1]
+
+        # Load: per pass every pixel's ifmap and psum words, then the
+        # weights (see InputDeserializer)
+        if self.fmap_idx < fmap_per_iteration:
+            if self.curr_set < in_sets:
+                target_chn = self.ifmap_chn
+            else:
+                target_chn = self.psum_chn
+        else:
+            target_chn = self.weights_chn
+
+        if self.dram_rd_chn.valid() and target_chn.vacancy():
+            data = self.dram_rd_chn.pop()
+            target_chn.push(data)
+            self.raw_stats['dram_rd'] += len(data)
+            self.raw_stats['dma_load_cycles'] += 1
+            if self.store_pass < self.load_pass:
+                self.raw_stats['dma_overlap_cycles'] += 1
+
+            if self.fmap_idx < fmap_per_iteration:
+                self.curr_set += 1
+                if self.curr_set == (in_sets+out_sets):
+                    self.curr_set = 0
+                    self.fmap_idx += 1
+            else:
+                self.weights_ctr += 1
+                if self.weights_ctr == num_iteration*self.arr_x*in_sets:
+                    self.weights_ctr = 0
+                    self.fmap_idx = 0
+                    self.load_pass += 1
+
+        # Store: the outputs of the pass (see OutputSerializer)
+        if self.output_chn.valid() and self.dram_wr_chn.vacancy():
+            data = self.output_chn.pop()
+            self.dram_wr_chn.push(data)
+            self.raw_stats['dram_wr'] += len(data)
+            self.output_ctr += 1
+            if self.output_ctr == fmap_per_iteration*out_sets:
+                self.output_ctr = 0
+                self.store_pass += 1
@@ -1,20 +1,27 @@
-from nnsim.module import Module
-from nnsim.ram import SRAM, RD, WR
-from nnsim.channel import Channel
+from nnsim.module import Module, ModuleList
+from nnsim.ram import SRAM, RequestTracker, RD, WR
+
+import numpy as np
 
 class IFMapGLB(Module):
-    def instantiate(self, wr_chn, rd_chn, glb_depth, chn_per_word):
+    def instantiate(self, wr_chn, rd_chn, glb_depth, chn_per_word, regions=1,
+            latency=1, outstanding=2):
         self.wr_chn = wr_chn
         self.rd_chn = rd_chn
         self.chn_per_word = chn_per_word
         self.name = 'ifmap_glb'
 
         self.stat_type = 'show'
-        self.raw_stats = {'size' : (glb_depth, chn_per_word), 'rd': 0, 'wr': 0}
-
+        self.raw_stats = {'size' : (regions*glb_depth, chn_per_word), 'ifmap_glb_rd': 0, 'ifmap_glb_wr': 0}
 
-        self.sram = SRAM(glb_depth, chn_per_word)
-        self.last_read = Channel(3)
+        # With two regions (ping-pong) the next pass is written into one
+        # SRAM while the array reads the current pass out of the other
+        self.regions = regions
+        self.srams = ModuleList()
+        for region in range(regions):
+            self.srams.append(SRAM(glb_depth, chn_per_word, latency=latency))
+        self.tracker = RequestTracker(self.srams, outstanding)
+        self.zero_word = np.zeros(chn_per_word, dtype=self.srams[0].data.dtype)
 
         self.image_size = (0, 0)
         self.filter_size = (0, 0)
@@ -24,11 +31,14 @@ class IFMapGLB(Module):
         self.curr_set = 0
         self.fmap_idx = 0
         self.iteration = 0
-        self.wr_done = False
+        self.rd_region = 0
 
-    def configure(self, image_size, filter_size, fmap_sets, fmap_per_iteration):
-        self.wr_done = False
+        self.wr_set = 0
+        self.fmap_wr_idx = 0
+        self.wr_region = 0
+        self.filled = [False]*regions
 
+    def configure(self, image_size, filter_size, fmap_sets, fmap_per_iteration):
         self.image_size = image_size
         self.filter_size = filter_size
         self.fmap_sets = fmap_sets
@@ -36,7 +46,12 @@ class IFMapGLB(Module):
         self.curr_set = 0
         self.fmap_idx = 0
         self.iteration = 0
-        self.wr_done = False
+        self.rd_region = 0
+
+        self.wr_set = 0
+        self.fmap_wr_idx = 0
+        self.wr_region = 0
+        self.filled = [False]*self.regions
 
     def tick(self):
         num_iteration = self.filter_size[0]*self.filter_size[1]
@@ -45,41 +60,22 @@ class IFMapGLB(Module):
         filter_x = self.iteration % self.filter_size[0] - offset_x
         filter_y = self.iteration // self.filter_size[0] - offset_y
 
-        if not self.wr_done:
-            # Write to GLB
-            if self.wr_chn.valid():
-                data = self.wr_chn.pop()
-                self.raw_stats['wr'] += len(data)
-                # print "ifmap_glb wr"
-                # Write ifmap to glb
-                # print "ifmap_to_glb: ", in_sets, self.fmap_idx, self.curr_set
-                addr = self.fmap_sets*self.fmap_idx + self.curr_set
-                self.curr_set += 1
-                self.sram.request(WR, addr, data)
-                if self.curr_set == self.fmap_sets:
-                    self.curr_set = 0
-                    self.fmap_idx += 1
-                if self.fmap_idx == self.fmap_per_iteration:
-                    # Done initializing ifmaps and psums
-                    # self.sram.dump()
-                    self.fmap_idx = 0
-                    self.wr_done = True
-        else:
-            # Read from GLB and deal with SRAM latency
-            if self.rd_chn.vacancy(1) and self.iteration < num_iteration:
+        if self.filled[self.rd_region]:
+            # Read from GLB, the tracker covers the SRAM latency
+            if self.iteration < num_iteration and \
+                    self.tracker.can_issue(self.rd_chn):
                 fmap_x = self.fmap_idx % self.image_size[0]
                 fmap_y = self.fmap_idx  // self.image_size[0]
                 ifmap_x, ifmap_y = (fmap_x + filter_x, fmap_y + filter_y)
                 if (ifmap_x < 0) or (ifmap_x >= self.image_size[0]) or \
                         (ifmap_y < 0) or (ifmap_y >= self.image_size[1]):
                     # print "ifmap req zero", self.iteration, self.fmap_idx
-                    self.last_read.push(True)
+                    self.tracker.skip(self.zero_word)
                 else:
                     fmap_idx = (ifmap_y*self.image_size[0]) + ifmap_x
                     addr = self.fmap_sets*fmap_idx + self.curr_set
                     # print "ifmap req glb", self.iteration, self.fmap_idx
-                    self.sram.request(RD, addr)
-                    self.last_read.push(False)
+                    self.tracker.read(addr, self.rd_region)
                 self.curr_set += 1
 
                 if self.curr_set == self.fmap_sets:
@@ -88,19 +84,46 @@ class IFMapGLB(Module):
                 if self.fmap_idx == self.fmap_per_iteration:
                     self.fmap_idx = 0
                     self.iteration += 1
+            elif self.iteration == num_iteration:
+                # Every read of the pass is out, the region takes the ifmap
+                # of a later pass
+                self.filled[self.rd_region] = False
+                self.rd_region = (self.rd_region + 1) % self.regions
+                self.iteration = 0
 
-            # Process the last read sent to the GLB SRAM
-            if self.last_read.valid():
-                is_zero = self.last_read.pop()
-                data = [0]*self.chn_per_word if is_zero else \
-                        [e for e in self.sram.response()]
-                # print "ifmap rd glb", data
+        # Pass on the oldest read once it is back, also from the region
+        # the last pass read
+        if self.tracker.valid():
+            data = self.tracker.pop()
+            # print "ifmap rd glb", data
 
-                self.rd_chn.push(data)
-                self.raw_stats['rd'] += len(data)
+            self.rd_chn.push(data)
+            self.raw_stats['ifmap_glb_rd'] += len(data)
+
+        if not self.filled[self.wr_region]:
+            # Write to GLB
+            if self.wr_chn.valid():
+                data = self.wr_chn.pop()
+                self.raw_stats['ifmap_glb_wr'] += len(data)
+                # print "ifmap_glb wr"
+                # Write ifmap to glb
+                # print "ifmap_to_glb: ", in_sets, self.fmap_wr_idx, self.wr_set
+                addr = self.fmap_sets*self.fmap_wr_idx + self.wr_set
+                self.wr_set += 1
+                self.srams[self.wr_region].request(WR, addr, data)
+                if self.wr_set == self.fmap_sets:
+                    self.wr_set = 0
+                    self.fmap_wr_idx += 1
+                if self.fmap_wr_idx == self.fmap_per_iteration:
+                    # Done initializing ifmaps and psums
+                    # self.srams[self.wr_region].dump()
+                    self.fmap_wr_idx = 0
+                    self.filled[self.wr_region] = True
+                    self.wr_region = (self.wr_region + 1) % self.regions
 
 class PSumGLB(Module):
-    def instantiate(self, dram_wr_chn, noc_wr_chn, rd_chn, glb_depth, chn_per_word):
+    def instantiate(self, dram_wr_chn, noc_wr_chn, rd_chn, glb_depth, chn_per_word,
+            regions=1, latency=1, outstanding=2):
         self.dram_wr_chn = dram_wr_chn
         self.noc_wr_chn = noc_wr_chn
         self.rd_chn = rd_chn
@@ -108,10 +131,17 @@ class PSumGLB(Module):
         self.name = 'psum_glb'
 
         self.stat_type = 'show'
-        self.raw_stats = {'size' : (glb_depth, chn_per_word), 'rd': 0, 'wr': 0}
+        self.raw_stats = {'size' : (regions*glb_depth, chn_per_word), 'psum_glb_rd': 0, 'psum_glb_wr': 0}
 
-        self.sram = SRAM(glb_depth, chn_per_word, nports=2)
-        self.last_read = Channel(3)
+        # Ping-pong as in IFMapGLB. The array reads (port 0) and updates
+        # (port 1) the psums of the current pass in one region, the initial
+        # psums of the next pass are written (port 0) into the other.
+        self.regions = regions
+        self.srams = ModuleList()
+        for region in range(regions):
+            self.srams.append(SRAM(glb_depth, chn_per_word, nports=2,
+                latency=latency))
+        self.tracker = RequestTracker(self.srams, outstanding, port=0)
 
         self.filter_size = (0, 0)
         self.fmap_sets = 0
@@ -120,14 +150,19 @@ class PSumGLB(Module):
         self.rd_set = 0
         self.fmap_rd_idx = 0
         self.iteration = 0
+        self.rd_region = 0
+        self.rd_ctr = 0
 
         self.wr_set = 0
         self.fmap_wr_idx = 0
-        self.wr_done = False
+        self.noc_wr_ctr = 0
 
-    def configure(self, filter_size, fmap_sets, fmap_per_iteration):
-        self.wr_done = False
+        self.fill_set = 0
+        self.fmap_fill_idx = 0
+        self.fill_region = 0
+        self.filled = [False]*regions
 
+    def configure(self, filter_size, fmap_sets, fmap_per_iteration):
         self.filter_size = filter_size
         self.fmap_sets = fmap_sets
         self.fmap_per_iteration = fmap_per_iteration
@@ -135,25 +170,34 @@ class PSumGLB(Module):
         self.rd_set = 0
         self.fmap_rd_idx = 0
         self.iteration = 0
+        self.rd_region = 0
+        self.rd_ctr = 0
 
         self.wr_set = 0
         self.fmap_wr_idx = 0
-        self.wr_done = False
+        self.noc_wr_ctr = 0
+
+        self.fill_set = 0
+        self.fmap_fill_idx = 0
+        self.fill_region = 0
+        self.filled = [False]*self.regions
 
     def tick(self):
         num_iteration = self.filter_size[0]*self.filter_size[1]
+        psums_per_iteration = self.fmap_sets*self.fmap_per_iteration
 
-        if not self.wr_done:
-            # Write to GLB
-            if self.dram_wr_chn.valid():
-                data = self.dram_wr_chn.pop()
-                self.raw_stats['wr'] += len(data)
-                # print "psum_glb wr"
-                # Write ifmap to glb
-                #print ("ifmap_to_glb: ", self.fmap_wr_idx, self.wr_set)
+        if self.filled[self.rd_region]:
+            sram = self.srams[self.rd_region]
+            written = self.noc_wr_ctr
+            if self.noc_wr_chn.valid():
+                #print ("psum_to_glb: ", self.fmap_wr_idx, self.wr_set)
+                data = self.noc_wr_chn.pop()
+                self.raw_stats['psum_glb_wr'] += len(data)
                 addr = self.fmap_sets*self.fmap_wr_idx + self.wr_set
+                #print ("psum wr glb", self.fmap_wr_idx, self.wr_set, data)
+                self.noc_wr_ctr += 1
                 self.wr_set += 1
-                self.sram.request(WR, addr, data, port=0)
+                sram.request(WR, addr, data, port=1)
                 if self.wr_set == self.fmap_sets:
                     self.wr_set = 0
                     self.fmap_wr_idx += 1
@@ -161,15 +205,17 @@ class PSumGLB(Module):
                     # Done initializing ifmaps and psums
                     # self.sram.dump()
                     self.fmap_wr_idx = 0
-                    self.wr_done = True
-        else:
-            # Read from GLB and deal with SRAM latency
-            # print self.rd_chn.vacancy(1), self.rd_chn.rd_ptr.rd(), self.rd_chn.wr_ptr.rd()
-            if self.rd_chn.vacancy(1) and self.iteration < num_iteration:
+
+            # Read from GLB, the tracker covers the SRAM latency. A psum of
+            # the next iteration is only read once the array wrote it back
+            # in an earlier cycle.
+            if self.iteration < num_iteration and \
+                    self.rd_ctr - psums_per_iteration < written and \
+                    self.tracker.can_issue(self.rd_chn):
                 addr = self.fmap_sets*self.fmap_rd_idx + self.rd_set
                 #print ("psum req glb", self.iteration, self.fmap_rd_idx, self.rd_set)
-                self.sram.request(RD, addr, port=0)
-                self.last_read.push(False)
+                self.tracker.read(addr, self.rd_region)
+                self.rd_ctr += 1
                 self.rd_set += 1
 
                 if self.rd_set == self.fmap_sets:
@@ -178,31 +224,41 @@ class PSumGLB(Module):
                 if self.fmap_rd_idx == self.fmap_per_iteration:
                     self.fmap_rd_idx = 0
                     self.iteration += 1
+            elif self.iteration == num_iteration:
+                # The last iteration goes straight to the output, so once
+                # its reads are out the region is done (every write back
+                # came before them)
+                self.filled[self.rd_region] = False
+                self.rd_region = (self.rd_region + 1) % self.regions
+                self.iteration = 0
+                self.rd_ctr = 0
+                self.noc_wr_ctr = 0
 
-            # Process the last read sent to the GLB SRAM
-            if self.last_read.valid():
-                is_zero = self.last_read.pop()
-                data = [0]*self.chn_per_word if is_zero else \
-                        [e for e in self.sram.response()]
-                self.rd_chn.push(data)
-                self.raw_stats['rd'] += len(data)
-                #print ("psum rd glb", data)
+        # Pass on the oldest read once it is back
+        if self.tracker.valid():
+            data = self.tracker.pop()
+            self.rd_chn.push(data)
+            self.raw_stats['psum_glb_rd'] += len(data)
+            #print ("psum rd glb", data)
 
-            if self.noc_wr_chn.valid():
-                #print ("psum_to_glb: ", self.fmap_wr_idx, self.wr_set)
-                data = self.noc_wr_chn.pop()
-                self.raw_stats['wr'] += len(data)
-                addr = self.fmap_sets*self.fmap_wr_idx + self.wr_set
-                #print ("psum wr glb", self.fmap_wr_idx, self.wr_set, data)
-                self.wr_set += 1
-                self.sram.request(WR, addr, data, port=1)
-                if self.wr_set == self.fmap_sets:
-                    self.wr_set = 0
-                    self.fmap_wr_idx += 1
-                if self.fmap_wr_idx == self.fmap_per_iteration:
+        if not self.filled[self.fill_region]:
+            # Write to GLB
+            if self.dram_wr_chn.valid():
+                data = self.dram_wr_chn.pop()
+                self.raw_stats['psum_glb_wr'] += len(data)
+                # print "psum_glb wr"
+                #print ("psum_to_glb: ", self.fmap_fill_idx, self.fill_set)
+                addr = self.fmap_sets*self.fmap_fill_idx + self.fill_set
+                self.fill_set += 1
+                self.srams[self.fill_region].request(WR, addr, data, port=0)
+                if self.fill_set == self.fmap_sets:
+                    self.fill_set = 0
+                    self.fmap_fill_idx += 1
+                if self.fmap_fill_idx == self.fmap_per_iteration:
                     # Done initializing ifmaps and psums
-                    # self.sram.dump()
-                    self.fmap_wr_idx = 0
+                    self.fmap_fill_idx = 0
+                    self.filled[self.fill_region] = True
+                    self.fill_region = (self.fill_region + 1) % self.regions
 
 class WeightsGLB(Module):
     def instantiate(self, wr_chn, rd_chn):
@@ -211,11 +267,11 @@ class WeightsGLB(Module):
         self.name = 'weight_glb'
 
         self.stat_type = 'show'
-        self.raw_stats = {'size' : (0, 0), 'rd': 0, 'wr': 0}
+        self.raw_stats = {'size' : (0, 0), 'weight_glb_rd': 0, 'weight_glb_wr': 0}
 
     def tick(self):
         if self.wr_chn.valid() and self.rd_chn.vacancy():
             data = self.wr_chn.pop()
             self.rd_chn.push(data)
-            self.raw_stats['rd'] += len(data)
-            self.raw_stats['wr'] += len(data)
+            self.raw_stats['weight_glb_rd'] += len(data)
+            self.raw_stats['weight_glb_wr'] += len(data)
@@ -1,5 +1,7 @@
 from nnsim.module import Module
 
+import numpy as np
+
 class WeightsNoC(Module):
     def instantiate(self, rd_chn, wr_chns, chn_per_word):
         self.chn_per_word = chn_per_word
@@ -27,17 +29,14 @@ class WeightsNoC(Module):
     def tick(self):
         # Dispatch filters to PE columns. (PE is responsible for pop)
         if self.rd_chn.valid():
-            vacancy = True
             ymin = self.curr_set*self.chn_per_word
             ymax = ymin + self.chn_per_word
-            for y in range(ymin, ymax):
-                vacancy = vacancy and self.wr_chns[y][self.curr_filter].vacancy()
-            if vacancy:
+            group = (slice(ymin, ymax), self.curr_filter)
+            if self.wr_chns.all_vacant(group):
                 data = self.rd_chn.pop()
                 self.raw_stats['noc_multicast'] += len(data)
                 # print "filter_to_pe: ", self.curr_filter, data
-                for y in range(ymin, ymax):
-                    self.wr_chns[y][self.curr_filter].push(data[y])
+                self.wr_chns.multicast_push(group, data)
 
                 self.curr_set += 1
                 if self.curr_set == self.filter_sets:
@@ -75,18 +74,14 @@ class IFMapNoC(Module):
             # Dispatch ifmap read if space is available and not at edge
             ymin = self.curr_set*self.chn_per_word
             ymax = ymin + self.chn_per_word
-            vacancy = True
-            for y in range(ymin, ymax):
-                for x in range(self.arr_x):
-                    vacancy = vacancy and self.wr_chns[y][x].vacancy()
-
-            if vacancy:
+            group = (slice(ymin, ymax), slice(0, self.arr_x))
+            if self.wr_chns.all_vacant(group):
                 data = self.rd_chn.pop()
                 self.raw_stats['noc_multicast'] += len(data)
                 # print "ifmap_to_pe", ymin, ymax, data
-                for y in range(ymin, ymax):
-                    for x in range(self.arr_x):
-                        self.wr_chns[y][x].push(data[y-ymin])
+                # Each word element goes to every PE in its row
+                self.wr_chns.multicast_push(group,
+                        np.reshape(data, (-1, 1)))
 
                 self.curr_set += 1
                 if self.curr_set == self.ifmap_sets:
@@ -118,16 +113,11 @@ class PSumRdNoC(Module):
             # Dispatch ifmap read if space is available and not at edge
             xmin = self.curr_set*self.chn_per_word
             xmax = xmin + self.chn_per_word
-            vacancy = True
-            for x in range(xmin, xmax):
-                vacancy = vacancy and self.wr_chns[x].vacancy()
-
-            if vacancy:
+            group = slice(xmin, xmax)
+            if self.wr_chns.all_vacant(group):
                 data = self.rd_chn.pop()
                 self.raw_stats['noc_multicast'] += len(data)
-                for x in range(xmin, xmax):
-                    self.wr_chns[x].push(data[x-xmin])
-                    #print ("psum_to_pe: xmin, xmax, x, data: ", xmin, xmax, x, data)
+                self.wr_chns.multicast_push(group, data)
 
                 self.curr_set += 1
                 if self.curr_set == self.psum_sets:
@@ -189,3 +179,6 @@ class PSumWrNoC(Module):
                     # print "---- Finished psum iteration: %d ----" % self.iteration
                     # self.glb.dump()
                     self.iteration += 1
+                    if self.iteration == self.num_iteration:
+                        # Next pass (the DMA does not reconfigure the chip)
+                        self.iteration = 0
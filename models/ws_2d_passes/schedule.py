@@ -0,0 +1,61 @@
+# Pass scheduling for layers larger than the PE array. A layer is cut into
+# input channel groups of arr_y channels (PE rows) and output channel groups
+# of arr_x filters (PE columns); every (output group, input group) pair is
+# one pass. The first input pass of an output group starts from the bias,
+# every later one from the partial sums of the pass before, which travel
+# through DRAM (the TB's psum_chn).
+#
+# The datapath reloads the ifmap and spills the partial sums on every pass,
+# so both loop orders move the same data. They differ in how many partial
+# sums wait in DRAM and in how much loading prefetch can hide:
+#   'output_outer': for each output group, for each input group. The partial
+#       sums of one output group are live.
+#   'input_outer': for each input group, for each output group. The partial
+#       sums of every output group are live, but no pass waits for the
+#       spill of the one just before it.
+
+from nnsim.passes import plan_passes
+
+def ceil_div(a, b):
+    return -(-a//b)
+
+def spill_depth(image_size, out_chn, arr_x, chn_per_word, order):
+    # Words of partial sums in flight between two passes that use them
+    fmap_per_iteration = image_size[0]*image_size[1]
+    out_sets = arr_x//chn_per_word
+    if order == 'input_outer':
+        out_sets *= ceil_div(out_chn, arr_x)
+    return fmap_per_iteration*out_sets
+
+def dram_traffic(image_size, filter_size, in_chn, out_chn, arr_x, arr_y):
+    # DRAM accesses (in channel values) of a layer, the same in either order
+    fmap_per_iteration = image_size[0]*image_size[1]
+    num_iteration = filter_size[0]*filter_size[1]
+    in_groups = ceil_div(in_chn, arr_y)
+    out_groups = ceil_div(out_chn, arr_x)
+    num_passes = in_groups*out_groups
+
+    psum_tile = fmap_per_iteration*arr_x
+    psum_spill = (in_groups - 1)*out_groups*psum_tile
+
+    traffic = { 'ifmap_rd' : num_passes*fmap_per_iteration*arr_y,
+                'weights_rd' : num_passes*num_iteration*arr_x*arr_y,
+                # The bias is sent along with every output pixel
+                'bias_rd' : out_groups*psum_tile,
+                'psum_spill_rd' : psum_spill,
+                'psum_spill_wr' : psum_spill,
+                'ofmap_wr' : out_groups*psum_tile }
+    traffic['dram_rd'] = traffic['ifmap_rd'] + traffic['weights_rd'] + \
+            traffic['bias_rd'] + traffic['psum_spill_rd']
+    traffic['dram_wr'] = traffic['psum_spill_wr'] + traffic['ofmap_wr']
+    traffic['dram_acc'] = traffic['dram_rd'] + traffic['dram_wr']
+    return traffic
+
+def schedule(image_size, filter_size, in_chn, out_chn, arr_x, arr_y,
+        chn_per_word, order='output_outer'):
+    # Returns (passes, dram_traffic) of the layer run in the given order
+    if arr_x % chn_per_word or arr_y % chn_per_word:
+        raise ValueError("Array dimensions must be a multiple of chn_per_word")
+    return plan_passes(in_chn, out_chn, arr_x, arr_y, order), \
+            dram_traffic(image_size, filter_size, in_chn, out_chn, arr_x,
+                    arr_y)
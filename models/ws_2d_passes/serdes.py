@@ -30,7 +30,11 @@ class InputSerializer(Module):
         self.iteration = 0
         self.fmap_idx = 0
 
-    def configure(self, ifmap, weights, bias, image_size, filter_size, curr_pass):
+    def configure(self, ifmap, weights, bias, image_size, filter_size,
+            out_lo, in_lo):
+        # One pass: input channels in_lo.. (arr_y of them) against filters
+        # out_lo.. (arr_x of them). The first input pass starts from the
+        # bias, later ones from the partial sums spilled into psum_chn.
         self.ifmap = ifmap
         self.weights = weights
         self.bias = bias
@@ -41,7 +45,8 @@ class InputSerializer(Module):
         self.ifmap_psum_done = False
         self.pass_done.wr(False)
 
-        self.curr_pass = curr_pass
+        self.out_lo = out_lo
+        self.in_lo = in_lo
         self.curr_set = 0
         self.curr_filter = 0
         self.iteration = 0
@@ -56,28 +61,26 @@ class InputSerializer(Module):
         fmap_per_iteration = self.image_size[0]*self.image_size[1]
         num_iteration = self.filter_size[0]*self.filter_size[1]
 
-        if not self.ifmap_psum_done and (self.psum_chn.valid() or self.curr_pass % 2 == 0):
-            if self.arch_input_chn.vacancy():
+        if not self.ifmap_psum_done:
+            # Partial sums of a spilled pass may still be on their way
+            if self.arch_input_chn.vacancy() and \
+                    (self.psum_chn.valid() or self.in_lo == 0):
                 # print "input append"
 
                 x = self.fmap_idx % self.image_size[0]
                 y = self.fmap_idx // self.image_size[0]
 
                 if self.curr_set < in_sets:
-                    cmin = self.curr_set*self.chn_per_word + (self.curr_pass % 2)*4
+                    cmin = self.curr_set*self.chn_per_word + self.in_lo
                     cmax = cmin + self.chn_per_word
                     # Write ifmap to glb
-                    #print ("serdes: write ifmap to glb")
-                    # print ("ifmap indices1 cmin,cmax: ", cmin,cmax)
-                    data = np.array([ self.ifmap[x, y, c] for c in range(cmin, cmax) ])
+                    data = np.array(self.ifmap[x, y, cmin:cmax])
                 else:
-                    if (self.curr_pass % 2 == 0): # read biases
-                        cmin = (self.curr_set - in_sets)*self.chn_per_word + (self.curr_pass // 2)*8
+                    if self.in_lo == 0: # read biases
+                        cmin = (self.curr_set - in_sets)*self.chn_per_word + self.out_lo
                         cmax = cmin + self.chn_per_word
                         # Write bias to glb
-                        #print ("serdes: write bias to glb")
-                        # print ("ifmap indices2 cmin,cmax: ", cmin,cmax)
-                        data = np.array([ self.bias[c] for c in range(cmin, cmax) ])
+                        data = np.array(self.bias[cmin:cmax])
                     else: # read partial sums
                         data = [e for e in self.psum_chn.pop()]
                 self.arch_input_chn.push(data)
@@ -96,12 +99,10 @@ class InputSerializer(Module):
 
             # Push filters to PE columns. (PE is responsible for pop)
             if self.arch_input_chn.vacancy() and self.iteration < num_iteration:
-                cmin = self.curr_set*self.chn_per_word+(self.curr_pass % 2)*4
+                cmin = self.curr_set*self.chn_per_word + self.in_lo
                 cmax = cmin + self.chn_per_word
-                filter_idx = self.curr_filter + (self.curr_pass // 2)*8
-                # print ("weight indices cmin,cmax,filter_idx: ",cmin,cmax,filter_idx)
-                data = np.array([self.weights[f_x, f_y, c, filter_idx] \
-                        for c in range(cmin, cmax) ])
+                filter_idx = self.curr_filter + self.out_lo
+                data = np.array(self.weights[f_x, f_y, cmin:cmax, filter_idx])
 
                 self.arch_input_chn.push(data)
                 self.curr_set += 1
@@ -209,18 +210,22 @@ class OutputDeserializer(Module):
 
         self.pass_done = Reg(False)
 
-    def configure(self, ofmap, reference, image_size, curr_pass):
-        if (curr_pass == 0): # so that ofmap doesnt get rewritten with zeros
-            self.ofmap = ofmap
-
+    def configure(self, ofmap, reference, image_size, out_lo, spill,
+            last_pass):
+        # With spill, the partial sums of this pass go into psum_chn for the
+        # next input pass of the same output group. Otherwise they are
+        # final and fill filters out_lo.. of the ofmap, which is checked
+        # after the last pass.
+        self.ofmap = ofmap
         self.reference = reference
 
         self.image_size = image_size
 
         self.curr_set = 0
         self.fmap_idx = 0
-        self.curr_pass = curr_pass
-        self.num_passes = 4
+        self.out_lo = out_lo
+        self.spill = spill
+        self.last_pass = last_pass
 
         self.pass_done.wr(False)
 
@@ -231,22 +236,16 @@ class OutputDeserializer(Module):
         out_sets = self.arr_x//self.chn_per_word
         fmap_per_iteration = self.image_size[0]*self.image_size[1]
 
-        if self.arch_output_chn.valid() and (self.psum_chn.vacancy() or self.curr_pass % 2 == 1):
+        if self.arch_output_chn.valid() and (self.psum_chn.vacancy() or not self.spill):
             data = [e for e in self.arch_output_chn.pop()]
-            if ((self.curr_pass % 2) == 0): # push ofmap psum to serializer on pass 0 and 2
+            if self.spill:
                 self.psum_chn.push(data)
-
-            x = self.fmap_idx % self.image_size[0]
-            y = self.fmap_idx // self.image_size[0]
-
-            if self.curr_set < out_sets:
-                channel_offset = 0
-                if (self.curr_pass > 1):
-                    channel_offset = 8
-                cmin = self.curr_set*self.chn_per_word + channel_offset
+            else:
+                x = self.fmap_idx % self.image_size[0]
+                y = self.fmap_idx // self.image_size[0]
+                cmin = self.curr_set*self.chn_per_word + self.out_lo
                 cmax = cmin + self.chn_per_word
-                for c in range(cmin, cmax):
-                    self.ofmap[x, y, c] = data[c-cmin]
+                self.ofmap[x, y, cmin:cmax] = data
 
             self.curr_set += 1
 
@@ -255,8 +254,8 @@ class OutputDeserializer(Module):
                 self.fmap_idx += 1
             if self.fmap_idx == fmap_per_iteration:
                 self.fmap_idx = 0
-                if (self.curr_pass == self.num_passes-1):
-                    self.pass_done.wr(True)
+                self.pass_done.wr(True)
+                if self.last_pass:
                     if np.all(self.ofmap == self.reference):
                         raise Finish("Success")
                     else:
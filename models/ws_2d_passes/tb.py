@@ -1,51 +1,137 @@
 from nnsim.module import Module
 from nnsim.channel import Channel
+from nnsim.costs import CostModel
+from nnsim.dram import DRAM
 from .ws import WSArch
 from .stimulus import Stimulus
+from .schedule import schedule, spill_depth
 
 class WSArchTB(Module):
-    def instantiate(self):
+    def instantiate(self, image_size=(4, 4), filter_size=(3, 3), in_chn=8,
+            out_chn=16, chn_per_word=4, ifmap_glb_depth=None,
+            psum_glb_depth=None, arr_x=None, arr_y=None, order='output_outer',
+            prefetch=False, dram=None, cost_model=None, glb_latency=1,
+            glb_outstanding=None):
+        # The layer is split into passes over channel groups of an
+        # arr_y x arr_x array (half the layer by default, see schedule.py).
+        # With prefetch a DMA loads the next pass into double-buffered GLBs
+        # while the array computes the current one. dram: keyword arguments
+        # of a cycle-level DRAM (nnsim.dram) between the stimulus and the
+        # chip, None for an ideal one word per cycle link. Energy is
+        # charged by cost_model (nnsim.costs, the reference design point by
+        # default) at the size of the GLBs, both regions with prefetch.
+        # glb_latency/glb_outstanding: GLB SRAM read latency and reads in
+        # flight, as in ws_2d.
         self.name = 'tb'
-        self.image_size = (4, 4)
-        self.filter_size = (3, 3)
-        self.in_chn = 8
-        self.out_chn = 16
-        self.chn_per_word = 4
+        self.cost_model = CostModel().init() if cost_model is None \
+                else cost_model
+        self.prefetch = prefetch
+        self.image_size = image_size
+        self.filter_size = filter_size
+        self.in_chn = in_chn
+        self.out_chn = out_chn
+        self.chn_per_word = chn_per_word
 
-        self.arr_x = self.out_chn // 2
-        self.arr_y = self.in_chn // 2
+        self.arr_x = self.out_chn // 2 if arr_x is None else arr_x
+        self.arr_y = self.in_chn // 2 if arr_y is None else arr_y
+
+        if ifmap_glb_depth is None:
+            ifmap_glb_depth = self.image_size[0]*self.image_size[1]* \
+                    self.arr_y//self.chn_per_word
+        if psum_glb_depth is None:
+            psum_glb_depth = self.image_size[0]*self.image_size[1]* \
+                    self.arr_x//self.chn_per_word
+
+        # Passes in the given loop order and the DRAM traffic they move
+        # (in channel values, see schedule.py)
+        self.order = order
+        self.passes, self.traffic = schedule(self.image_size,
+                self.filter_size, self.in_chn, self.out_chn, self.arr_x,
+                self.arr_y, self.chn_per_word, order)
 
         self.input_chn = Channel()
         self.output_chn = Channel()
-        self.psum_chn = Channel(128)
+        if dram is None:
+            self.dram = None
+            stim_input_chn = self.input_chn
+            stim_output_chn = self.output_chn
+        else:
+            dram = dict(dram)
+            dram.setdefault('word_bytes', self.chn_per_word* \
+                    self.cost_model.args['bitwidth']//8)
+            stim_input_chn = Channel()
+            stim_output_chn = Channel()
+            self.dram = DRAM(stim_input_chn, self.input_chn, self.output_chn,
+                    stim_output_chn, **dram)
+        # Stands in for the DRAM buffer holding spilled partial sums
+        self.psum_chn = Channel(max(spill_depth(self.image_size,
+            self.out_chn, self.arr_x, self.chn_per_word, self.order), 2))
         self.curr_pass = 0
-        self.tick_counter = 0
-
-        ifmap_glb_depth = self.image_size[0]*self.image_size[1]* \
-                (self.in_chn//2)//self.chn_per_word
-        psum_glb_depth = self.image_size[0]*self.image_size[1]* \
-                (self.out_chn//2)//self.chn_per_word
+        self.in_pass = 0
 
         self.stimulus = Stimulus(self.arr_x, self.arr_y, self.chn_per_word,
-            self.input_chn, self.output_chn, self.psum_chn)
+            stim_input_chn, stim_output_chn, self.psum_chn)
         self.dut = WSArch(self.arr_x, self.arr_y, self.input_chn,
                 self.output_chn, self.chn_per_word, ifmap_glb_depth,
-                psum_glb_depth)
+                psum_glb_depth, prefetch, glb_latency, glb_outstanding)
+
+        self.stat_type = 'show'
+        self.raw_stats = {}
 
         self.configuration_done = False
 
     def tick(self):
-        # print ("current pass: ", self.curr_pass)
-        self.tick_counter+=1
-        if (self.curr_pass < 4):
-            if (self.tick_counter == 353):
-                self.tick_counter = 0
+        if self.prefetch:
+            self.prefetch_tick()
+        else:
+            self.pass_tick()
+
+        sub_modules = self.dut.sub_modules + self.stimulus.sub_modules
+        if self.dram is not None:
+            sub_modules = sub_modules + [self.dram]
+        self.raw_stats.update(self.cost_model.stats([sub_module.raw_stats
+            for sub_module in sub_modules]))
+
+    def pass_tick(self):
+        # A pass ends once the last of its outputs has left the chip
+        if self.stimulus.deserializer.pass_done.rd() and \
+                self.configuration_done:
+            self.curr_pass += 1
+            self.configuration_done = False
+        if not self.configuration_done:
+            # print ("current pass: ", self.curr_pass)
+            self.stimulus.configure(self.image_size, self.filter_size, self.in_chn, self.out_chn, self.passes, self.curr_pass)
+            self.dut.configure(self.image_size, self.filter_size, self.arr_y, self.arr_x)
+            self.configuration_done = True
+
+    def prefetch_tick(self):
+        # The chip is configured once, the stimulus starts sending a pass as
+        # soon as the previous one is sent and takes the outputs of a pass
+        # once the previous one is received
+        serializer = self.stimulus.serializer
+        deserializer = self.stimulus.deserializer
+        if not self.configuration_done:
+            self.stimulus.configure(self.image_size, self.filter_size,
+                    self.in_chn, self.out_chn, self.passes, 0)
+            self.dut.configure(self.image_size, self.filter_size, self.arr_y,
+                    self.arr_x)
+            self.configuration_done = True
+        else:
+            if serializer.pass_done.rd() and \
+                    self.in_pass + 1 < len(self.passes):
+                self.in_pass += 1
+                self.stimulus.configure_input(self.image_size,
+                        self.filter_size, self.passes, self.in_pass)
+            if deserializer.pass_done.rd() and \
+                    self.curr_pass + 1 < len(self.passes):
                 self.curr_pass += 1
-                self.configuration_done = False
-            if not self.configuration_done:
-                self.stimulus.configure(self.image_size, self.filter_size, self.in_chn, self.out_chn, self.curr_pass)
-                self.dut.configure(self.image_size, self.filter_size, self.in_chn, self.out_chn)
-                self.configuration_done = True
+                self.stimulus.configure_output(self.image_size, self.in_chn,
+                        self.passes, self.curr_pass)
+
+        # Share of the DRAM loads hidden behind an earlier pass
+        dma = self.dut.dma.raw_stats
+        self.raw_stats['prefetch_overlap'] = \
+                float(dma['dma_overlap_cycles'])/max(dma['dma_load_cycles'], 1)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,11 @@
 from nnsim.module import Module, ModuleList
 from nnsim.reg import Reg
-from nnsim.channel import Channel
+from nnsim.channel import Channel, ChannelBank
+from nnsim.ram import read_queue
 
 from .pe import PE
 from .serdes import InputDeserializer, OutputSerializer
+from .dma import DMA
 from .glb import IFMapGLB, WeightsGLB, PSumGLB
 from .noc import IFMapNoC, WeightsNoC, PSumRdNoC, PSumWrNoC
 
@@ -11,12 +13,14 @@ class WSArch(Module):
     def instantiate(self, arr_x, arr_y,
             input_chn, output_chn,
             chn_per_word,
-            ifmap_glb_depth, psum_glb_depth):
+            ifmap_glb_depth, psum_glb_depth, prefetch=False, glb_latency=1,
+            glb_outstanding=None):
         # PE static configuration (immutable)
         self.name = 'chip'
         self.arr_x = arr_x
         self.arr_y = arr_y
         self.chn_per_word = chn_per_word
+        self.prefetch = prefetch
 
         self.stat_type = 'show'
 
@@ -28,45 +32,51 @@ class WSArch(Module):
         self.ifmap_wr_chn = Channel()
         self.psum_wr_chn = Channel()
         self.weights_wr_chn = Channel()
-        self.deserializer = InputDeserializer(self.input_chn, self.ifmap_wr_chn,
-                self.weights_wr_chn, self.psum_wr_chn, arr_x, arr_y,
-                chn_per_word)
-
         self.psum_output_chn = Channel()
-        self.serializer = OutputSerializer(self.output_chn, self.psum_output_chn)
+        if prefetch:
+            # A DMA loads the next pass into the other half of the
+            # ping-pong GLBs while the array works on the current one
+            self.dma = DMA(self.input_chn, self.output_chn, self.ifmap_wr_chn,
+                    self.weights_wr_chn, self.psum_wr_chn,
+                    self.psum_output_chn, arr_x, arr_y, chn_per_word)
+        else:
+            self.deserializer = InputDeserializer(self.input_chn,
+                    self.ifmap_wr_chn, self.weights_wr_chn, self.psum_wr_chn,
+                    arr_x, arr_y, chn_per_word)
+            self.serializer = OutputSerializer(self.output_chn,
+                    self.psum_output_chn)
 
-        # Instantiate GLB and GLB channels
-        self.ifmap_rd_chn = Channel(3)
+        # Instantiate GLB and GLB channels, with glb_outstanding reads in
+        # flight through glb_latency cycle SRAMs as in ws_2d
+        regions = 2 if prefetch else 1
+        glb_outstanding, rd_chn_depth = read_queue(glb_latency,
+                glb_outstanding)
+        self.ifmap_rd_chn = Channel(rd_chn_depth)
         self.ifmap_glb = IFMapGLB(self.ifmap_wr_chn, self.ifmap_rd_chn,
-                ifmap_glb_depth, chn_per_word)
+                ifmap_glb_depth, chn_per_word, regions, glb_latency,
+                glb_outstanding)
 
-        self.psum_rd_chn = Channel(3)
+        self.psum_rd_chn = Channel(rd_chn_depth)
         self.psum_noc_wr_chn = Channel()
         self.psum_glb = PSumGLB(self.psum_wr_chn, self.psum_noc_wr_chn, self.psum_rd_chn,
-                psum_glb_depth, chn_per_word)
+                psum_glb_depth, chn_per_word, regions, glb_latency,
+                glb_outstanding)
 
         self.weights_rd_chn = Channel()
         self.weights_glb = WeightsGLB(self.weights_wr_chn, self.weights_rd_chn)
 
         # PE Array and local channel declaration
         self.pe_array = ModuleList()
-        self.pe_ifmap_chns = ModuleList()
-        self.pe_filter_chns = ModuleList()
+        self.pe_ifmap_chns = ChannelBank((self.arr_y, self.arr_x), 32)
+        self.pe_filter_chns = ChannelBank((self.arr_y, self.arr_x), 32)
         self.pe_psum_chns = ModuleList()
-        self.pe_psum_chns.append(ModuleList())
-        for x in range(self.arr_x):
-            self.pe_psum_chns[0].append(Channel(32))
+        self.pe_psum_chns.append(ChannelBank(self.arr_x, 32))
 
         # Actual array instantiation
         for y in range(self.arr_y):
             self.pe_array.append(ModuleList())
-            self.pe_ifmap_chns.append(ModuleList())
-            self.pe_filter_chns.append(ModuleList())
-            self.pe_psum_chns.append(ModuleList())
+            self.pe_psum_chns.append(ChannelBank(self.arr_x, 32))
             for x in range(self.arr_x):
-                self.pe_ifmap_chns[y].append(Channel(32))
-                self.pe_filter_chns[y].append(Channel(32))
-                self.pe_psum_chns[y+1].append(Channel(32))
                 self.pe_array[y].append(
                     PE(x, y,
                         self.pe_ifmap_chns[y][x],
@@ -88,7 +98,10 @@ class WSArch(Module):
         fmap_per_iteration = image_size[0]*image_size[1]
         num_iteration = filter_size[0]*filter_size[1]
 
-        self.deserializer.configure(image_size)
+        if self.prefetch:
+            self.dma.configure(image_size, filter_size)
+        else:
+            self.deserializer.configure(image_size)
         self.ifmap_glb.configure(image_size, filter_size, in_sets, fmap_per_iteration)
         self.psum_glb.configure(filter_size, out_sets, fmap_per_iteration)
         self.filter_noc.configure(in_sets, self.arr_x)
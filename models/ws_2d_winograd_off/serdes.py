@@ -1,6 +1,7 @@
 from nnsim.module import Module
 from nnsim.reg import Reg
 from nnsim.simulator import Finish
+from nnsim.reference import WINOGRAD_B_T, WINOGRAD_G, WINOGRAD_A_T
 
 import numpy as np
 
@@ -49,18 +50,9 @@ class InputSerializer(Module):
         ifmap_padded = ifmap_padded[:,:,1:5]
 
         # Winograd transforms
-        B_T = np.array([ [1,0,-1,0],
-                     [0,1,1,0],
-                     [0,-1,1,0],
-                     [0,1,0,-1] ])
+        B_T, G, A_T = WINOGRAD_B_T, WINOGRAD_G, WINOGRAD_A_T
         B = B_T.transpose()
-        G = np.array([ [1,0,0],
-                   [0.5,0.5,0.5],
-                   [0.5,-0.5,0.5],
-                   [0,0,1] ])
         G_T = G.transpose()
-        A_T = np.array([ [1,1,1,0],
-                     [0,1,-1,-1] ])
         A = A_T.transpose()
 
         C = 4 # num channels
@@ -245,7 +237,7 @@ class OutputDeserializer(Module):
         self.curr_set = 0
         self.fmap_idx = 0
         self.curr_chn = 0
-        self.A_T = np.array([ [1,1,1,0],[0,1,-1,-1] ])
+        self.A_T = WINOGRAD_A_T
         self.A = self.A_T.transpose()
 
         self.pass_done.wr(False)
@@ -271,7 +263,8 @@ class OutputDeserializer(Module):
                 for t in range(self.num_tiles):
                     x_idx = (t // 2)*2
                     y_idx = (t % 2)*2
-                    self.ofmap_transformed[x_idx:x_idx+2,y_idx:y_idx+2,k] += np.dot(self.A_T,np.dot(self.ofmap[:,:,k,t],self.A))
+                    # U and V both carry a 2**7 scale, removed once per output
+                    self.ofmap_transformed[x_idx:x_idx+2,y_idx:y_idx+2,k] += np.dot(self.A_T,np.dot(self.ofmap[:,:,k,t],self.A))//(128*128)
             self.finish_signal_chn.push(True)
             if np.all(self.ofmap_transformed == self.reference):
                 raise Finish("Success")
@@ -312,5 +305,4 @@ class OutputDeserializer(Module):
                 if self.fmap_idx == fmap_per_iteration:
                     self.fmap_idx = 0
                     self.curr_tile = 0
-                    self.ofmap = self.ofmap//(128*128)
                     self.pass_done.wr(True)
@@ -1,6 +1,7 @@
 from nnsim.module import Module, ModuleList
 from nnsim.reg import Reg
-from nnsim.channel import Channel
+from nnsim.channel import Channel, ChannelBank
+from nnsim.ram import read_queue
 
 from .pe import PE
 from .serdes import InputDeserializer, OutputSerializer
@@ -11,7 +12,7 @@ class WSArch(Module):
     def instantiate(self, arr_x, arr_y,
             input_chn, output_chn,
             chn_per_word,
-            ifmap_glb_depth):
+            ifmap_glb_depth, glb_latency=1, glb_outstanding=None):
         # PE static configuration (immutable)
         self.name = 'chip'
         self.arr_x = arr_x
@@ -35,10 +36,13 @@ class WSArch(Module):
         self.psum_output_chn = Channel()
         self.serializer = OutputSerializer(self.output_chn, self.psum_output_chn)
 
-        # Instantiate GLB and GLB channels
-        self.ifmap_rd_chn = Channel(3)
+        # Instantiate GLB and GLB channels, with glb_outstanding reads in
+        # flight through a glb_latency cycle SRAM as in ws_2d
+        glb_outstanding, rd_chn_depth = read_queue(glb_latency,
+                glb_outstanding)
+        self.ifmap_rd_chn = Channel(rd_chn_depth)
         self.ifmap_glb = IFMapGLB(self.ifmap_wr_chn, self.ifmap_rd_chn,
-                ifmap_glb_depth, chn_per_word)
+                ifmap_glb_depth, chn_per_word, glb_latency, glb_outstanding)
 
         self.psum_rd_chn = Channel(3)
         self.psum_noc_wr_chn = Channel()
@@ -50,23 +54,16 @@ class WSArch(Module):
 
         # PE Array and local channel declaration
         self.pe_array = ModuleList()
-        self.pe_ifmap_chns = ModuleList()
-        self.pe_filter_chns = ModuleList()
+        self.pe_ifmap_chns = ChannelBank((self.arr_y, self.arr_x), 32)
+        self.pe_filter_chns = ChannelBank((self.arr_y, self.arr_x), 32)
         self.pe_psum_chns = ModuleList()
-        self.pe_psum_chns.append(ModuleList())
-        for x in range(self.arr_x):
-            self.pe_psum_chns[0].append(Channel(32))
+        self.pe_psum_chns.append(ChannelBank(self.arr_x, 32))
 
         # Actual array instantiation
         for y in range(self.arr_y):
             self.pe_array.append(ModuleList())
-            self.pe_ifmap_chns.append(ModuleList())
-            self.pe_filter_chns.append(ModuleList())
-            self.pe_psum_chns.append(ModuleList())
+            self.pe_psum_chns.append(ChannelBank(self.arr_x, 32))
             for x in range(self.arr_x):
-                self.pe_ifmap_chns[y].append(Channel(32))
-                self.pe_filter_chns[y].append(Channel(32))
-                self.pe_psum_chns[y+1].append(Channel(32))
                 self.pe_array[y].append(
                     PE(x, y,
                         self.pe_ifmap_chns[y][x],
@@ -1,9 +1,9 @@
 from nnsim.module import Module
-from nnsim.ram import SRAM, RD, WR
-from nnsim.channel import Channel
+from nnsim.ram import SRAM, RequestTracker, RD, WR
 
 class IFMapGLB(Module):
-    def instantiate(self, wr_chn, rd_chn, glb_depth, chn_per_word):
+    def instantiate(self, wr_chn, rd_chn, glb_depth, chn_per_word, latency=1,
+            outstanding=2):
         self.wr_chn = wr_chn
         self.rd_chn = rd_chn
         self.chn_per_word = chn_per_word
@@ -14,8 +14,8 @@ class IFMapGLB(Module):
         self.raw_stats = {'size' : (glb_depth, chn_per_word), 'ifmap_glb_rd': 0, 'ifmap_glb_wr': 0}
 
 
-        self.sram = SRAM(glb_depth, chn_per_word)
-        self.last_read = Channel(3)
+        self.sram = SRAM(glb_depth, chn_per_word, latency=latency)
+        self.tracker = RequestTracker(self.sram, outstanding)
 
         self.image_size = (0, 0)
         self.filter_size = (0, 0)
@@ -37,6 +37,11 @@ class IFMapGLB(Module):
         self.curr_tile = 0
         self.num_tiles = 4
         self.addr = 0
+        self.curr_set = 0
+        self.fmap_idx = 0
+        # Only the words written for this tile group are read back
+        self.num_words = min(self.glb_depth,
+                fmap_per_iteration*self.num_tiles*fmap_sets)
         print ("ifmap glb_size: ", self.glb_depth)
 
     def tick(self):
@@ -68,18 +73,17 @@ class IFMapGLB(Module):
                 if self.fmap_idx == self.fmap_per_iteration:
                     self.wr_done = True
         else:
-            if self.rd_chn.vacancy(1) and self.addr < self.glb_depth:
-                # Read from GLB and deal with SRAM latency
-                self.sram.request(RD, self.addr)
+            # Read from GLB, the tracker covers the SRAM latency
+            if self.addr < self.num_words and \
+                    self.tracker.can_issue(self.rd_chn):
+                self.tracker.read(self.addr)
                 #print ("read_ifmap_glb: ", self.addr)
                 self.addr += 1
-                self.last_read.push(False)
 
-                # Process the last read sent to the GLB SRAM
-            if self.last_read.valid():
+            # Pass on the oldest read once it is back
+            if self.tracker.valid():
                 #print ("ifmap_glb_to_noc")
-                is_zero = self.last_read.pop()
-                data = [e for e in self.sram.response()]
+                data = self.tracker.pop()
                 # print "ifmap rd glb", data
                 self.rd_chn.push(data)
                 self.raw_stats['ifmap_glb_rd'] += len(data)
@@ -1,5 +1,7 @@
 from nnsim.module import Module
 
+import numpy as np
+
 class WeightsNoC(Module):
     def instantiate(self, rd_chn, wr_chns, chn_per_word):
         self.chn_per_word = chn_per_word
@@ -27,17 +29,14 @@ class WeightsNoC(Module):
     def tick(self):
         # Dispatch filters to PE columns. (PE is responsible for pop)
         if self.rd_chn.valid():
-            vacancy = True
             ymin = self.curr_set*self.chn_per_word
             ymax = ymin + self.chn_per_word
-            for y in range(ymin, ymax):
-                vacancy = vacancy and self.wr_chns[y][self.curr_filter].vacancy()
-            if vacancy:
+            group = (slice(ymin, ymax), self.curr_filter)
+            if self.wr_chns.all_vacant(group):
                 data = self.rd_chn.pop()
                 self.raw_stats['noc_multicast'] += len(data)
                 # print "filter_to_pe: ", self.curr_filter, data
-                for y in range(ymin, ymax):
-                    self.wr_chns[y][self.curr_filter].push(data[y])
+                self.wr_chns.multicast_push(group, data)
 
                 self.curr_set += 1
                 if self.curr_set == self.filter_sets:
@@ -76,19 +75,15 @@ class IFMapNoC(Module):
             # Dispatch ifmap read if space is available and not at edge
             ymin = self.curr_set*self.chn_per_word
             ymax = ymin + self.chn_per_word
-            vacancy = True
-            for y in range(ymin, ymax):
-                for x in range(self.arr_x):
-                    vacancy = vacancy and self.wr_chns[y][x].vacancy()
-
-            if vacancy:
+            group = (slice(ymin, ymax), slice(0, self.arr_x))
+            if self.wr_chns.all_vacant(group):
                 data = self.rd_chn.pop()
                 #print ("ifmap noc sends data to PEs: ",data)
                 self.raw_stats['noc_multicast'] += len(data)
                 # print "ifmap_to_pe", ymin, ymax, data
-                for y in range(ymin, ymax):
-                    for x in range(self.arr_x):
-                        self.wr_chns[y][x].push(data[y-ymin])
+                # Each word element goes to every PE in its row
+                self.wr_chns.multicast_push(group,
+                        np.reshape(data, (-1, 1)))
 
                 self.curr_set += 1
                 if self.curr_set == self.ifmap_sets:
@@ -148,14 +143,14 @@ class PreTrIFMapWrNoC(Module):
         self.rd_chn = rd_chn
         self.wr_chns = wr_chns
 
-    def configure(self, arr_x):
+    def configure(self, arr_x, m=2):
         self.arr_x = arr_x
 
         self.num_tiles = 4
         self.curr_tile = 0
 
         self.iteration = 0
-        self.num_iterations = 16 # 4x4 ifmap in
+        self.num_iterations = (m + 2)*(m + 2) # n x n ifmap in
 
     def tick(self):
 
@@ -190,10 +185,10 @@ class PreTrIFMapRdNoC(Module):
         self.rd_chns = rd_chns
         self.output_chn = output_chn
 
-    def configure(self, arr_x):
+    def configure(self, arr_x, m=2):
         self.arr_x = arr_x
 
-        self.num_iterations = 16
+        self.num_iterations = (m + 2)*(m + 2)
         self.num_tiles = 4
 
         self.iteration = 0
@@ -275,14 +270,14 @@ class PreTrWeightsRdNoC(Module):
         self.rd_chns = rd_chns
         self.output_chn = output_chn
 
-    def configure(self, arr_x):
+    def configure(self, arr_x, m=2):
         self.arr_x = arr_x
 
         self.curr_filter = 0
         self.iteration = 0
 
         self.num_filters = 8
-        self.num_iterations = 16
+        self.num_iterations = (m + 2)*(m + 2)
 
     def tick(self):
         valid = True
@@ -317,14 +312,14 @@ class PostTrWrNoC(Module):
         self.rd_chns = rd_chns
         self.wr_chns = wr_chns
 
-    def configure(self, arr_x):
+    def configure(self, arr_x, m=2):
         self.arr_x = arr_x
 
         self.num_tiles = 4
         self.curr_tile = 0
 
         self.iteration = 0
-        self.num_iterations = 16 # 4x4 ofmap in
+        self.num_iterations = (m + 2)*(m + 2) # n x n ofmap in
 
     def tick(self):
 
@@ -365,9 +360,9 @@ class PostTrRdNoC(Module):
         self.rd_chns = rd_chns
         self.output_chn = output_chn
 
-    def configure(self):
+    def configure(self, m=2):
 
-        self.num_iterations = 4
+        self.num_iterations = m*m # m x m ofmap out
 
         self.ofmap_sets = 2
         self.num_tiles = 4
@@ -427,15 +422,10 @@ class PSumRdNoC(Module):
         # Dispatch ZERO if space is available and not at edge
         #xmin = self.curr_set*self.chn_per_word
         #xmax = xmin + self.chn_per_word
-        vacancy = True
-        for x in range(self.arr_x):
-            vacancy = vacancy and self.wr_chns[x].vacancy()
-
-        if vacancy:
+        group = slice(0, self.arr_x)
+        if self.wr_chns.all_vacant(group):
             #self.raw_stats['noc_multicast'] += len(data)
-            for x in range(self.arr_x):
-                self.wr_chns[x].push(0)
-                #print ("psum_to_pe: x, data: ", x, 0)
+            self.wr_chns.broadcast_push(group, 0)
 
 class PSumWrNoC(Module):
     def instantiate(self, rd_chns, output_chn, chn_per_word):
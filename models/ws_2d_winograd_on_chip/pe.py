@@ -1,6 +1,7 @@
 from nnsim.module import Module, HWError
 from nnsim.reg import Reg
 from nnsim.channel import Channel
+from nnsim.fixed import Precision
 
 
 class PE(Module):
@@ -27,8 +28,10 @@ class PE(Module):
         #self.fmap_idx = None
         self.iteration = None
 
-    def configure(self, fmap_per_iteration, num_iteration):
+    def configure(self, fmap_per_iteration, num_iteration, precision=None):
         self.curr_tile = 0
+        # Width of the psum datapath
+        self.precision = Precision() if precision is None else precision
 
         #self.fmap_per_iteration = fmap_per_iteration
         self.num_tiles = 4
@@ -52,7 +55,8 @@ class PE(Module):
                 ifmap = self.ifmap_chn.pop()
                 weight = self.filter_chn.peek()
                 self.raw_stats['pe_rf_rd'] += 1
-                self.psum_out_chn.push(in_psum+ifmap*weight)
+                self.psum_out_chn.push(self.precision.quantize('psum',
+                    in_psum+ifmap*weight))
                 self.raw_stats['pe_mac'] += 1
                 self.raw_stats['pe_chn_push'] += 1
                 #print("PE(%d, %d) fired @ (%d, %d)" % (self.loc_x, self.loc_y, \
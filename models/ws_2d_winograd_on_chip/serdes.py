@@ -31,13 +31,22 @@ class InputSerializer(Module):
         self.bias_idx = 0
         self.weight_idx = 0
 
-    def configure(self, ifmap, weights, bias, image_size, filter_size):
+    def configure(self, ifmap, weights, bias, image_size, filter_size,
+            pixels):
+        # pixels: the (x, y) ifmap positions of the current tile group in
+        # the order the tiler consumes them
         self.ifmap = ifmap
         self.weights = weights
         self.bias = bias
 
         self.image_size = image_size
         self.filter_size = filter_size
+        self.pixels = pixels
+
+        self.fmap_idx = 0
+        self.curr_filter = 0
+        self.weight_idx = 0
+        self.bias_idx = 0
 
         self.bias_wr_done = False
         self.fmap_wr_done = False
@@ -53,7 +62,7 @@ class InputSerializer(Module):
 
 #        in_sets = self.arr_y//self.chn_per_word
 #        out_sets = self.arr_x//self.chn_per_word
-        fmap_per_iteration = self.image_size[0]*self.image_size[1]
+        fmap_per_iteration = len(self.pixels)
         num_iteration = self.filter_size[0]*self.filter_size[1]
         weights_per_filter = self.filter_size[0]*self.filter_size[1]
 
@@ -64,10 +73,9 @@ class InputSerializer(Module):
                 data = np.array([self.bias[k] for k in range(kmin,kmax)])
                 self.bias_idx += 1
                 #print ("input ser kmin,kmax,bias: ",kmin,kmax,data)
-            elif (not self.fmap_wr_done) and self.send_ifmap: # send ifmap
+            elif (not self.fmap_wr_done) and (self.send_ifmap or self.weight_wr_done): # send ifmap
                 # send 4 elements of ifmap
-                x = self.fmap_idx % self.image_size[0]
-                y = self.fmap_idx // self.image_size[0]
+                x, y = self.pixels[self.fmap_idx]
                 cmin = self.curr_set*self.chn_per_word # 0
                 cmax = cmin + self.chn_per_word # 4
                 data = np.array([ self.ifmap[x, y, c] for c in range(cmin, cmax) ])
@@ -94,6 +102,7 @@ class InputSerializer(Module):
                 self.curr_filter = 0
             if self.weight_idx == weights_per_filter:
                 self.weight_wr_done = True
+            if self.weight_wr_done and self.fmap_wr_done:
                 self.pass_done.wr(True)
             if self.bias_idx == self.bias_sets: #2
                 self.bias_wr_done = True
@@ -114,13 +123,14 @@ class InputDeserializer(Module):
         self.weights_chn = weights_chn
         self.bias_chn = bias_chn
 
-        self.image_size = (0, 0)
+        self.fmap_per_iteration = 0
 
         self.fmap_idx = 0
         self.curr_set = 0
 
-    def configure(self, image_size, filter_size):
-        self.image_size = image_size
+    def configure(self, fmap_per_iteration, filter_size):
+        # fmap_per_iteration: ifmap pixels sent for the current tile group
+        self.fmap_per_iteration = fmap_per_iteration
         self.filter_size = filter_size
 
         self.fmap_idx = 0
@@ -138,13 +148,13 @@ class InputDeserializer(Module):
     def tick(self):
         in_sets = self.arr_y//self.chn_per_word # 1
         out_sets = self.arr_x//self.chn_per_word # 2
-        fmap_per_iteration = self.image_size[0]*self.image_size[1]
+        fmap_per_iteration = self.fmap_per_iteration
         weights_per_filter = self.filter_size[0]*self.filter_size[1]
 
         if not self.bias_wr_done:
             target_chn = self.bias_chn
             target_str = "bias"
-        elif (not self.fmap_wr_done) and self.send_ifmap:
+        elif (not self.fmap_wr_done) and (self.send_ifmap or self.weight_wr_done):
             target_chn = self.ifmap_chn
             target_str = 'ifmap'
         else:
@@ -218,47 +228,29 @@ class OutputDeserializer(Module):
 
         self.pass_done = Reg(False)
 
-    def configure(self, ofmap, reference, image_size):#, bias):
- #       self.ofmap = np.zeros((2, 2, self.arr_x, 4)).astype(np.int64) # 2x2x8x4
-        self.ofmap = np.zeros((image_size[0], image_size[1], self.arr_x)).astype(np.int64) # 4x4x8
+    def configure(self, ofmap, reference, tiles, last_pass, m=2):
+        # Collects the m x m outputs of the (tx, ty) tiles of one group into
+        # ofmap; slots without a tile and rows/columns past the edge of the
+        # ofmap are dropped. The ofmap is checked after the last group.
+        self.ofmap = ofmap
         self.reference = reference
-        self.num_tiles = 4
+        self.tiles = tiles
+        self.last_pass = last_pass
+        self.num_tiles = len(tiles)
+        self.m = m
         self.curr_tile = 0
 
-        self.image_size = image_size
-        #self.bias = bias # TODO
-
         self.curr_set = 0
         self.fmap_idx = 0
         self.curr_chn = 0
-        self.A_T = np.array([ [1,1,1,0],[0,1,-1,-1] ])
-        self.A = self.A_T.transpose()
+        self.check = False
 
         self.pass_done.wr(False)
 
     def tick(self):
         if self.pass_done.rd():
-# partly parallelized to be on chip:
-#            x_idx = (self.curr_tile // 2)*2
-#            y_idx = (self.curr_tile % 2)*2
-#            self.ofmap_transformed[x_idx:x_idx+2, y_idx:y_idx+2, self.curr_chn] += np.dot(self.A_T, np.dot(self.ofmap[:,:,self.curr_chn, self.curr_tile],self.A))
-#            self.curr_tile += 1
-#            if self.curr_tile == 4:
-#                self.curr_tile = 0
-#                self.ofmap_transformed[:,:,self.curr_chn] += self.bias[self.curr_chn] # add bias
-#                self.curr_chn += 1
-#            if self.curr_chn == 8:
-#                print ("reference shape: ", self.reference.shape)
-#                print ("ofmap shape: ", self.ofmap.shape)
-
-    # FOR LOOPS USED B/C NOT COUNTING OFF CHIP PROCESSING IN PERFORMANCE STATISTICS (will unroll loops in on chip processing)
-#            for k in range(8):
-#                self.ofmap_transformed[:,:,k] += self.bias[k] # add bias
-#                for t in range(self.num_tiles):
-#                    x_idx = (t // 2)*2
-#                    y_idx = (t % 2)*2
-#                    self.ofmap_transformed[x_idx:x_idx+2,y_idx:y_idx+2,k] += np.dot(self.A_T,np.dot(self.ofmap[:,:,k,t],self.A))
-#            self.finish_signal_chn.push(True)
+            if not self.check:
+                return
             if np.all(self.ofmap == self.reference):
                 raise Finish("Success")
             else:
@@ -273,34 +265,29 @@ class OutputDeserializer(Module):
         else:
             #print ("output deser curr_tile, fmap_idx: ", self.curr_tile, self.fmap_idx)
             out_sets = self.arr_x//self.chn_per_word # 2
-            fmap_per_iteration = 4 # ofmap size, parametrize .. TODO
+            fmap_per_iteration = self.m*self.m # m x m outputs per tile
 
             if self.arch_output_chn.valid():
                 data = [e for e in self.arch_output_chn.pop()]
 
-                x_idx = (self.curr_tile // 2)*2
-                y_idx = (self.curr_tile % 2)*2
-                x = (self.fmap_idx % 2) + x_idx
-                y = self.fmap_idx // 2 + y_idx
-
-#                    self.ofmap_transformed[x_idx:x_idx+2,y_idx:y_idx+2,k] += np.dot(self.A_T,np.dot(self.ofmap[:,:,k,t],self.A))
-
-                if self.curr_set < out_sets:
-                    cmin = self.curr_set*self.chn_per_word
-                    cmax = cmin + self.chn_per_word
-                    for c in range(cmin, cmax):
-                        self.ofmap[x, y, c] = data[c-cmin]
+                tile = self.tiles[self.curr_tile]
+                if tile is not None:
+                    x = (self.fmap_idx % self.m) + self.m*tile[0]
+                    y = self.fmap_idx // self.m + self.m*tile[1]
+                    if x < self.ofmap.shape[0] and y < self.ofmap.shape[1]:
+                        cmin = self.curr_set*self.chn_per_word
+                        cmax = cmin + self.chn_per_word
+                        self.ofmap[x, y, cmin:cmax] = data
                 self.curr_set += 1
 
                 if self.curr_set == out_sets:
                     self.curr_set = 0
-                    #self.fmap_idx += 1
                     self.curr_tile += 1
-                if self.curr_tile == 4:
+                if self.curr_tile == self.num_tiles:
                     self.fmap_idx += 1
                     self.curr_tile = 0
                 if self.fmap_idx == fmap_per_iteration:
                     self.fmap_idx = 0
                     self.curr_tile = 0
-                   # self.ofmap = self.ofmap//(128*128)
                     self.pass_done.wr(True)
+                    self.check = self.last_pass
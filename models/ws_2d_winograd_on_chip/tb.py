@@ -2,23 +2,51 @@ from nnsim.module import Module
 from nnsim.channel import Channel
 from .ws import WSArch
 from .stimulus import Stimulus
+from .tiler import NUM_TILES, tile_groups
 from nnsim.reg import Reg
+from nnsim.costs import CostModel
+from nnsim.fixed import Precision
+from nnsim.winograd import default_frac_bits
 
-ALU_ENERGY_FACTOR = 1 # reference
-RF_ENERGY_FACTOR = 1
-PE_ENERGY_FACTOR = 2
-GLB_ENERGY_FACTOR = 6
-DRAM_ENERGY_FACTOR = 200
+# Datapath stage (see nnsim.fixed.Precision) whose width sets the energy of
+# the ALU ops and RF accesses counted under a stat key prefix. The PEs keep
+# weights in their RF, multiply ifmap and weight and accumulate psums.
+STAGE_OF_STAT = (('pre_tr_ifmap_', 'ifmap'), ('pre_tr_weights_', 'weight'),
+        ('post_tr_', 'psum'))
 
 class WSArchTB(Module):
-    def instantiate(self):
+    def instantiate(self, image_size=(4, 4), filter_size=(3, 3), in_chn=4,
+            out_chn=8, chn_per_word=4, ifmap_glb_depth=None, mode="same",
+            m=2, frac_bits=None, precision=None, cost_model=None,
+            glb_latency=1, glb_outstanding=None):
+        # Winograd F(m x m, 3x3). Images larger than one group of four
+        # tiles (2m x 2m outputs) run as one pass per group. frac_bits of
+        # the transformed weights default to enough for m (see
+        # nnsim.winograd.default_frac_bits). precision
+        # (nnsim.fixed.Precision) sets the datapath widths, which also
+        # scale the compute and RF energy of cost_model (nnsim.costs).
+        # glb_latency/glb_outstanding: read latency of the ifmap GLB SRAM
+        # and reads kept in flight, as in ws_2d.
+        if (tuple(filter_size), in_chn, out_chn, chn_per_word) != \
+                ((3, 3), 4, 8, 4):
+            # Any image size, but the serializers hard-code the channels
+            raise ValueError("%s only supports a 3x3 filter, in_chn=4, "
+                    "out_chn=8 and chn_per_word=4" % __package__)
         self.name = 'tb'
-        self.image_size = (4, 4)
-        self.filter_size = (3, 3)
-        self.in_chn = 4
-        self.out_chn = 8
-        self.chn_per_word = 4
-        self.num_tiles = 4
+        self.image_size = image_size
+        self.filter_size = filter_size
+        self.in_chn = in_chn
+        self.out_chn = out_chn
+        self.chn_per_word = chn_per_word
+        self.num_tiles = NUM_TILES
+        self.mode = mode
+        self.pad = 1 if mode == "same" else 0
+        self.m = m
+        self.frac_bits = default_frac_bits(m) if frac_bits is None \
+                else frac_bits
+        self.precision = Precision() if precision is None else precision
+        self.groups = tile_groups(self.image_size, self.pad, self.m)
+        self.curr_pass = 0
 
         self.arr_x = self.out_chn
         self.arr_y = self.in_chn
@@ -31,7 +59,9 @@ class WSArchTB(Module):
         self.stat_type = 'show'
         self.raw_stats = {}
 
-        ifmap_glb_depth = self.image_size[0]*self.image_size[1]*self.num_tiles*self.in_chn//self.chn_per_word
+        if ifmap_glb_depth is None:
+            # One group of transformed tiles, whatever the image size
+            ifmap_glb_depth = (m + 2)*(m + 2)*self.num_tiles*self.in_chn//self.chn_per_word
         # psum_glb_depth = self.image_size[0]*self.image_size[1]*self.out_chn//self.chn_per_word
         print("ifmap glb depth:", ifmap_glb_depth)
         print("weight glb depth: 0")
@@ -39,99 +69,38 @@ class WSArchTB(Module):
         self.stimulus = Stimulus(self.arr_x, self.arr_y, self.chn_per_word,
             self.input_chn, self.output_chn, self.finish_signal_chn)
         self.dut = WSArch(self.arr_x, self.arr_y, self.input_chn,
-                self.output_chn, self.chn_per_word, ifmap_glb_depth)
+                self.output_chn, self.chn_per_word, ifmap_glb_depth,
+                glb_latency, glb_outstanding)
+
+        # Compute and RF energy at the width of each datapath stage
+        self.cost_model = CostModel().init() if cost_model is None \
+                else cost_model
+        width = lambda stage: self.precision.width(stage,
+                self.cost_model.args['bitwidth'])
+        self.cost_models = [ (prefix, self.cost_model.derive(
+            bitwidth=width(stage))) for prefix, stage in STAGE_OF_STAT ]
+        self.cost_models.append(('pe_', self.cost_model.derive(
+            bitwidth=width('weight'),
+            mul_bitwidth=max(width('ifmap'), width('weight')),
+            acc_bitwidth=width('psum'))))
 
         self.configuration_done = False
 
     def tick(self):
+        # The next tile group starts once the last one has left the chip
+        if self.stimulus.deserializer.pass_done.rd() and \
+                self.configuration_done and \
+                self.curr_pass + 1 < len(self.groups):
+            self.curr_pass += 1
+            self.configuration_done = False
         if not self.configuration_done:
-            self.stimulus.configure(self.image_size, self.filter_size, self.in_chn, self.out_chn)
-            self.dut.configure(self.image_size, self.filter_size, self.in_chn, self.out_chn)
+            self.stimulus.configure(self.image_size, self.filter_size, self.in_chn, self.out_chn, self.groups, self.curr_pass, self.mode, self.m, self.frac_bits, self.precision)
+            self.dut.configure(self.image_size, self.filter_size, self.in_chn, self.out_chn, self.groups[self.curr_pass], self.pad, self.m, self.frac_bits, self.precision)
             self.configuration_done = True
 
-        noc_multicast_list = [] # list of (sub_module, key) tuples for NoC multicasts
-        memory_access_list = [] # list of (sub_module, key) tuples for memory access stats
-        pe_mac_comp_list = [] # list of (sub_module, key) tuples for PE MAC stats
-        tr_alu_comp_list = [] # list of (sub_module, key) tuples for ALU computation stats
-
-        ###  collect (sub_module, key) for the comp/memory stats we wish to aggregate
-
-        for sub_module in (self.dut.sub_modules + self.stimulus.sub_modules):
-            sub_module_stats = sub_module.raw_stats
-            for key in sub_module_stats:
-                if (key.find('pe_mac') != -1):
-                    pe_mac_comp_list.append((sub_module, key))
-                if (key.find('alu_comp') != -1):
-                    tr_alu_comp_list.append((sub_module, key))
-                if (key.find('rd') != -1) or (key.find('wr') != -1):
-                    memory_access_list.append((sub_module, key))
-                if (key.find('noc') != -1):
-                    noc_multicast_list.append((sub_module, key))
-
-        ### aggregate PE MAC comp stats; find PE computation energy
-
-        total_pe_mac_comp = 0
-        for tup in pe_mac_comp_list:
-            sub_module, key = tup[0], tup[1]
-            total_pe_mac_comp += sub_module.raw_stats[key]
-
-        self.raw_stats['pe_comp_energy'] = total_pe_mac_comp * 2 * ALU_ENERGY_FACTOR
-
-        ### aggregate transform ALU comp stats; find transform ALU computation rf_energy
-
-        total_tr_alu_comp = 0
-        for tup in tr_alu_comp_list:
-            sub_module, key = tup[0], tup[1]
-            total_tr_alu_comp += sub_module.raw_stats[key]
-
-        self.raw_stats['tr_alu_comp_energy'] = total_tr_alu_comp * 1 * ALU_ENERGY_FACTOR
-
-        ### aggregate memory access stats for each type of memory access
-
-        dram_mem_acc = 0
-        glb_mem_acc = 0
-        rf_mem_acc = 0
-
-        for tup in memory_access_list:
-            sub_module, key = tup[0], tup[1]
-            if (key.find('dram') != -1):
-                dram_mem_acc += sub_module.raw_stats[key]
-            if (key.find('glb') != -1):
-                glb_mem_acc += sub_module.raw_stats[key]
-            if (key.find('rf') != -1):
-                rf_mem_acc += sub_module.raw_stats[key]
-
-        self.raw_stats['dram_mem_acc'] = dram_mem_acc
-        self.raw_stats['glb_mem_acc'] = glb_mem_acc
-        self.raw_stats['rf_mem_acc'] = rf_mem_acc
-
-        self.raw_stats['total_mem_acc'] = self.raw_stats['dram_mem_acc'] + \
-                self.raw_stats['glb_mem_acc'] + self.raw_stats['rf_mem_acc']
-
-        ### aggregate channel usage stats for NoC multicasts
-
-        noc_multicasts = 0
-
-        for tup in noc_multicast_list:
-            sub_module, key = tup[0], tup[1]
-            noc_multicasts += sub_module.raw_stats[key]
-
-        self.raw_stats['total_noc_multicasts'] = noc_multicasts
-
-
-        ### scale memory access stats by energy factors to determine the energy stats
-
-        self.raw_stats['dram_energy'] = self.raw_stats['dram_mem_acc'] * DRAM_ENERGY_FACTOR
-        self.raw_stats['glb_energy'] = self.raw_stats['glb_mem_acc'] * GLB_ENERGY_FACTOR
-        self.raw_stats['rf_energy'] = self.raw_stats['rf_mem_acc'] * RF_ENERGY_FACTOR
-
-        self.raw_stats['data_energy'] = self.raw_stats['dram_energy'] + \
-                self.raw_stats['glb_energy'] + self.raw_stats['rf_energy']
-
-        self.raw_stats['comp_energy'] = self.raw_stats['pe_comp_energy'] + self.raw_stats['tr_alu_comp_energy']
-
-        ### total energy = data energy + comp energy
-        self.raw_stats['total_energy'] = self.raw_stats['data_energy'] + self.raw_stats['comp_energy']
+        self.raw_stats.update(self.cost_model.stats([sub_module.raw_stats
+            for sub_module in self.dut.sub_modules + self.stimulus.sub_modules],
+            self.cost_models))
 
 
 if __name__ == "__main__":
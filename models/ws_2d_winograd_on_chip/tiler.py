@@ -1,9 +1,64 @@
 from nnsim.module import Module
 
+# The chip has NUM_TILES rows of pre/post transform units, so an ifmap is
+# processed in groups of up to four overlapping n x n tiles (n = m + 2 for
+# Winograd F(m x m, 3x3), stride m): a 2x2 block of tiles, i.e. a
+# (2m + 2) x (2m + 2) window of the padded ifmap giving a 2m x 2m block of
+# the ofmap. Only one group is on chip at a time, so storage does not grow
+# with the image. Tiles are indexed (tx, ty) like the reference
+# winograd_conv, the slot of a tile within its group is
+# (tx % 2)*2 + ty % 2.
+
+NUM_TILES = 4
+
+def tile_counts(image_size, pad, m=2):
+    # Number of tiles along x and y covering the (H+2*pad-2, W+2*pad-2) ofmap
+    return tuple(-(-(image_size[i] + 2*pad - 2)//m) for i in range(2))
+
+def tile_groups(image_size, pad, m=2):
+    # [[(tx, ty) or None]*NUM_TILES, ...] in processing order. Slots past
+    # the edge of the ofmap are None and get all-zero input.
+    tiles_x, tiles_y = tile_counts(image_size, pad, m)
+    groups = []
+    for gx in range(0, tiles_x, 2):
+        for gy in range(0, tiles_y, 2):
+            groups.append([ (gx + i//2, gy + i % 2)
+                            if gx + i//2 < tiles_x and gy + i % 2 < tiles_y
+                            else None for i in range(NUM_TILES) ])
+    return groups
+
+def tile_routing(image_size, tiles, pad, m=2):
+    # Routing table of one group. Returns the ifmap pixels the group reads
+    # in stream order (y outer, x inner), the tile slots each of them goes
+    # to, and per slot which of its n*n elements (row = y, column = x
+    # offset) are zero padding instead of pixels.
+    n = m + 2
+    pixels = []
+    zero = []
+    for tile in tiles:
+        zero.append([True]*(n*n))
+        if tile is None:
+            continue
+        x0, y0 = m*tile[0] - pad, m*tile[1] - pad
+        for e in range(n*n):
+            x, y = x0 + e % n, y0 + e//n
+            if 0 <= x < image_size[0] and 0 <= y < image_size[1]:
+                zero[-1][e] = False
+                pixels.append((y, x))
+
+    pixels = sorted(set(pixels))
+    tile_chn_list = []
+    for y, x in pixels:
+        tile_chn_list.append([ t for t, tile in enumerate(tiles)
+            if tile is not None and
+            0 <= x - (m*tile[0] - pad) < n and
+            0 <= y - (m*tile[1] - pad) < n ])
+    return [ (x, y) for y, x in pixels ], tile_chn_list, zero
 
 class IFMapTiler(Module):
 
-    # tiles a padded 4x4 array (essentially a 6x6 array) into four 4x4 tiles
+    # Splits the stream of ifmap pixels of one group into its (up to) four
+    # n x n tiles, inserting the zero padding each tile needs
 
     def instantiate(self, wr_chn, rd_chns, chn_per_word):
         self.wr_chn = wr_chn
@@ -15,38 +70,22 @@ class IFMapTiler(Module):
         self.stat_type = 'show'
         self.raw_stats = {'noc_multicast' : 0}
 
-    def configure(self, arr_x):
-        self.tile_fmap_idx = [0, 0, 0, 0] # fmap idx for each of the four tiles
-        self.tile_done = [False, False, False, False]
-        self.num_tile_elem = 16 # tiles are 4x4 -- contain 16 elems
+    def configure(self, arr_x, image_size, tiles, pad, m=2):
+        self.tile_fmap_idx = [0]*NUM_TILES # fmap idx for each of the four tiles
+        self.tile_done = [False]*NUM_TILES
+        self.num_tile_elem = (m + 2)*(m + 2) # tiles are n x n, n = m + 2
 
         self.arr_x = arr_x
 
         self.curr_tile = 0
         self.popped_ifmap_idx = 0
 
-        self.num_tiles = 4
-
-        # list appropriate tile chns for each of the 16
-        # nonzero elements in the padded 4x4 ifmap
-
-        self.tile_chn_list = [[0],
-                            [0, 2],
-                            [0, 2],
-                            [2],
-                            [0, 1],
-                            [0, 1, 2, 3],
-                            [0, 1, 2, 3],
-                            [2, 3],
-                            [0, 1],
-                            [0, 1, 2, 3],
-                            [0, 1, 2, 3],
-                            [2, 3],
-                            [1],
-                            [1, 3],
-                            [1, 3],
-                            [3]]
+        self.num_tiles = NUM_TILES
 
+        # tile chns for each ifmap pixel of the group and the zero padded
+        # elements of every tile
+        _, self.tile_chn_list, self.tile_zero = tile_routing(image_size,
+                tiles, pad, m)
 
     def tick(self):
 
@@ -57,13 +96,11 @@ class IFMapTiler(Module):
 
         for tile in range(self.num_tiles):
 
-            sending_zero_to_tile = [(tile == 0) and (not self.tile_done[0]) and ((self.tile_fmap_idx[0] < 4) or ((self.tile_fmap_idx[0] > 0) and ((self.tile_fmap_idx[0] % 4) == 0))),
-                                (tile == 1) and (not self.tile_done[1]) and ((self.tile_fmap_idx[1] > 11) or ((self.tile_fmap_idx[1] >= 0) and ((self.tile_fmap_idx[1] % 4) == 0))),
-                                (tile == 2) and (not self.tile_done[2]) and ((self.tile_fmap_idx[2] < 4) or ((self.tile_fmap_idx[2] > 0) and (((self.tile_fmap_idx[2]+1) % 4) == 0))),
-                                (tile == 3) and (not self.tile_done[3]) and ((self.tile_fmap_idx[3] > 11) or ((self.tile_fmap_idx[3] > 0) and (((self.tile_fmap_idx[3]+1) % 4) == 0)))]
+            sending_zero_to_tile = (not self.tile_done[tile]) and \
+                    self.tile_zero[tile][self.tile_fmap_idx[tile]]
 
-            will_pop_ifmap_value = will_pop_ifmap_value and (not sending_zero_to_tile[tile])
-            if sending_zero_to_tile[tile]:
+            will_pop_ifmap_value = will_pop_ifmap_value and (not sending_zero_to_tile)
+            if sending_zero_to_tile:
                 # check vacancy, push to tile, increment tile's tile_fmap_idx
                 vacancy = True
                 for x in range(self.arr_x):
@@ -1,11 +1,13 @@
 from nnsim.module import Module, ModuleList
 from nnsim.reg import Reg
-from nnsim.channel import Channel
+from nnsim.channel import Channel, ChannelBank
+from nnsim.ram import read_queue
 
 from .pe import PE
 from .pre_transform_ifmap import PreTransformIFMap
 from .pre_transform_weight import PreTransformWeights
-from .tiler import IFMapTiler
+from .tiler import IFMapTiler, NUM_TILES, tile_groups, tile_routing
+from nnsim.winograd import FRAC_BITS
 from .post_transform import PostTransform
 from .serdes import InputDeserializer, OutputSerializer
 from .glb import IFMapGLB, WeightsGLB, BiasGLB
@@ -16,7 +18,7 @@ class WSArch(Module):
     def instantiate(self, arr_x, arr_y,
             input_chn, output_chn,
             chn_per_word,
-            ifmap_glb_depth):
+            ifmap_glb_depth, glb_latency=1, glb_outstanding=None):
         # PE static configuration (immutable)
         self.name = 'chip'
         self.arr_x = arr_x
@@ -24,10 +26,10 @@ class WSArch(Module):
         self.chn_per_word = chn_per_word
 
         self.post_tr_x = arr_x # num output channels = 8
-        self.post_tr_y = 4 # num tiles = 4
+        self.post_tr_y = NUM_TILES # num tiles = 4
 
         self.pre_tr_ifmap_x = arr_y # num input channels = 4
-        self.pre_tr_ifmap_y = 4 # num tiles = 4
+        self.pre_tr_ifmap_y = NUM_TILES # num tiles = 4
 
         self.pre_tr_weights_x = arr_y # num input channels = 4
         self.pre_tr_weights_y = arr_x # num output channels = 8
@@ -49,11 +51,14 @@ class WSArch(Module):
         self.psum_output_chn = Channel()
         self.serializer = OutputSerializer(self.output_chn, self.psum_output_chn)
 
-        # Instantiate GLB and GLB channels
+        # Instantiate GLB and GLB channels, with glb_outstanding reads in
+        # flight through a glb_latency cycle SRAM as in ws_2d
+        glb_outstanding, rd_chn_depth = read_queue(glb_latency,
+                glb_outstanding)
         self.ifmap_glb_wr_chn = Channel(3)
-        self.ifmap_rd_chn = Channel(3)
+        self.ifmap_rd_chn = Channel(rd_chn_depth)
         self.ifmap_glb = IFMapGLB(self.ifmap_glb_wr_chn, self.ifmap_rd_chn,
-                ifmap_glb_depth, chn_per_word)
+                ifmap_glb_depth, chn_per_word, glb_latency, glb_outstanding)
 
         self.psum_rd_chn = Channel(3)
         self.psum_noc_wr_chn = Channel()
@@ -69,23 +74,16 @@ class WSArch(Module):
 
         # PE Array and local channel declaration
         self.pe_array = ModuleList()
-        self.pe_ifmap_chns = ModuleList()
-        self.pe_filter_chns = ModuleList()
+        self.pe_ifmap_chns = ChannelBank((self.arr_y, self.arr_x), 32)
+        self.pe_filter_chns = ChannelBank((self.arr_y, self.arr_x), 32)
         self.pe_psum_chns = ModuleList()
-        self.pe_psum_chns.append(ModuleList())
-        for x in range(self.arr_x):
-            self.pe_psum_chns[0].append(Channel(32))
+        self.pe_psum_chns.append(ChannelBank(self.arr_x, 32))
 
         # Actual PE array instantiation
         for y in range(self.arr_y):
             self.pe_array.append(ModuleList())
-            self.pe_ifmap_chns.append(ModuleList())
-            self.pe_filter_chns.append(ModuleList())
-            self.pe_psum_chns.append(ModuleList())
+            self.pe_psum_chns.append(ChannelBank(self.arr_x, 32))
             for x in range(self.arr_x):
-                self.pe_ifmap_chns[y].append(Channel(32))
-                self.pe_filter_chns[y].append(Channel(32))
-                self.pe_psum_chns[y+1].append(Channel(32))
                 self.pe_array[y].append(
                     PE(x, y,
                         self.pe_ifmap_chns[y][x],
@@ -179,13 +177,22 @@ class WSArch(Module):
         self.pre_tr_weights_wr_noc = PreTrWeightsWrNoC(self.weights_wr_chn, self.pre_tr_weights_in_chns, self.chn_per_word)
         self.pre_tr_weights_rd_noc = PreTrWeightsRdNoC(self.pre_tr_weights_out_chns, self.weights_glb_wr_chn, self.chn_per_word)
 
-    def configure(self, image_size, filter_size, in_chn, out_chn):
+    def configure(self, image_size, filter_size, in_chn, out_chn, tiles=None,
+            pad=1, m=2, frac_bits=FRAC_BITS, precision=None):
+        # One group of (up to) four F(m x m, 3x3) tiles per configuration,
+        # the first one by default (the whole ofmap of a 4x4 image).
+        # precision (nnsim.fixed.Precision) sets the datapath widths.
+        if tiles is None:
+            tiles = tile_groups(image_size, pad, m)[0]
+        pixels, _, _ = tile_routing(image_size, tiles, pad, m)
+
         in_sets = self.arr_y//self.chn_per_word
         out_sets = self.arr_x//self.chn_per_word
-        fmap_per_iteration = image_size[0]*image_size[1]
-        num_iteration = image_size[0]*image_size[1]
+        # Every one of the n*n transformed tile elements is one iteration
+        fmap_per_iteration = (m + 2)*(m + 2)
+        num_iteration = (m + 2)*(m + 2)
 
-        self.deserializer.configure(image_size, filter_size)
+        self.deserializer.configure(len(pixels), filter_size)
         self.ifmap_glb.configure(image_size, filter_size, in_sets, fmap_per_iteration)
         #   self.psum_glb.configure(filter_size, out_sets, fmap_per_iteration)
         self.filter_noc.configure(in_sets, self.arr_x)
@@ -194,31 +201,33 @@ class WSArch(Module):
         self.psum_rd_noc.configure(self.arr_x)
         #self.psum_wr_noc.configure(num_iteration, fmap_per_iteration, out_sets)
 
-        self.post_tr_wr_noc.configure(self.post_tr_x)
-        self.post_tr_rd_noc.configure()
+        self.post_tr_wr_noc.configure(self.post_tr_x, m)
+        self.post_tr_rd_noc.configure(m)
 
-        self.ifmap_tiler.configure(self.pre_tr_ifmap_x)
+        self.ifmap_tiler.configure(self.pre_tr_ifmap_x, image_size, tiles, pad, m)
 
         #self.pre_tr_ifmap_wr_noc.configure(self.pre_tr_ifmap_x)
-        self.pre_tr_ifmap_rd_noc.configure(self.pre_tr_ifmap_x)
+        self.pre_tr_ifmap_rd_noc.configure(self.pre_tr_ifmap_x, m)
         self.pre_tr_weights_wr_noc.configure(self.pre_tr_weights_x)
-        self.pre_tr_weights_rd_noc.configure(self.pre_tr_weights_x)
+        self.pre_tr_weights_rd_noc.configure(self.pre_tr_weights_x, m)
 
         for y in range(self.arr_y):
             for x in range(self.arr_x):
-                self.pe_array[y][x].configure(fmap_per_iteration, num_iteration)
+                self.pe_array[y][x].configure(fmap_per_iteration, num_iteration,
+                        precision)
 
         for y in range(self.pre_tr_ifmap_y):
             for x in range(self.pre_tr_ifmap_x):
-                self.pre_tr_ifmap_array[y][x].configure()
+                self.pre_tr_ifmap_array[y][x].configure(m, precision)
 
         for y in range(self.pre_tr_weights_y):
             for x in range(self.pre_tr_weights_x):
-                self.pre_tr_weights_array[y][x].configure()
+                self.pre_tr_weights_array[y][x].configure(m, frac_bits,
+                        precision)
 
         for y in range(self.post_tr_y):
             for x in range(self.post_tr_x):
-                self.post_tr_array[y][x].configure()
+                self.post_tr_array[y][x].configure(m, frac_bits, precision)
 
         print("Num PEs: ",self.arr_x*self.arr_y)
         print("Num pre transform ifmap blocks: ", self.pre_tr_ifmap_x*self.pre_tr_ifmap_y)
@@ -1,6 +1,7 @@
 from nnsim.module import Module
 from nnsim.reg import Reg
 from nnsim.simulator import Finish
+from nnsim.reference import WINOGRAD_B_T, WINOGRAD_G, WINOGRAD_A_T
 
 import numpy as np
 
@@ -56,18 +57,9 @@ class InputSerializer(Module):
         ifmap_padded = ifmap_padded[:,:,1:5]
         
         # Winograd transforms
-        B_T = np.array([ [1,0,-1,0],
-                     [0,1,1,0],
-                     [0,-1,1,0],
-                     [0,1,0,-1] ])
+        B_T, G, A_T = WINOGRAD_B_T, WINOGRAD_G, WINOGRAD_A_T
         B = B_T.transpose()
-        G = np.array([ [1,0,0],
-                   [0.5,0.5,0.5],
-                   [0.5,-0.5,0.5],
-                   [0,0,1] ])
         G_T = G.transpose()
-        A_T = np.array([ [1,1,1,0],
-                     [0,1,-1,-1] ])
         A = A_T.transpose()
         
         C = 4 # num channels
@@ -278,7 +270,7 @@ class OutputDeserializer(Module):
         self.curr_set = 0
         self.fmap_idx = 0
         self.curr_chn = 0
-        self.A_T = np.array([ [1,1,1,0],[0,1,-1,-1] ])
+        self.A_T = WINOGRAD_A_T
         self.A = self.A_T.transpose()
 
         self.pass_done.wr(False)
@@ -0,0 +1,169 @@
+import hashlib
+import inspect
+import os
+import pickle
+
+import numpy as np
+
+import nnsim.module
+from nnsim.simulator import Simulator
+from nnsim.results import collect_stats
+
+# On-disk memoization of testbench runs. A run is identified by the source
+# of the model variant (every .py file next to the testbench) and of nnsim
+# itself, the testbench parameters (and any input files they name), the
+# RNG seed and the tick limit, so editing any of them invalidates the entry
+# without manual bookkeeping.
+
+ENTRY_EXT = ".pkl"
+
+def source_hash(path, h=None):
+    if h is None:
+        h = hashlib.sha256()
+    for name in sorted(os.listdir(path)):
+        if name.endswith('.py'):
+            h.update(name.encode())
+            with open(os.path.join(path, name), 'rb') as f:
+                h.update(f.read())
+    return h
+
+def file_signatures(value, signatures):
+    # Parameters may name input files (e.g. layer tensors); their size and
+    # mtime stand in for the contents, which can be hundreds of MB
+    if isinstance(value, dict):
+        for key in sorted(value):
+            file_signatures(value[key], signatures)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            file_signatures(v, signatures)
+    elif isinstance(value, str) and os.path.isfile(value):
+        st = os.stat(value)
+        signatures.append((value, st.st_size, st.st_mtime_ns))
+    return signatures
+
+class ResultCache(object):
+    def __init__(self, path, max_entries=None, max_bytes=None):
+        # Least recently used entries are evicted once the cache holds more
+        # than max_entries runs or max_bytes on disk. The directory is only
+        # listed when a running count of the entries (resynced on every
+        # eviction, other processes may share the cache) exceeds a bound.
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.num_entries = None
+        self.num_bytes = None
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def key(self, tb_class, params, seed, nticks):
+        h = source_hash(os.path.dirname(inspect.getfile(tb_class)))
+        source_hash(os.path.dirname(nnsim.module.__file__), h)
+        h.update(repr((tb_class.__qualname__, sorted(params.items()), seed,
+            nticks, file_signatures(params, []))).encode())
+        return h.hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.path, key + ENTRY_EXT)
+
+    def entries(self):
+        return [ os.path.join(self.path, n) for n in os.listdir(self.path)
+                 if n.endswith(ENTRY_EXT) ]
+
+    def get(self, key):
+        # Raises KeyError on a miss, any stored value (None included) is a hit
+        try:
+            with open(self.entry(key), 'rb') as f:
+                result = pickle.load(f)
+            # Reading an entry makes it the most recently used one
+            os.utime(self.entry(key))
+        except (OSError, EOFError, pickle.UnpicklingError):
+            # Missing, half written or evicted by another process meanwhile
+            raise KeyError(key)
+        return result
+
+    def put(self, key, result):
+        # Concurrent workers may store the same key; rename is atomic so
+        # the last writer wins with a complete entry
+        tmp = "%s.%d.tmp" % (self.entry(key), os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump(result, f)
+        size = os.path.getsize(tmp)
+        try:
+            replaced = os.path.getsize(self.entry(key))
+        except OSError:
+            replaced = None
+        os.replace(tmp, self.entry(key))
+
+        if self.max_entries is None and self.max_bytes is None:
+            return
+        if self.num_entries is None:
+            self.evict()
+            return
+        if replaced is None:
+            self.num_entries += 1
+            self.num_bytes += size
+        else:
+            self.num_bytes += size - replaced
+        if (self.max_entries is not None and
+                self.num_entries > self.max_entries) or \
+                (self.max_bytes is not None and
+                self.num_bytes > self.max_bytes):
+            self.evict()
+
+    def evict(self):
+        if self.max_entries is None and self.max_bytes is None:
+            return
+        entries = []
+        for entry in self.entries():
+            try:
+                st = os.stat(entry)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        while entries and \
+                ((self.max_entries is not None and \
+                    len(entries) > self.max_entries) or \
+                 (self.max_bytes is not None and total > self.max_bytes)):
+            _, size, entry = entries.pop(0)
+            total -= size
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+        self.num_entries = len(entries)
+        self.num_bytes = total
+
+    def clear(self):
+        for entry in self.entries():
+            os.remove(entry)
+
+def run_tb_cached(cache, tb_class, params=None, seed=0, nticks=None,
+        compiled=True):
+    # Simulate tb_class(**params) to completion, or return the stored
+    # result of an identical earlier run. The result holds clk_ticks, the
+    # Finish message and the flattened final_stats. Only finished runs are
+    # stored: one cut off by nticks or interrupted is simulated again.
+    if params is None:
+        params = {}
+    if cache is not None:
+        key = cache.key(tb_class, params, seed, nticks)
+        try:
+            return cache.get(key)
+        except KeyError:
+            pass
+
+    np.random.seed(seed)
+    tb = tb_class(**params)
+    sim = Simulator(tb, False, compiled)
+    sim.reset()
+    sim.run(nticks)
+    tb.finalize_stats()
+
+    result = { 'clk_ticks' : sim.clk_ticks, 'finish_msg' : sim.finish_msg,
+               'stats' : collect_stats(tb) }
+    if cache is not None and sim.finish_msg is not None:
+        cache.put(key, result)
+    return result
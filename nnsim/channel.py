@@ -1,5 +1,6 @@
 from nnsim.module import Module, HWError
 from nnsim.reg import Reg
+import numpy as np
 
 class ChannelError(HWError):
     pass
@@ -43,6 +44,266 @@ class Channel(Module):
         # Use with care since it conflicts with enq and deq
         self.rd_ptr.wr(self.wr_ptr.rd())
 
+class ChannelBank(Module):
+    # Identical channels sharing one data ring and pointer vectors. Pointer
+    # updates are staged and committed in __ntick__, just like the Regs
+    # inside a Channel. shape may be an int or a tuple (e.g. (arr_y, arr_x));
+    # bank[y][x] hands out a view with the Channel API, while the group
+    # methods take a NumPy basic index (ints/slices) over that shape and
+    # act on every selected channel in one call.
+    def instantiate(self, shape, depth=2, dtype=object):
+        self.shape = shape if isinstance(shape, tuple) else (shape,)
+        self.n = int(np.prod(self.shape))
+        self.depth = depth
+        self.data = np.zeros((self.n, depth), dtype=dtype)
+
+        self.rd_ptr = np.zeros(self.n, dtype=np.int64)
+        self.wr_ptr = np.zeros(self.n, dtype=np.int64)
+        self.occupancy = np.zeros(self.n, dtype=np.int64)
+
+        # Staged pointer writes
+        self.rd_nxt = np.zeros(self.n, dtype=np.int64)
+        self.wr_nxt = np.zeros(self.n, dtype=np.int64)
+        self.rd_wr = np.zeros(self.n, dtype=bool)
+        self.wr_wr = np.zeros(self.n, dtype=bool)
+        self.pending = False
+
+        # Shaped views of the flat state used by the group methods
+        self.data_nd = self.data.reshape(self.shape + (depth,))
+        self.wr_ptr_nd = self.wr_ptr.reshape(self.shape)
+        self.occupancy_nd = self.occupancy.reshape(self.shape)
+        self.wr_nxt_nd = self.wr_nxt.reshape(self.shape)
+        self.wr_wr_nd = self.wr_wr.reshape(self.shape)
+
+        # Bound by a compiled Simulator so idle banks are not committed
+        self.dirty_list = None
+
+        # Views are not registered as sub-modules (they point back at us),
+        # and do not register us either: the module owning the bank resets
+        # and commits it once per cycle
+        views = np.empty(self.n, dtype=object)
+        for i in range(self.n):
+            views[i] = ChannelView(self, i)
+        self.chns = views.reshape(self.shape).tolist()
+        self.rows = []
+        if len(self.shape) > 1:
+            self.rows = [ChannelBankRow(self, y) for y in range(self.shape[0])]
+
+    def __getitem__(self, i):
+        return self.rows[i] if self.rows else self.chns[i]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __stage__(self):
+        if not self.pending:
+            self.pending = True
+            if self.dirty_list is not None:
+                self.dirty_list.append(self)
+
+    # Single channel access, by flat index (used by ChannelView)
+
+    def peek(self, i, idx=0):
+        if not self.occupancy[i] > idx:
+            raise ChannelError("Reading from empty channel")
+        return self.data[i, (self.rd_ptr[i] + idx) % self.depth]
+
+    def push(self, i, x):
+        if not self.depth - self.occupancy[i] > 0:
+            raise ChannelError("Enqueueing into full channel")
+        if self.wr_wr[i]:
+            raise ChannelError("Double enqueue on channel")
+        self.data[i, self.wr_ptr[i] % self.depth] = x
+        self.wr_nxt[i] = (self.wr_ptr[i] + 1) % (2*self.depth)
+        self.wr_wr[i] = True
+        self.__stage__()
+
+    def free(self, i, count=1):
+        if not self.occupancy[i] > count-1:
+            raise ChannelError("Dequeueing from empty channel")
+        if self.rd_wr[i]:
+            raise ChannelError("Double dequeue on channel")
+        self.rd_nxt[i] = (self.rd_ptr[i] + count) % (2*self.depth)
+        self.rd_wr[i] = True
+        self.__stage__()
+
+    def pop(self, i):
+        self.free(i, 1)
+        return self.peek(i, 0)
+
+    def valid(self, i, idx=0): # check not empty
+        return self.occupancy[i] > idx
+
+    def vacancy(self, i, idx=0): # check not full
+        return self.depth - self.occupancy[i] > idx
+
+    def clear(self, i):
+        # Use with care since it conflicts with enq and deq
+        if self.rd_wr[i]:
+            raise ChannelError("Double dequeue on channel")
+        self.rd_nxt[i] = self.wr_ptr[i]
+        self.rd_wr[i] = True
+        self.__stage__()
+
+    # Whole bank and group access
+
+    def valid_mask(self, idx=0):
+        return self.occupancy_nd > idx
+
+    def vacancy_mask(self, idx=0):
+        return self.depth - self.occupancy_nd > idx
+
+    def all_valid(self, group, idx=0):
+        return bool(np.all(self.occupancy_nd[group] > idx))
+
+    def all_vacant(self, group, idx=0):
+        return bool(np.all(self.depth - self.occupancy_nd[group] > idx))
+
+    def multicast_push(self, group, values):
+        # Push values (broadcast against the group's shape) into every
+        # channel of the group
+        if not self.all_vacant(group):
+            raise ChannelError("Enqueueing into full channel")
+        if np.any(self.wr_wr_nd[group]):
+            raise ChannelError("Double enqueue on channel")
+        wr_ptr = self.wr_ptr_nd[group]
+        values = np.broadcast_to(np.asarray(values, dtype=self.data.dtype),
+                np.shape(wr_ptr))
+        np.put_along_axis(self.data_nd[group],
+                (wr_ptr % self.depth)[..., np.newaxis],
+                values[..., np.newaxis], axis=-1)
+        self.wr_nxt_nd[group] = (wr_ptr + 1) % (2*self.depth)
+        self.wr_wr_nd[group] = True
+        self.__stage__()
+
+    def broadcast_push(self, group, x):
+        # Push the same scalar into every channel of the group
+        value = np.empty((), dtype=self.data.dtype)
+        value[()] = x
+        self.multicast_push(group, value)
+
+    # Masked access, for modules that batch many channels per cycle. mask has
+    # the bank's shape; values are taken/returned in C order of the mask.
+
+    def masked_peek(self, mask, idx=0):
+        sel = np.flatnonzero(mask)
+        if np.any(self.occupancy[sel] <= idx):
+            raise ChannelError("Reading from empty channel")
+        return self.data[sel, (self.rd_ptr[sel] + idx) % self.depth]
+
+    def masked_free(self, mask, count=1):
+        sel = np.flatnonzero(mask)
+        if np.any(self.occupancy[sel] <= count-1):
+            raise ChannelError("Dequeueing from empty channel")
+        if np.any(self.rd_wr[sel]):
+            raise ChannelError("Double dequeue on channel")
+        self.rd_nxt[sel] = (self.rd_ptr[sel] + count) % (2*self.depth)
+        self.rd_wr[sel] = True
+        if len(sel):
+            self.__stage__()
+
+    def masked_pop(self, mask):
+        self.masked_free(mask, 1)
+        return self.masked_peek(mask, 0)
+
+    def masked_push(self, mask, values):
+        sel = np.flatnonzero(mask)
+        if np.any(self.depth - self.occupancy[sel] <= 0):
+            raise ChannelError("Enqueueing into full channel")
+        if np.any(self.wr_wr[sel]):
+            raise ChannelError("Double enqueue on channel")
+        self.data[sel, self.wr_ptr[sel] % self.depth] = values
+        self.wr_nxt[sel] = (self.wr_ptr[sel] + 1) % (2*self.depth)
+        self.wr_wr[sel] = True
+        if len(sel):
+            self.__stage__()
+
+    def reset(self):
+        self.rd_ptr[:] = 0
+        self.wr_ptr[:] = 0
+        self.occupancy[:] = 0
+        self.rd_wr[:] = False
+        self.wr_wr[:] = False
+        self.pending = False
+
+    def __dirty__(self):
+        return self.pending
+
+    def __ntick__(self):
+        np.copyto(self.rd_ptr, self.rd_nxt, where=self.rd_wr)
+        np.copyto(self.wr_ptr, self.wr_nxt, where=self.wr_wr)
+        self.occupancy[:] = (self.wr_ptr - self.rd_ptr) % (2*self.depth)
+        self.rd_wr[:] = False
+        self.wr_wr[:] = False
+        self.pending = False
+
+class BankRef(Module):
+    # Part of a ChannelBank handed to other modules. The bank is not one of
+    # its sub-modules, but the modules holding a part still see the bank's
+    # state (so the event-driven simulator wakes them up when it changes).
+    def register_modules(self):
+        pass
+
+    def __schedule__(self, tick_list, ntick_list, do_tick=True, do_ntick=True):
+        self.bank.__schedule__(tick_list, ntick_list, do_tick, do_ntick)
+
+class ChannelBankRow(BankRef):
+    # bank[y] of a multi-dimensional ChannelBank. Indexes like a bank with
+    # one dimension less and forwards group operations with y prepended.
+    def instantiate(self, bank, y):
+        self.bank = bank
+        self.y = y
+        self.chns = bank.chns[y]
+
+    def __getitem__(self, i):
+        return self.chns[i]
+
+    def __len__(self):
+        return len(self.chns)
+
+    def __group__(self, group):
+        return (self.y,) + (group if isinstance(group, tuple) else (group,))
+
+    def all_valid(self, group, idx=0):
+        return self.bank.all_valid(self.__group__(group), idx)
+
+    def all_vacant(self, group, idx=0):
+        return self.bank.all_vacant(self.__group__(group), idx)
+
+    def multicast_push(self, group, values):
+        self.bank.multicast_push(self.__group__(group), values)
+
+    def broadcast_push(self, group, x):
+        self.bank.broadcast_push(self.__group__(group), x)
+
+class ChannelView(BankRef):
+    # One channel of a ChannelBank, usable wherever a Channel is expected
+    def instantiate(self, bank, idx):
+        self.bank = bank
+        self.idx = idx
+        self.depth = bank.depth
+
+    def peek(self, idx=0):
+        return self.bank.peek(self.idx, idx)
+
+    def push(self, x):
+        self.bank.push(self.idx, x)
+
+    def free(self, count=1):
+        self.bank.free(self.idx, count)
+
+    def pop(self):
+        return self.bank.pop(self.idx)
+
+    def valid(self, idx=0):
+        return self.bank.occupancy[self.idx] > idx
+
+    def vacancy(self, idx=0):
+        return self.depth - self.bank.occupancy[self.idx] > idx
+
+    def clear(self):
+        self.bank.clear(self.idx)
+
 def EmptyChannel(Channel):
     def valid(self, idx=0):
         return False
@@ -1,3 +1,6 @@
+import csv
+from bisect import bisect_left
+from math import log
 from nnsim.module import HWError
 from collections import defaultdict
 
@@ -6,56 +9,179 @@ class CostError(HWError):
 
 # default values for 65nm process
 #   ALU:1, RF:1, PE/LN:2, GB:6, DRAM:200
+# for a 32 bit datapath, a 128 entry RF and a 100kB global buffer. Narrower
+# or wider datapaths scale the ALU (adder), memory and DRAM access energy
+# linearly and the multiplier energy quadratically with the bit width.
+# Memories also scale with the square root of their depth (bit line length,
+# as CACTI roughly does for a single bank) unless a table of per-access
+# energies is given, and on-chip energy scales linearly with the process
+# node.
+
+REF_BITWIDTH = 32
+REF_NODE = 65
+REF_RF_BYTES = 128*REF_BITWIDTH//8
+REF_GB_BYTES = 100*1024
+
+def width_scale(bitwidth, exponent=1):
+    return (float(bitwidth)/REF_BITWIDTH)**exponent
+
+def size_scale(size, ref_size):
+    if size <= 0:
+        raise CostError("Memory size must be positive, got %s" % size)
+    return (float(size)/ref_size)**0.5
+
+class EnergyTable:
+    # Per-access energy of a memory from a table, e.g. CACTI runs at the
+    # process node of the cost model. A CSV file with a header line and the
+    # columns size_bytes, bitwidth, energy (normalized to a 32 bit add). The
+    # energy per bit is interpolated linearly in log(size); outside the
+    # table it follows the square root rule from the nearest entry.
+    def __init__(self, rows):
+        self.rows = [ tuple(float(e) for e in row) for row in rows ]
+        per_bit = defaultdict(list)
+        for bytes, bitwidth, energy in self.rows:
+            per_bit[bytes].append(energy/bitwidth)
+        if not per_bit:
+            raise CostError("Empty energy table")
+        self.sizes = sorted(per_bit)
+        self.per_bit = [ sum(per_bit[s])/len(per_bit[s]) for s in self.sizes ]
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls([ (row['size_bytes'], row['bitwidth'], row['energy'])
+                         for row in csv.DictReader(f) ])
+
+    def energy(self, bytes, bitwidth=REF_BITWIDTH):
+        i = bisect_left(self.sizes, bytes)
+        if i < len(self.sizes) and self.sizes[i] == bytes:
+            per_bit = self.per_bit[i]
+        elif i == 0:
+            per_bit = self.per_bit[0]*size_scale(bytes, self.sizes[0])
+        elif i == len(self.sizes):
+            per_bit = self.per_bit[-1]*size_scale(bytes, self.sizes[-1])
+        else:
+            t = log(bytes/self.sizes[i - 1])/log(self.sizes[i]/self.sizes[i - 1])
+            per_bit = (1 - t)*self.per_bit[i - 1] + t*self.per_bit[i]
+        return per_bit*bitwidth
+
+    def __repr__(self):
+        return "EnergyTable(%r)" % self.rows
+
+# raw_stats counters and the event they are charged as. A counter is
+# matched by substring, the first match wins. Memory counters also need
+# 'rd' or 'wr' in their name; anything else (channel pushes/pops, NoC
+# multicasts, sizes) carries no energy of its own. Row activations and
+# refreshes of a cycle-level DRAM (nnsim.dram) come on top of its words.
+STAT_EVENTS = (('pe_mac', "MAC"), ('alu_comp', "ALU"),
+        ('dram_row_miss', "DRAM_ACT"), ('dram_refresh', "DRAM_REF"),
+        ('dram', "DRAM"), ('glb', "GB"), ('rf', "RF"))
+
+ACCESS_EVENTS = ("MAC", "ALU", "DRAM_ACT", "DRAM_REF")
 
 # Track number of accesses, and accumulate total energy (normalized over ALU)
 class CostModel:
-    def init(self,bitwidth=32,registers=128,num_pe=200,buffer_kb=100):
+    def init(self,bitwidth=32,registers=128,num_pe=200,buffer_kb=100,
+            node=REF_NODE,tables=None,mul_bitwidth=None,acc_bitwidth=None):
+        # tables: {event: EnergyTable or path of one} for "RF" and "GB".
+        # A MAC multiplies mul_bitwidth operands and accumulates in
+        # acc_bitwidth, both default to bitwidth.
+        self.args = { 'bitwidth' : bitwidth, 'registers' : registers,
+                'num_pe' : num_pe, 'buffer_kb' : buffer_kb, 'node' : node,
+                'tables' : tables, 'mul_bitwidth' : mul_bitwidth,
+                'acc_bitwidth' : acc_bitwidth }
         self.uses=defaultdict(int)
+        self.node = node
+        self.tables = {}
+        for event, table in (tables or {}).items():
+            if not isinstance(table, EnergyTable):
+                table = EnergyTable.load(table)
+            self.tables[event] = table
 
         self.cost=defaultdict(int)
         self.ALU(bitwidth)
+        self.Multiplier(bitwidth if mul_bitwidth is None else mul_bitwidth)
+        self.MAC(acc_bitwidth or bitwidth)
         self.RegisterFile(registers, bitwidth)
         self.LocalNetwork(num_pe)
-        self.GlobalBuffer(buffer_kb*1024)
-        self.DRAM(num_pe)
+        self.GlobalBuffer(buffer_kb*1024, bitwidth)
+        self.DRAM(num_pe, bitwidth)
+        # Whole costs stay integers, and so do the energies of counts
+        # charged only at whole costs
+        for event, cost in self.cost.items():
+            if float(cost).is_integer():
+                self.cost[event] = int(cost)
+        return self
+
+    def derive(self, **kwargs):
+        # The same design and technology with some parameters changed,
+        # e.g. a datapath stage of a different width
+        args = dict(self.args)
+        args.update(kwargs)
+        return CostModel().init(**args)
+
+    def sized(self, size):
+        # The same model with the global buffer of a GLB module's 'size'
+        # stat: (depth, elements per word) at the model's bit width
+        bytes = size[0]*size[1]*self.args['bitwidth']/8.
+        return self.derive(buffer_kb=bytes/1024)
 
     def count(self, event, count=1):
         self.uses[event] += count
 
+    def node_scale(self):
+        # Dynamic energy C*V^2 shrinks about linearly with the node
+        return float(self.node)/REF_NODE
+
     def ALU(self, bitwidth=32):
-        self.cost["ALU"] = 1
+        self.cost["ALU"] = width_scale(bitwidth)*self.node_scale()
+
+    def Multiplier(self, bitwidth=32):
+        self.cost["MUL"] = width_scale(bitwidth, 2)*self.node_scale()
 
+    def MAC(self, acc_bitwidth=32):
+        # Multiply followed by the accumulate add
+        self.cost["MAC"] = self.cost["MUL"] + \
+                width_scale(acc_bitwidth)*self.node_scale()
 
     def RegisterFile(self, registers=128, bitwidth=32):
         """RF register file energy
-        Dependent on the number of registers.
-        If within 0.5 - 1kB total assume 1x ALU"""
+        Dependent on the number of registers and their width.
+        A 128 x 32b (512B) RF costs 1x ALU"""
 
         bytes = registers * bitwidth / 8
-        if bytes > 1024:
-            raise CostError("Estimate RF cost if you need a larger register file")
-        self.cost["RF"] = 1 # RF -> PE
+        self.cost["RF"] = self.memory("RF", bytes, bitwidth, REF_RF_BYTES, 1)
         # register read/write
 
 # PE - Local PE network
-#   assume talking to neighbors only
-#   for 200-1000 PEs total
+#   assume talking to neighbors only, so the hop energy does not depend
+#   on the number of PEs
     def LocalNetwork(self, num_pes = 200):
-        if num_pes > 1000:
-            raise CostError("Estimate cost if you need a large number of PEs")
-        self.cost["LN"] = 2 # PE -> PE
+        if num_pes < 1:
+            raise CostError("Need at least one PE")
+        self.cost["LN"] = 2*self.node_scale() # PE -> PE
 
 # GB Global Buffer
 #   assume all PEs have direct access
 #   no dynamic network
-#   for 100-500kB assume 6x
-    def GlobalBuffer(self, bytes = 100*1024):
-        if bytes > 500*1024:
-            raise CostError("Estimate cost if you need a larger Global Buffer")
-        self.cost["GB"] = 6 # GB -> PE
+#   100kB costs 6x
+    def GlobalBuffer(self, bytes = 100*1024, bitwidth=32):
+        self.cost["GB"] = self.memory("GB", bytes, bitwidth, REF_GB_BYTES, 6)
 
-    def DRAM(self, controllers=1):
-        self.cost["DRAM"] = 200 # DRAM -> GB
+    def DRAM(self, controllers=1, bitwidth=32):
+        # Off-chip, independent of the process node
+        self.cost["DRAM"] = 200*width_scale(bitwidth) # DRAM -> GB
+        # Activate + precharge of a 2kB row costs about as much as a 64B
+        # burst, a refresh about eight activations per bank
+        self.cost["DRAM_ACT"] = 3200
+        self.cost["DRAM_REF"] = 8*8*3200
+
+    def memory(self, event, bytes, bitwidth, ref_bytes, ref_cost):
+        if event in self.tables:
+            return self.tables[event].energy(bytes, bitwidth)
+        # depth relative to the reference memory of 32 bit words
+        return ref_cost*size_scale(bytes/width_scale(bitwidth), ref_bytes)* \
+                width_scale(bitwidth)*self.node_scale()
 
     def energy(self, verbose=True):
         """Tally up energy consumption"""
@@ -63,8 +189,82 @@ class CostModel:
         for c in self.uses:
             energy = self.cost[c] * self.uses[c]
             if verbose:
-                print("%s\t%d\t%d\t%d\n" % (c, self.cost[c], self.uses[c], energy))
+                print("%s\t%g\t%d\t%g\n" % (c, self.cost[c], self.uses[c], energy))
             total += energy
         if verbose:
-            print("%s\t  \t\t%d\n" % ("Total", total))
+            print("%s\t  \t\t%g\n" % ("Total", total))
         return total
+
+    def stats(self, raw_stats_list, models=()):
+        """Access counts and energy of the raw_stats counters of a design
+
+        models: (key prefix, CostModel) pairs, counters starting with the
+        prefix are charged at that model's costs instead (e.g. datapath
+        stages of a different width).
+
+        GLB accesses of a module with a 'size' stat are charged at a global
+        buffer of that size rather than buffer_kb; a GLB of size 0 only
+        passes data through and its counters carry no energy."""
+
+        uses = defaultdict(int)
+        energy = defaultdict(int)
+        noc_multicasts = 0
+        sized = {}
+        for sub_module_stats in raw_stats_list:
+            size = sub_module_stats.get('size')
+            for key in sub_module_stats:
+                if key.find('noc') != -1:
+                    noc_multicasts += sub_module_stats[key]
+                event = stat_event(key)
+                if event is None:
+                    continue
+                model = next((model for prefix, model in models
+                              if key.startswith(prefix)), self)
+                if event == "GB" and size is not None:
+                    if not size[0]*size[1]:
+                        continue
+                    size = tuple(size)
+                    if (id(model), size) not in sized:
+                        sized[id(model), size] = model.sized(size)
+                    model = sized[id(model), size]
+                uses[event] += sub_module_stats[key]
+                energy[event] += sub_module_stats[key] * model.cost[event]
+
+        raw_stats = {}
+        raw_stats['pe_comp_energy'] = energy["MAC"]
+        if "ALU" in uses:
+            raw_stats['tr_alu_comp_energy'] = energy["ALU"]
+
+        raw_stats['dram_mem_acc'] = uses["DRAM"]
+        raw_stats['glb_mem_acc'] = uses["GB"]
+        raw_stats['rf_mem_acc'] = uses["RF"]
+        raw_stats['total_mem_acc'] = uses["DRAM"] + uses["GB"] + uses["RF"]
+
+        raw_stats['total_noc_multicasts'] = noc_multicasts
+
+        raw_stats['dram_energy'] = energy["DRAM"] + energy["DRAM_ACT"] + \
+                energy["DRAM_REF"]
+        raw_stats['glb_energy'] = energy["GB"]
+        raw_stats['rf_energy'] = energy["RF"]
+        raw_stats['data_energy'] = raw_stats['dram_energy'] + energy["GB"] + \
+                energy["RF"]
+        raw_stats['comp_energy'] = energy["MAC"] + energy["ALU"]
+
+        ### total energy = data energy + comp energy
+        raw_stats['total_energy'] = raw_stats['data_energy'] + \
+                raw_stats['comp_energy']
+        return raw_stats
+
+    def __repr__(self):
+        # Also the cache key of runs with this cost model
+        return "CostModel(%s)" % ", ".join("%s=%r" % (k, self.args[k])
+                for k in sorted(self.args))
+
+def stat_event(key):
+    for name, event in STAT_EVENTS:
+        if key.find(name) != -1:
+            if event in ACCESS_EVENTS or key.find('rd') != -1 or \
+                    key.find('wr') != -1:
+                return event
+            return None
+    return None
@@ -0,0 +1,155 @@
+from collections import deque
+
+from nnsim.module import Module, HWError
+
+# Off-chip DRAM between a stimulus and the chip. Both directions stream
+# words at sequential addresses: reads from rd_in (the memory contents, in
+# the order the chip consumes them) to rd_out (the chip), writes from
+# wr_in (the chip) to wr_out (where the stimulus checks them). Reads and
+# writes share one data bus and are moved in bursts of burst_len words:
+#
+#   command: t_cas on a row buffer hit, t_rcd + t_cas when the bank has no
+#            open row, t_rp + t_rcd + t_cas when another row is open
+#   data:    one word per cycle at most (the channels), bandwidth bytes per
+#            cycle on average
+#
+# Every refresh_interval cycles the DRAM refreshes for refresh_cycles and
+# closes all rows. Row activations and refreshes are counted, so the
+# energy (nnsim.costs) depends on the access pattern and not just on the
+# number of words.
+
+class DRAMError(HWError):
+    pass
+
+RD = True
+WR = False
+
+class DRAM(Module):
+    def instantiate(self, rd_in_chn, rd_out_chn, wr_in_chn, wr_out_chn,
+            word_bytes=8, bandwidth=8, burst_len=8, row_bytes=2048, banks=8,
+            t_cas=4, t_rcd=4, t_rp=4, refresh_interval=3900,
+            refresh_cycles=100, wr_base=1 << 30):
+        self.name = 'dram'
+        self.rd_in_chn = rd_in_chn
+        self.rd_out_chn = rd_out_chn
+        self.wr_in_chn = wr_in_chn
+        self.wr_out_chn = wr_out_chn
+
+        if bandwidth <= 0 or burst_len < 1:
+            raise DRAMError("Need a positive bandwidth and burst length")
+        self.word_bytes = word_bytes
+        self.bandwidth = bandwidth
+        self.burst_len = burst_len
+        self.row_bytes = row_bytes
+        self.banks = banks
+        self.t_cas = t_cas
+        self.t_rcd = t_rcd
+        self.t_rp = t_rp
+        self.refresh_interval = refresh_interval
+        self.refresh_cycles = refresh_cycles
+        self.wr_base = wr_base
+
+        # Timers run whether or not any channel changes
+        self.always_tick = True
+
+        self.stat_type = 'show'
+        self.raw_stats = {'dram_row_hit' : 0, 'dram_row_miss' : 0,
+                'dram_refresh' : 0, 'dram_burst' : 0, 'dram_bus_cycles' : 0,
+                'dram_bus_idle' : 0}
+
+    def reset(self):
+        self.rd_addr = 0
+        self.wr_addr = self.wr_base
+        self.open_rows = [None]*self.banks
+        self.rd_buf = deque()
+        self.wr_buf = deque()
+        self.wr_idle = 0
+
+        self.refresh_ctr = 0
+        self.refresh_left = 0
+
+        self.burst = None # RD or WR while a burst is in progress
+        self.cmd_left = 0
+        self.words_left = 0
+        self.credit = 0
+
+    def row(self, addr):
+        # (bank, row) of a byte address, consecutive rows in consecutive banks
+        row = addr//self.row_bytes
+        return row % self.banks, row//self.banks
+
+    def start_burst(self, access):
+        addr = self.rd_addr if access == RD else self.wr_addr
+        bank, row = self.row(addr)
+        if self.open_rows[bank] == row:
+            self.cmd_left = self.t_cas
+            self.raw_stats['dram_row_hit'] += 1
+        else:
+            self.cmd_left = self.t_rcd + self.t_cas
+            if self.open_rows[bank] is not None:
+                self.cmd_left += self.t_rp
+            self.open_rows[bank] = row
+            self.raw_stats['dram_row_miss'] += 1
+        self.burst = access
+        self.words_left = self.burst_len
+        self.credit = 0
+        self.raw_stats['dram_burst'] += 1
+
+    def tick(self):
+        # The controller queues hold two bursts each
+        if len(self.rd_buf) < 2*self.burst_len and self.rd_in_chn.valid():
+            self.rd_buf.append(self.rd_in_chn.pop())
+        if len(self.wr_buf) < 2*self.burst_len and self.wr_in_chn.valid():
+            self.wr_buf.append(self.wr_in_chn.pop())
+            self.wr_idle = 0
+        elif self.wr_buf:
+            self.wr_idle += 1
+
+        self.refresh_ctr += 1
+        if self.refresh_left:
+            self.refresh_left -= 1
+            return
+        if self.burst is None and self.refresh_ctr >= self.refresh_interval:
+            self.refresh_ctr = 0
+            self.refresh_left = self.refresh_cycles - 1
+            self.open_rows = [None]*self.banks
+            self.raw_stats['dram_refresh'] += 1
+            return
+
+        if self.burst is None:
+            # Writes once a burst is queued (or the chip stopped sending),
+            # reads otherwise
+            if len(self.wr_buf) >= self.burst_len or \
+                    (self.wr_buf and self.wr_idle >= self.burst_len):
+                self.start_burst(WR)
+            elif self.rd_buf:
+                self.start_burst(RD)
+            else:
+                return
+
+        if self.cmd_left:
+            self.cmd_left -= 1
+            return
+
+        self.raw_stats['dram_bus_cycles'] += 1
+        self.credit = min(self.credit + self.bandwidth,
+                max(self.bandwidth, self.word_bytes))
+        buf = self.rd_buf if self.burst == RD else self.wr_buf
+        out_chn = self.rd_out_chn if self.burst == RD else self.wr_out_chn
+        if self.credit < self.word_bytes or not out_chn.vacancy():
+            self.raw_stats['dram_bus_idle'] += 1
+            return
+        if not buf:
+            # The stream ended (or stalled) mid burst
+            self.burst = None
+            self.raw_stats['dram_bus_idle'] += 1
+            return
+        out_chn.push(buf.popleft())
+        self.credit -= self.word_bytes
+        if self.burst == RD:
+            self.rd_addr += self.word_bytes
+        else:
+            self.wr_addr += self.word_bytes
+        self.words_left -= 1
+        if self.words_left == 0:
+            self.burst = None
@@ -0,0 +1,89 @@
+import numpy as np
+
+from nnsim.module import HWError
+
+# Fixed-point datapath model. Values stay integers (int64); a stage that is
+# `width` bits wide holds a two's complement value in
+# [-2**(width-1), 2**(width-1)). A width of None is the unbounded int64
+# datapath the models have always used. Dropping fraction bits (dividing
+# by a constant) rounds down or to nearest (half up); values that do not
+# fit saturate or wrap around.
+
+class FixedPointError(HWError):
+    pass
+
+ROUNDING = ('floor', 'nearest')
+OVERFLOW = ('saturate', 'wrap')
+
+def rescale(x, den=1, rounding='floor'):
+    # x/den rounded to an integer
+    x = np.asarray(x, dtype=np.int64)
+    if rounding == 'floor':
+        y = x//den
+    elif rounding == 'nearest':
+        y = (2*x + den)//(2*den)
+    else:
+        raise FixedPointError("Unknown rounding mode %s" % rounding)
+    return y if y.ndim else np.int64(y)
+
+def fit(x, width=None, overflow='saturate'):
+    # x in a width bit two's complement register
+    if width is None:
+        return x
+    lo, hi = -2**(width - 1), 2**(width - 1) - 1
+    x = np.asarray(x, dtype=np.int64)
+    if overflow == 'saturate':
+        y = np.clip(x, lo, hi)
+    elif overflow == 'wrap':
+        y = (x - lo) % 2**width + lo
+    else:
+        raise FixedPointError("Unknown overflow mode %s" % overflow)
+    return y if y.ndim else np.int64(y)
+
+class Precision(object):
+    # Per-stage widths of the Winograd datapath:
+    #   ifmap:  transformed ifmap V = B^T d B (pre transform unit output)
+    #   weight: transformed weights U (pre transform unit output)
+    #   psum:   PE partial sums, every add of the chain fits in it
+    #   ofmap:  post transform output, after the scale is removed and the
+    #           bias added
+    # The default is the unbounded datapath.
+
+    STAGES = ('ifmap', 'weight', 'psum', 'ofmap')
+
+    def __init__(self, ifmap=None, weight=None, psum=None, ofmap=None,
+            rounding='floor', overflow='saturate'):
+        if rounding not in ROUNDING:
+            raise FixedPointError("Unknown rounding mode %s" % rounding)
+        if overflow not in OVERFLOW:
+            raise FixedPointError("Unknown overflow mode %s" % overflow)
+        self.widths = { 'ifmap' : ifmap, 'weight' : weight, 'psum' : psum,
+                'ofmap' : ofmap }
+        for stage, width in self.widths.items():
+            if width is not None and width < 2:
+                raise FixedPointError("%s datapath needs at least 2 bits"
+                        % stage)
+        self.rounding = rounding
+        self.overflow = overflow
+
+    def width(self, stage, default=None):
+        width = self.widths[stage]
+        return default if width is None else width
+
+    def quantize(self, stage, x, den=1):
+        # x/den as stored by the given stage
+        if np.any(np.asarray(den) != 1):
+            x = rescale(x, den, self.rounding)
+        return fit(x, self.widths[stage], self.overflow)
+
+    def __eq__(self, other):
+        return isinstance(other, Precision) and repr(self) == repr(other)
+
+    def __hash__(self):
+        return hash(repr(self))
+
+    def __repr__(self):
+        # Also the cache key of runs with this precision
+        return "Precision(%s, rounding=%r, overflow=%r)" % (
+                ", ".join("%s=%r" % (s, self.widths[s]) for s in self.STAGES),
+                self.rounding, self.overflow)
@@ -0,0 +1,47 @@
+import json
+import os
+
+import numpy as np
+
+# Real network layers for the testbenches. A manifest is a JSON list of
+# layers, each naming the .npy files holding its ifmap (H, W, C), weights
+# (R, S, C, K) and bias (K,). Tensors are opened with mmap_mode='r' so sweep
+# workers share the pages through the page cache instead of each copying
+# the activations.
+
+TENSORS = ('ifmap', 'weights', 'bias')
+
+def save_layer(path, name, ifmap, weights, bias):
+    # Write one layer's tensors next to the manifest and return its entry
+    entry = { 'name' : name }
+    for key, tensor in zip(TENSORS, (ifmap, weights, bias)):
+        entry[key] = "%s_%s.npy" % (name, key)
+        np.save(os.path.join(path, entry[key]),
+                np.asarray(tensor).astype(np.int64))
+    return entry
+
+def save_manifest(path, layers):
+    with open(path, 'w') as f:
+        json.dump(layers, f, indent=2)
+
+def load_manifest(path):
+    # Tensor paths in the manifest are relative to the manifest itself
+    with open(path) as f:
+        layers = json.load(f)
+    root = os.path.dirname(os.path.abspath(path))
+    for layer in layers:
+        for key in TENSORS:
+            layer[key] = os.path.join(root, layer[key])
+    return layers
+
+def open_layer(layer):
+    return tuple(np.load(layer[key], mmap_mode='r') for key in TENSORS)
+
+def layer_shape(layer):
+    # (image_size, filter_size, in_chn, out_chn) without reading the data
+    ifmap, weights, _ = open_layer(layer)
+    if ifmap.shape[2] != weights.shape[2]:
+        raise ValueError("Layer %s: ifmap has %d channels, weights expect %d"
+                % (layer['name'], ifmap.shape[2], weights.shape[2]))
+    return ifmap.shape[:2], weights.shape[:2], weights.shape[2], \
+            weights.shape[3]
@@ -13,6 +13,11 @@ class Module(object):
         self.raw_stats = {}
         self.final_stats = {}
 
+        # Set when tick() has work to do even if no Reg it can see changed
+        # (free-running counters, randomness). Only the event-driven
+        # simulator looks at this.
+        self.always_tick = False
+
         self.instantiate(*args, **kwargs)
         self.register_modules()
 
@@ -74,6 +79,32 @@ class Module(object):
         for sub_module in self.sub_modules:
             sub_module.__reset__()
 
+    def __dirty__(self):
+        # Whether __ntick__ will change state visible to other modules. The
+        # conservative default lets the event-driven simulator treat unknown
+        # state elements as always changing.
+        return True
+
+    def __schedule__(self, tick_list, ntick_list, do_tick=True, do_ntick=True):
+        # Flatten the module tree into the bound methods that actually do
+        # work, in the same order __tick__ and __ntick__ would visit them.
+        # A module that overrides __tick__/__ntick__ owns the traversal of
+        # its sub-modules for that phase, so we stop descending there.
+        cls = type(self)
+        if do_tick:
+            if cls.__tick__ is not Module.__tick__:
+                tick_list.append(self.__tick__)
+                do_tick = False
+            elif cls.tick is not Module.tick:
+                tick_list.append(self.tick)
+        if do_ntick and cls.__ntick__ is not Module.__ntick__:
+            ntick_list.append(self.__ntick__)
+            do_ntick = False
+        if do_tick or do_ntick:
+            for sub_module in self.sub_modules:
+                sub_module.__schedule__(tick_list, ntick_list, do_tick,
+                        do_ntick)
+
 class ModuleList(object):
     def __init__(self):
         self.list = []
@@ -0,0 +1,19 @@
+# Pass order for layers larger than the PE array. A layer is cut into input
+# channel groups of arr_y channels (PE rows) and output channel groups of
+# arr_x filters (PE columns); every (output group, input group) pair is one
+# pass. Groups past the last channel are zero padded, not dropped.
+#
+#   'output_outer': for each output group, for each input group
+#   'input_outer':  for each input group, for each output group
+
+ORDERS = ('output_outer', 'input_outer')
+
+def plan_passes(in_chn, out_chn, arr_x, arr_y, order='output_outer'):
+    # [(out_lo, in_lo), ...] in execution order
+    out_groups = range(0, out_chn, arr_x)
+    in_groups = range(0, in_chn, arr_y)
+    if order == 'output_outer':
+        return [ (k, c) for k in out_groups for c in in_groups ]
+    if order == 'input_outer':
+        return [ (k, c) for c in in_groups for k in out_groups ]
+    raise ValueError("Unknown pass order %s" % order)
@@ -1,5 +1,6 @@
-from nnsim.module import Module, HWError
+from nnsim.module import Module, ModuleList, HWError
 from nnsim.reg import Reg
+from collections import deque
 import numpy as np
 
 RD = True
@@ -9,58 +10,151 @@ class RAMError(HWError):
     pass
 
 class SRAM(Module):
-    def instantiate(self, depth, width=1, nports=1, dtype=np.int64):
+    def instantiate(self, depth, width=1, nports=1, dtype=np.int64,
+            latency=1):
         # depth: The number of address stored in the RAM
         # width: The number of words stored per address (NOT bits)
         # word-size is application dependent and implicit but <64b
+        # latency: cycles from a read request to its response, either fixed
+        # (a pipelined macro takes a new request every cycle) or a function
+        # of the address for a variable, DRAM-like latency. Reads of a port
+        # complete in order, one per cycle.
 
         self.width = width
         self.nports = nports
         self.port_used = [False]*nports
         self.data = np.zeros((depth, width)).astype(dtype)
+        if not callable(latency) and latency < 1:
+            raise RAMError("Read latency must be at least one cycle")
+        self.latency = latency
 
-        # Emulate read latency
-        self.output_reg = np.zeros((nports, width)).astype(dtype)
-        self.rd_nxt = np.zeros((nports, width)).astype(dtype)
+        # Emulate read latency. A read fetches a new array, not a view of
+        # data that a later write could change while the word is still on
+        # its way downstream, so a response can be passed on as is without
+        # copying it again. Reads in flight are [cycles left, data], oldest
+        # first.
+        self.output_reg = [ np.zeros(width, dtype) for port in range(nports) ]
+        self.rd_pipe = [ deque() for port in range(nports) ]
+        self.rsp_valid = [False]*nports
 
-        # Emulate write latency
-        self.port_wr = [False]*nports
-        self.wr_nxt = np.zeros((nports, width)).astype(dtype)
-        self.wr_addr_nxt = np.zeros(nports).astype(np.uint32)
+        # Emulate write latency: [cycles left, address, data]
+        self.wr_pipe = [ deque() for port in range(nports) ]
 
+        # Bound by a compiled Simulator so idle SRAMs are not committed
+        self.dirty_list = None
 
     def request(self, access, address, data=None, port=0):
         if self.port_used[port]:
             raise RAMError("Port conflict on port %d" % port)
+        if self.dirty_list is not None and not self.__dirty__():
+            self.dirty_list.append(self)
         self.port_used[port] = True
 
         if access == RD:
-            self.rd_nxt[port, :] = self.data[address, :]
+            latency = self.latency(address) if callable(self.latency) \
+                    else self.latency
+            self.rd_pipe[port].append([latency, self.data[address].copy()])
         elif access == WR:
-            self.port_wr[port] = True
-            self.wr_addr_nxt[port] = address
-            if self.width == 1:
-                self.wr_nxt[port, 0] = data
-            else:
-                self.wr_nxt[port, :] = data[:]
+            # data (a scalar for width 1) is stored when the cycle ends. It
+            # is copied now, the caller may reuse its buffer.
+            self.wr_pipe[port].append([1, address, np.array(data)])
+        return True
 
     def response(self, port=0):
         data = self.output_reg[port]
         return data[0] if self.width == 1 else data
 
+    def response_valid(self, port=0):
+        # A read completed at the end of the last cycle, response() is its
+        # data. Only true for that one cycle.
+        return self.rsp_valid[port]
+
+    def __dirty__(self):
+        # Re-committing without a request in flight leaves output_reg as is
+        return any(self.port_used) or any(self.rsp_valid) or \
+                any(self.rd_pipe) or any(self.wr_pipe)
+
     def __ntick__(self):
-        self.output_reg[:] = self.rd_nxt[:]
         for port in range(self.nports):
             self.port_used[port] = False
 
-            if self.port_wr[port]:
-                self.port_wr[port] = False
-                self.data[self.wr_addr_nxt[port], :] = self.wr_nxt[port, :]
+            rd_pipe = self.rd_pipe[port]
+            for rd in rd_pipe:
+                rd[0] -= 1
+            self.rsp_valid[port] = bool(rd_pipe) and rd_pipe[0][0] <= 0
+            if self.rsp_valid[port]:
+                self.output_reg[port] = rd_pipe.popleft()[1]
+
+            wr_pipe = self.wr_pipe[port]
+            for wr in wr_pipe:
+                wr[0] -= 1
+            while wr_pipe and wr_pipe[0][0] <= 0:
+                _, address, data = wr_pipe.popleft()
+                self.data[address] = data
+        if self.dirty_list is not None and self.__dirty__():
+            # Keep committing every cycle while anything is in flight
+            self.dirty_list.append(self)
 
     def dump(self):
         for i in range(self.data.shape[0]):
             print(i, self.data[i])
 
+class BankedSRAM(SRAM):
+    def instantiate(self, depth, width=1, nbanks=4, interleave='low',
+            nports=1, dtype=np.int64, latency=1):
+        # An SRAM split into nbanks single-ported banks. Every port can
+        # issue a request per cycle, but a bank serves only one of them:
+        # request() refuses (returns False) a request to a bank that is
+        # already busy this cycle, and the requester has to stall and retry.
+        # interleave maps addresses to banks:
+        #   'low': bank = address % nbanks
+        #   'xor': the low bits XORed with the higher bits of the address,
+        #          so strides of nbanks spread over the banks (nbanks has to
+        #          be a power of two)
+        SRAM.instantiate(self, depth, width, nports, dtype, latency)
+        if interleave not in ('low', 'xor'):
+            raise RAMError("Unknown interleaving %s" % interleave)
+        if interleave == 'xor' and nbanks & (nbanks - 1):
+            raise RAMError("XOR interleaving needs a power of two banks")
+        self.name = 'sram'
+        self.nbanks = nbanks
+        self.interleave = interleave
+        self.bank_bits = nbanks.bit_length() - 1
+        self.bank_used = [False]*nbanks
+
+        self.stat_type = 'show'
+        self.raw_stats = {'bank_conflict' : 0}
+        for bank in range(nbanks):
+            for key in ('rd', 'wr', 'conflict'):
+                self.raw_stats['bank%d_%s' % (bank, key)] = 0
+
+    def bank(self, address):
+        address = int(address)
+        if self.interleave == 'low' or self.nbanks == 1:
+            return address % self.nbanks
+        bank = 0
+        while address:
+            bank ^= address & (self.nbanks - 1)
+            address >>= self.bank_bits
+        return bank
+
+    def request(self, access, address, data=None, port=0):
+        if self.port_used[port]:
+            raise RAMError("Port conflict on port %d" % port)
+        bank = self.bank(address)
+        if self.bank_used[bank]:
+            self.raw_stats['bank%d_conflict' % bank] += 1
+            self.raw_stats['bank_conflict'] += 1
+            return False
+        SRAM.request(self, access, address, data, port)
+        self.bank_used[bank] = True
+        self.raw_stats['bank%d_%s' % (bank, 'rd' if access == RD else 'wr')] += 1
+        return True
+
+    def __ntick__(self):
+        SRAM.__ntick__(self)
+        self.bank_used = [False]*self.nbanks
+
 # class NoLatencyRF(Module):
 #     def instantiate(self, depth, width=1, dtype=np.uint64):
 #         # depth: The number of address stored in the RAM
@@ -94,3 +188,99 @@ class SRAM(Module):
 #     def __ntick__(self):
 #         self.rd_port_used = None
 #         self.wr_port_used = None
+
+def read_queue(latency, outstanding=None):
+    # (outstanding, read channel depth) of a client that keeps up to
+    # outstanding reads in flight through a latency cycle SRAM, one more
+    # than the latency by default (enough for a read every cycle), with
+    # room in its read channel for all their responses. A latency that
+    # depends on the address has no such default.
+    if outstanding is None:
+        if callable(latency):
+            raise ValueError("glb_outstanding is required when "
+                    "glb_latency is a function")
+        outstanding = latency + 1
+    return outstanding, max(3, outstanding + 1)
+
+class RequestTracker(Module):
+    def instantiate(self, memory, depth, port=0):
+        # The reads a client has in flight on one memory port, oldest first,
+        # up to depth of them. Requests the client serves itself (e.g.
+        # padding zeros) are tracked too, so everything comes back in
+        # request order. The client calls valid() every cycle while
+        # requests are outstanding, responses are only presented for one.
+        # memory may also be a list of memories the reads are spread over
+        # (the regions of a ping-pong GLB), read() picks one by index.
+        self.name = 'tracker'
+        # Not sub-modules: the memories belong to (and are committed by) the
+        # client
+        if not isinstance(memory, (list, ModuleList)):
+            memory = [memory]
+        self.memories = [ (m, port) for m in memory ]
+        self.depth = depth
+        self.entries = deque() # [data, ready, memory index or None]
+        self.staged = []
+        self.collected = False
+
+        self.stat_type = 'show'
+        self.raw_stats = {'max_outstanding' : 0, 'full_stall' : 0}
+
+    def outstanding(self):
+        return len(self.entries)
+
+    def can_issue(self, out_chn=None):
+        # Room for one more request and, in out_chn, for the responses of
+        # all of them
+        if len(self.entries) == self.depth:
+            self.raw_stats['full_stall'] += 1
+            return False
+        return out_chn is None or out_chn.vacancy(len(self.entries))
+
+    def read(self, address, index=0):
+        # False if the memory refused the request (bank conflict)
+        memory, port = self.memories[index]
+        if not memory.request(RD, address, port=port):
+            return False
+        self.track([None, False, index])
+        return True
+
+    def skip(self, data):
+        # A request answered without the memory, ready next cycle
+        entry = [data, False, None]
+        self.staged.append(entry)
+        self.track(entry)
+
+    def track(self, entry):
+        self.entries.append(entry)
+        self.raw_stats['max_outstanding'] = max(
+                self.raw_stats['max_outstanding'], len(self.entries))
+
+    def collect(self):
+        # Claim the response the memory presents this cycle
+        if self.collected:
+            return
+        self.collected = True
+        for index, (memory, port) in enumerate(self.memories):
+            if memory.response_valid(port):
+                entry = next(e for e in self.entries
+                        if e[2] == index and not e[1])
+                entry[0] = memory.response(port)
+                entry[1] = True
+
+    def valid(self):
+        self.collect()
+        return bool(self.entries) and self.entries[0][1]
+
+    def pop(self):
+        if not self.valid():
+            raise RAMError("No response ready")
+        return self.entries.popleft()[0]
+
+    def __dirty__(self):
+        return self.collected or bool(self.staged)
+
+    def __ntick__(self):
+        self.collected = False
+        for entry in self.staged:
+            entry[1] = True
+        self.staged = []
@@ -0,0 +1,147 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from nnsim.winograd import FRAC_BITS, winograd_matrices, weight_transform
+from nnsim.fixed import Precision, rescale
+
+# Golden models for the testbench stimuli. Everything stays in int64 so the
+# reference is bit-exact against the hardware models.
+
+def conv(x, W, b, mode="same"):
+    # x: (H, W, C) ifmap, W: (R, S, C, K) filters, b: (K,) biases.
+    # Same semantics as summing scipy.signal.correlate2d(x_c, W_ck, mode)
+    # over input channels, computed as a single im2col GEMM instead of
+    # K*C Python-level calls.
+    x = np.asarray(x)
+    W = np.asarray(W)
+    R, S = W.shape[0], W.shape[1]
+    if mode == "same":
+        # correlate2d centers the full output on the input
+        pad_r, pad_s = (R - 1)//2, (S - 1)//2
+        x = np.pad(x, ((pad_r, R - 1 - pad_r), (pad_s, S - 1 - pad_s), (0, 0)),
+                'constant')
+    elif mode != "valid":
+        raise ValueError("Unsupported convolution mode %s" % mode)
+
+    # (H', W', C, R, S) view of every receptive field, no copy
+    cols = sliding_window_view(x, (R, S), axis=(0, 1))
+    axes = ([2, 3, 4], [2, 0, 1])
+
+    # Integer GEMMs do not go through BLAS. As long as no partial sum can
+    # exceed the 53-bit float mantissa the float64 GEMM is exact too.
+    bound = int(np.abs(x).max(initial=0))*int(np.abs(W).max(initial=0))* \
+            W.shape[0]*W.shape[1]*W.shape[2]
+    if bound < 2**53:
+        y = np.tensordot(cols.astype(np.float64), W.astype(np.float64),
+                axes=axes)
+        y = np.rint(y).astype(np.int64)
+    else:
+        y = np.tensordot(cols.astype(np.int64), W.astype(np.int64),
+                axes=axes)
+    return y + np.asarray(b).astype(np.int64)
+
+def conv_cols(x, W, b, y0, y1):
+    # Output columns y0..y1-1 of conv(x, W, b) ("same" mode), reading only
+    # the ifmap columns they depend on, so a memory-mapped layer can be
+    # checked a slice at a time. b is (K,) or (H, W, K) partial sums.
+    R, S = W.shape[0], W.shape[1]
+    pad_r, pad_s = (R - 1)//2, (S - 1)//2
+    lo, hi = y0 - pad_s, y1 + S - 1 - pad_s
+    cols = np.asarray(x[:, max(lo, 0):min(hi, x.shape[1])])
+    cols = np.pad(cols, ((pad_r, R - 1 - pad_r),
+        (max(-lo, 0), max(hi - x.shape[1], 0)), (0, 0)), 'constant')
+    if np.ndim(b) == 3:
+        b = b[:, y0:y1]
+    return conv(cols, W, b, mode="valid")
+
+# Winograd F(2x2, 3x3) transforms: Y = A^T [(G g G^T) * (B^T d B)] A
+WINOGRAD_B_T, WINOGRAD_G, WINOGRAD_A_T = winograd_matrices(2)
+
+def winograd_conv(x, W, b, frac_bits=FRAC_BITS, mode="same", m=2,
+        precision=None):
+    # 3x3 convolution of x: (H, W, C) with W: (3, 3, C, K) through the
+    # fixed-point Winograd F(m x m, 3x3) datapath of the ws_2d_winograd
+    # models. The (padded) ifmap is cut into n x n tiles (n = m + 2) with
+    # stride m (row-major tile order), filters are transformed and scaled
+    # by 2**frac_bits (see weight_transform) and the scale is removed again
+    # (rounding down) after the output transform, so A^T does not amplify
+    # the rounding error. precision (nnsim.fixed.Precision) limits the
+    # width of every stage and picks the rounding of the two scalings; the
+    # default is the unbounded datapath.
+    # Returns y: (H', W', K) and the intermediates U: (n, n, C, K),
+    # V: (n, n, C, T) and M: (n, n, K, T).
+    x = np.asarray(x)
+    if W.shape[0] != 3 or W.shape[1] != 3:
+        raise ValueError("Winograd F(%dx%d, 3x3) needs a 3x3 filter" % (m, m))
+    if mode == "same":
+        pad = 1
+    elif mode == "valid":
+        pad = 0
+    else:
+        raise ValueError("Unsupported convolution mode %s" % mode)
+    if precision is None:
+        precision = Precision()
+    n = m + 2
+    B_T, _, A_T = winograd_matrices(m)
+    G, num, den = weight_transform(m, frac_bits=frac_bits)
+    H, Wd, C = x.shape
+    out_h, out_w = H + 2*pad - 2, Wd + 2*pad - 2
+    tiles_x, tiles_y = -(-out_h//m), -(-out_w//m)
+
+    # Pad and round up to a whole number of output tiles
+    xp = np.pad(x, ((pad, m*tiles_x + 2 - H - pad),
+                    (pad, m*tiles_y + 2 - Wd - pad), (0, 0)), 'constant')
+    d = sliding_window_view(xp, (n, n), axis=(0, 1))[::m, ::m]
+    d = d.reshape(tiles_x*tiles_y, C, n, n)
+
+    # Transform every filter and every tile at once
+    U = np.einsum('ij,jmck,lm->ilck', G, np.asarray(W).astype(np.int64), G)
+    U = precision.quantize('weight', U*num[:, :, None, None],
+            den[:, :, None, None])
+    V = np.einsum('ij,tcjm,lm->ilct', B_T, d.astype(np.int64), B_T)
+    V = precision.quantize('ifmap', V)
+
+    # Element-wise product with reduction over input channels, in PE chain
+    # order when every partial sum has to fit
+    if precision.width('psum') is None:
+        M = np.einsum('ilck,ilct->ilkt', U, V)
+    else:
+        M = np.zeros((n, n, U.shape[3], V.shape[3]), dtype=np.int64)
+        for c in range(C):
+            M = precision.quantize('psum',
+                    M + U[:, :, c, :, None]*V[:, :, c, None, :])
+
+    Y = np.einsum('ij,jmkt,lm->ilkt', A_T, M, A_T)
+    Y = rescale(Y, 2**frac_bits, precision.rounding)
+    Y = Y.reshape(m, m, -1, tiles_x, tiles_y)
+    y = Y.transpose(3, 0, 4, 1, 2).reshape(m*tiles_x, m*tiles_y, -1)
+    y = y[:out_h, :out_w] + np.asarray(b).astype(np.int64)
+    return precision.quantize('ofmap', y), U, V, M
+
+def winograd_error(x, W, b, frac_bits=FRAC_BITS, mode="same", m=2,
+        precision=None):
+    # Error of the fixed-point Winograd datapath against the exact
+    # convolution: max and mean absolute error (in output LSBs) and the
+    # signal to quantization noise ratio in dB (inf when exact)
+    ref = conv(x, W, b, mode)
+    y = winograd_conv(x, W, b, frac_bits, mode, m, precision)[0]
+    err = (y - ref).astype(np.float64)
+    noise = np.mean(err**2)
+    signal = np.mean(ref.astype(np.float64)**2)
+    return { 'max_abs' : int(np.abs(err).max(initial=0)),
+             'mean_abs' : float(np.abs(err).mean()),
+             'sqnr_db' : float('inf') if noise == 0 else
+                         float(10*np.log10(signal/noise)) }
+
+def precision_report(x, W, b, precisions, frac_bits=FRAC_BITS, mode="same",
+        m=2, verbose=True):
+    # winograd_error of every candidate datapath, e.g. to pick the
+    # narrowest one that is still accurate enough
+    report = []
+    for precision in precisions:
+        err = winograd_error(x, W, b, frac_bits, mode, m, precision)
+        report.append((precision, err))
+        if verbose:
+            print("%s\tmax %d\tmean %.3f\tsqnr %.1f dB" % (precision,
+                err['max_abs'], err['mean_abs'], err['sqnr_db']))
+    return report
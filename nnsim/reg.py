@@ -9,6 +9,9 @@ class Reg(Module):
         self.data_s = reset_val
         self.data_m = None
 
+        # Bound by a compiled Simulator so only written Regs get committed
+        self.dirty_list = None
+
     def rd(self):
         return self.data_s
 
@@ -16,11 +19,16 @@ class Reg(Module):
         if self.data_m is not None:
             raise RegError("Double write on register")
         self.data_m = x
+        if self.dirty_list is not None:
+            self.dirty_list.append(self)
 
     def reset(self):
         self.data_s = self.reset_val
         self.data_m = None
 
+    def __dirty__(self):
+        return self.data_m is not None
+
     def __ntick__(self):
         if self.data_m is not None:
             self.data_s = self.data_m
@@ -0,0 +1,141 @@
+import os
+import re
+import uuid
+
+import numpy as np
+
+# Append-only columnar store for sweep results. Every append() writes one
+# .npz shard holding a single array per column, so a query only reads the
+# columns (and shards) it needs instead of the whole result set.
+# Several processes may append to the same store at once.
+
+SHARD_FMT = "shard-%06d.npz"
+SHARD_RE = re.compile(r"shard-(\d+)\.npz$")
+
+def to_column(values):
+    # Numbers stay numeric (missing -> NaN), tuples of numbers of one
+    # length (image_size, filter_size) become a 2-D column with a row per
+    # tuple, everything else is a string (missing -> '')
+    present = [ v for v in values if v is not None ]
+    if present and len(present) == len(values) and \
+            all(isinstance(v, tuple) for v in present) and \
+            len(set(len(v) for v in present)) == 1 and len(present[0]) and \
+            all(isinstance(e, (bool, int, float, np.number))
+                for v in present for e in v):
+        return np.array(values)
+    if all(isinstance(v, (bool, int, np.integer)) for v in present) and \
+            len(present) == len(values):
+        return np.array(values, dtype=np.int64)
+    if all(isinstance(v, (bool, int, float, np.number)) for v in present):
+        return np.array([ np.nan if v is None else v for v in values ],
+                dtype=np.float64)
+    return np.array([ '' if v is None else str(v) for v in values ])
+
+def missing_column(like, n):
+    if like.dtype.kind in 'iuf':
+        return np.full((n,) + like.shape[1:], np.nan)
+    return np.full(n, '', dtype=like.dtype)
+
+def collect_stats(module, table=None):
+    # Flatten the final_stats of every module that dump_stats would show
+    # into a single row keyed by "<path>/<stat>"
+    if table is None:
+        table = {}
+    if module.stat_type == 'show':
+        for key, value in module.final_stats.items():
+            table["%s/%s" % (module.path, key)] = value
+    for sub_module in module.sub_modules:
+        collect_stats(sub_module, table)
+    return table
+
+class ResultStore(object):
+    def __init__(self, path):
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def shards(self):
+        names = [ n for n in os.listdir(self.path) if SHARD_RE.match(n) ]
+        return [ os.path.join(self.path, n) for n in sorted(names) ]
+
+    def append(self, rows):
+        # rows: list of flat dicts (config, clk_ticks, "<path>/<stat>")
+        if not rows:
+            return
+        columns = []
+        for row in rows:
+            columns += [ k for k in row if k not in columns ]
+        arrays = { k : to_column([ row.get(k) for row in rows ])
+                   for k in columns }
+
+        # Write under a temporary name of our own so readers never see half
+        # a shard, then link it to the next free shard name. os.link fails
+        # instead of replacing a shard another appender got to first.
+        tmp = os.path.join(self.path, "tmp-%d-%s.npz" % (os.getpid(),
+            uuid.uuid4().hex))
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        try:
+            shards = self.shards()
+            idx = int(SHARD_RE.search(shards[-1]).group(1)) + 1 \
+                    if shards else 0
+            while True:
+                try:
+                    os.link(tmp, os.path.join(self.path, SHARD_FMT % idx))
+                    break
+                except FileExistsError:
+                    idx += 1
+        finally:
+            os.unlink(tmp)
+
+    def columns(self):
+        columns = []
+        for shard in self.shards():
+            with np.load(shard) as data:
+                columns += [ k for k in data.files if k not in columns ]
+        return columns
+
+    def __len__(self):
+        n = 0
+        for shard in self.shards():
+            with np.load(shard) as data:
+                n += len(data[data.files[0]])
+        return n
+
+    def query(self, columns=None, where=None):
+        # Load the requested columns (all by default) of every row whose
+        # values match the where dict {column: value}. Columns a shard
+        # does not have come back as NaN/''.
+        if where is None:
+            where = {}
+        parts = []
+        for shard in self.shards():
+            with np.load(shard) as data:
+                mask = np.ones(len(data[data.files[0]]), dtype=bool)
+                for key, value in where.items():
+                    if key not in data.files:
+                        mask[:] = False
+                        break
+                    match = data[key] == value
+                    if match.ndim > 1:
+                        # Tuple column
+                        match = match.all(axis=1)
+                    mask &= match
+                if not mask.any():
+                    continue
+                keys = data.files if columns is None else columns
+                parts.append((int(mask.sum()), { k : data[k][mask]
+                    for k in keys if k in data.files }))
+
+        if columns is None:
+            columns = []
+            for _, part in parts:
+                columns += [ k for k in part if k not in columns ]
+
+        result = {}
+        for key in columns:
+            like = next((part[key] for _, part in parts if key in part),
+                    np.zeros(0))
+            result[key] = np.concatenate([ part[key] if key in part else
+                missing_column(like, n) for n, part in parts ] + [like[:0]])
+        return result
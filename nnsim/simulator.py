@@ -4,40 +4,165 @@ class Finish(Exception):
     pass
 
 class Simulator(object):
-    def __init__(self, tb_module, dump_stats):
+    def __init__(self, tb_module, dump_stats, compiled=False,
+            event_driven=False):
         self.tb_module = tb_module
         self.dump_stats = dump_stats
+        self.compiled = compiled or event_driven
+        self.event_driven = event_driven
         self.clk_ticks = 0
+        self.finish_msg = None
 
         self.tb_module.__setup__()
 
+        self.tick_list = []
+        self.ntick_list = []
+        self.dirty_list = []
+        if self.compiled:
+            self.compile()
+
+    def compile(self):
+        # Precompute the flat tick/ntick schedule so each cycle iterates two
+        # lists instead of recursing through every Reg and Channel
+        tick_list, ntick_list = [], []
+        self.tb_module.__schedule__(tick_list, ntick_list)
+        self.tick_list = tick_list
+
+        # Channels are registered under every module holding a reference to
+        # them, so the same Reg shows up several times. Committing it more
+        # than once per cycle is a no-op, so keep only the first occurrence.
+        seen = set()
+        self.state_list = []
+        for ntick in ntick_list:
+            if id(ntick.__self__) not in seen:
+                seen.add(id(ntick.__self__))
+                self.state_list.append(ntick.__self__)
+
+        # Regs and SRAMs put themselves on the dirty list when written, so
+        # the commit phase scales with write activity instead of design size.
+        # Anything else with an __ntick__ is committed every cycle.
+        self.dirty_list = []
+        self.ntick_list = []
+        for state in self.state_list:
+            if hasattr(state, 'dirty_list'):
+                state.dirty_list = self.dirty_list
+            else:
+                self.ntick_list.append(state.__ntick__)
+
+        if self.event_driven:
+            self.compile_events()
+
+    def compile_events(self):
+        # A ticking module can only observe the Regs and SRAMs reachable
+        # through its sub_modules (its own state and every Channel it was
+        # handed), so those are the state elements that wake it up.
+        #
+        # This only holds if every piece of state that decides what tick()
+        # does lives in those Regs, Channels and SRAMs. A module whose tick()
+        # reads plain Python attributes that change on their own (counters
+        # bumped every cycle, randomness, flags set by another module) is
+        # not woken up when they change and must set always_tick, or the
+        # event-driven run silently diverges from a compiled one.
+        self.watchers = { id(state) : [] for state in self.state_list }
+        self.always_active = []
+        for t, tick in enumerate(self.tick_list):
+            module = tick.__self__
+            if module.always_tick:
+                self.always_active.append(t)
+            visible = []
+            module.__schedule__([], visible)
+            for state_id in set(id(ntick.__self__) for ntick in visible):
+                self.watchers[state_id].append(t)
+
+        self.active = set(range(len(self.tick_list)))
+
+    def __tick__(self):
+        for tick in self.tick_list:
+            tick()
+
+    def __ntick__(self):
+        # A state element may put itself back on the dirty list to be
+        # committed again next cycle (SRAM accesses in flight), so commit a
+        # snapshot
+        dirty_list = self.dirty_list
+        dirty = dirty_list[:]
+        del dirty_list[:]
+        for state in dirty:
+            state.__ntick__()
+        for ntick in self.ntick_list:
+            ntick()
+
+    def __event_tick__(self):
+        tick_list = self.tick_list
+        for t in sorted(self.active):
+            tick_list[t]()
+
+    def __event_ntick__(self):
+        # Commit only the state elements written this cycle and wake up
+        # every module that can see them for the next cycle
+        active = set(self.always_active)
+        watchers = self.watchers
+        dirty_list = self.dirty_list
+        dirty = dirty_list[:]
+        del dirty_list[:]
+        for state in dirty:
+            state.__ntick__()
+            active.update(watchers[id(state)])
+        for ntick in self.ntick_list:
+            if ntick.__self__.__dirty__():
+                ntick()
+                active.update(watchers[id(ntick.__self__)])
+        self.active = active
+
     def reset(self):
         self.tb_module.__reset__()
         self.clk_ticks = 0
+        self.finish_msg = None
+        if self.compiled:
+            # Reset already cleared any pending writes
+            del self.dirty_list[:]
+        if self.event_driven:
+            self.active = set(range(len(self.tick_list)))
 
     def run(self, num_ticks, verbose=False):
+        if self.event_driven:
+            tick, ntick = self.__event_tick__, self.__event_ntick__
+        elif self.compiled:
+            tick, ntick = self.__tick__, self.__ntick__
+        else:
+            tick, ntick = self.tb_module.__tick__, self.tb_module.__ntick__
+
         curr_ticks = 0
         try:
             while (num_ticks is None) or (curr_ticks < num_ticks):
                 if verbose:
                     print("---- Tick #%d -----" % self.clk_ticks)
-                self.tb_module.__tick__()
+                tick()
                 if verbose:
                     print("---- NTick #%d ----" % self.clk_ticks)
-                self.tb_module.__ntick__()
+                ntick()
                 self.clk_ticks += 1
                 curr_ticks += 1
+
+                if self.event_driven and not self.active:
+                    # Nothing changed and nobody is free-running, so every
+                    # remaining cycle would be identical to this one
+                    if num_ticks is None:
+                        raise Finish("Design idle")
+                    self.clk_ticks += num_ticks - curr_ticks
+                    curr_ticks = num_ticks
         except Finish as msg:
+            self.finish_msg = str(msg)
             if self.dump_stats:
                 self.tb_module.finalize_stats()
                 self.tb_module.dump_stats()
-                
+
             print("\ncyc %d: %s" % (self.clk_ticks, msg))
         except KeyboardInterrupt:
             pass
 
-def run_tb(tb_module, nticks=None, verbose=False, dump_stats=False):
-    sim = Simulator(tb_module, dump_stats)
+def run_tb(tb_module, nticks=None, verbose=False, dump_stats=False,
+        compiled=False, event_driven=False):
+    sim = Simulator(tb_module, dump_stats, compiled, event_driven)
     sim.reset()
     sim.run(nticks, verbose)
-
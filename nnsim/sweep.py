@@ -0,0 +1,112 @@
+import contextlib
+import csv
+import importlib
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from nnsim.results import ResultStore
+from nnsim.cache import ResultCache, run_tb_cached
+from nnsim.layers import load_manifest
+
+# Default cycle budget of one run. A configuration the model does not
+# support may never finish, so every run is bounded.
+NTICKS = 1000000
+
+def grid(**params):
+    # Cartesian product of testbench parameters, e.g.
+    # grid(in_chn=[4, 8], out_chn=[8, 16]) gives four parameter dicts
+    keys = sorted(params)
+    return [ dict(zip(keys, values))
+             for values in itertools.product(*(params[k] for k in keys)) ]
+
+def run_point(model, params, package='models', tb_class='WSArchTB',
+        nticks=NTICKS, compiled=True, seed=0, cache=None):
+    # Run one testbench to completion (or fetch it from the ResultCache)
+    # and return its row of the table. Errors are recorded instead of
+    # raised so a bad configuration does not take down the whole sweep.
+    row = { 'model' : model }
+    row.update(params)
+    if params.get('layer') is not None:
+        # Tensor paths do not belong in the table
+        row['layer'] = params['layer']['name']
+
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        try:
+            tb_module = importlib.import_module('%s.%s.tb' % (package, model))
+            result = run_tb_cached(cache, getattr(tb_module, tb_class),
+                    params, seed, nticks, compiled)
+        except Exception as e:
+            row['result'] = "%s: %s" % (type(e).__name__, e)
+            return row
+
+    row['cycles'] = result['clk_ticks']
+    row['result'] = result['finish_msg']
+    if row['result'] is None:
+        row['result'] = "Unfinished after %d cycles" % result['clk_ticks']
+    row.update(result['stats'])
+    return row
+
+def sweep(models, points, max_workers=None, store=None, shard_size=1000,
+        **kwargs):
+    # Every (model, point) pair runs in its own worker process. Rows come
+    # back in submission order. With a ResultStore, finished rows are also
+    # appended to it every shard_size runs, so a long sweep that dies
+    # halfway keeps what it already simulated.
+    jobs = [ (model, params) for model in models for params in points ]
+    with ProcessPoolExecutor(max_workers) as executor:
+        futures = [ executor.submit(run_point, model, params, **kwargs)
+                    for model, params in jobs ]
+        if store is not None:
+            pending = []
+            for f in as_completed(futures):
+                pending.append(f.result())
+                if len(pending) == shard_size:
+                    store.append(pending)
+                    pending = []
+            store.append(pending)
+        return [ f.result() for f in futures ]
+
+def write_csv(rows, f):
+    columns = []
+    for row in rows:
+        columns += [ k for k in row if k not in columns ]
+    writer = csv.DictWriter(f, columns)
+    writer.writeheader()
+    writer.writerows(rows)
+
+if __name__ == "__main__":
+    # python -m nnsim.sweep sweep.json [-j N] [-o results/] > results.csv
+    # where sweep.json holds {"models": [...], "params": {name: [values]}}
+    # and optionally {"manifest": "net.json"} (see nnsim.layers)
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('config')
+    parser.add_argument('-j', '--jobs', type=int, default=None)
+    parser.add_argument('--nticks', type=int, default=NTICKS)
+    parser.add_argument('-o', '--store', default=None,
+            help="ResultStore directory to append to instead of CSV output")
+    parser.add_argument('--cache', default=None,
+            help="ResultCache directory for skipping already simulated runs")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+    params = config['params']
+    # JSON has no tuples
+    for key in ('image_size', 'filter_size'):
+        if key in params:
+            params[key] = [ tuple(v) for v in params[key] ]
+    # Every layer of a network manifest becomes one sweep point
+    if 'manifest' in config:
+        params['layer'] = load_manifest(config['manifest'])
+
+    store = ResultStore(args.store) if args.store else None
+    cache = ResultCache(args.cache) if args.cache else None
+    rows = sweep(config['models'], grid(**params), args.jobs, store,
+            nticks=args.nticks, cache=cache)
+    if store is None:
+        write_csv(rows, sys.stdout)
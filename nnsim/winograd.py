@@ -0,0 +1,146 @@
+from fractions import Fraction
+from math import gcd
+
+import numpy as np
+
+# Winograd F(m x m, r x r) transforms Y = A^T [(G g G^T) * (B^T d B)] A
+# generated with the Cook-Toom construction. The n = m + r - 1 points are
+# the point at infinity and 0, 1, -1, 2, -2, 1/2, -1/2, 3, ... (Lavin &
+# Gray). Every matrix is rescaled so that B^T and A^T are integer, i.e.
+# adders and constant shifts in hardware; the remaining rational factors
+# all end up in G, which is applied off the critical path to the weights.
+
+# Fraction bits of the transformed weights of F(2x2, 3x3)
+FRAC_BITS = 7
+
+def default_frac_bits(m):
+    # Fraction bits that keep F(m x m, 3x3) within an LSB or so of the
+    # exact convolution. The scale factors in G shrink quickly with m
+    # (down to 1/360 for m = 6), so 7 bits, exact for m = 2, leave F(6x6)
+    # with a negative SQNR.
+    return FRAC_BITS if m == 2 else 4*m
+
+def _points(count):
+    points = [ Fraction(0) ]
+    k = 1
+    while len(points) < count:
+        points += [ Fraction(k), Fraction(-k) ]
+        if k > 1:
+            points += [ Fraction(1, k), Fraction(-1, k) ]
+        k += 1
+    return points[:count]
+
+def _solve(C, rhs):
+    # Exact solution x of C x = rhs (C may be overdetermined)
+    rows, cols = len(C), len(C[0])
+    aug = [ list(C[i]) + [ rhs[i] ] for i in range(rows) ]
+    pivots = []
+    row = 0
+    for col in range(cols):
+        pivot = next((i for i in range(row, rows) if aug[i][col] != 0), None)
+        if pivot is None:
+            raise ValueError("Singular Winograd point set")
+        aug[row], aug[pivot] = aug[pivot], aug[row]
+        aug[row] = [ e/aug[row][col] for e in aug[row] ]
+        for i in range(rows):
+            if i != row and aug[i][col] != 0:
+                f = aug[i][col]
+                aug[i] = [ a - f*b for a, b in zip(aug[i], aug[row]) ]
+        pivots.append(row)
+        row += 1
+    if any(aug[i][-1] != 0 for i in range(row, rows)):
+        raise ValueError("Inconsistent Winograd point set")
+    return [ aug[p][-1] for p in pivots ]
+
+def _integer_scale(v):
+    # Positive s such that v/s is an integer vector without common factor
+    num = 0
+    den = 1
+    for e in v:
+        num = gcd(num, e.numerator)
+        den = den*e.denominator//gcd(den, e.denominator)
+    return Fraction(num, den)
+
+def _cook_toom(m, r):
+    n = m + r - 1
+    a = _points(n - 1)
+    one, zero = Fraction(1), Fraction(0)
+
+    # Evaluation at the finite points, the last column/row is infinity
+    A_T = [ [ a[j]**i for j in range(n - 1) ] + [ -one if i == m - 1 else zero ]
+            for i in range(m) ]
+    G = []
+    for j in range(n - 1):
+        f = one
+        for l in range(n - 1):
+            if l != j:
+                f *= a[j] - a[l]
+        G.append([ a[j]**k/f for k in range(r) ])
+    G.append([ one if k == r - 1 else zero for k in range(r) ])
+
+    # B^T is whatever makes y_i = sum_k d_{i+k} g_k exact
+    C = [ [ A_T[i][j]*G[j][k] for j in range(n) ]
+          for i in range(m) for k in range(r) ]
+    cols = [ _solve(C, [ one if l == i + k else zero
+                         for i in range(m) for k in range(r) ])
+             for l in range(n) ]
+    B_T = [ [ cols[l][j] for l in range(n) ] for j in range(n) ]
+
+    # Move every scale factor into G: G = diag(s) G_int
+    s = []
+    for j in range(n):
+        if next(e for e in G[j] if e != 0) < 0:
+            G[j] = [ -e for e in G[j] ]
+            B_T[j] = [ -e for e in B_T[j] ]
+        g = _integer_scale(G[j])
+        G[j] = [ e/g for e in G[j] ]
+        b = _integer_scale(B_T[j])
+        B_T[j] = [ e/b for e in B_T[j] ]
+        col = _integer_scale([ A_T[i][j] for i in range(m) ])
+        for i in range(m):
+            A_T[i][j] /= col
+        s.append(g*b*col)
+    return B_T, G, s, A_T
+
+def winograd_matrices(m, r=3):
+    # B^T: (n, n) and A^T: (m, n) int64 and G: (n, r) float64 of
+    # F(m x m, r x r). For m = 2 these are the matrices of the original
+    # ws_2d_winograd models.
+    B_T, G, s, A_T = _cook_toom(m, r)
+    G = [ [ float(s[j]*e) for e in G[j] ] for j in range(len(G)) ]
+    return np.array(B_T, dtype=np.int64), np.array(G), \
+            np.array(A_T, dtype=np.int64)
+
+def weight_transform(m, r=3, frac_bits=FRAC_BITS):
+    # The weight transform as the hardware does it: the integer transform
+    # G_int g G_int^T followed by a constant multiply of every element with
+    # its fixed point factor 2**frac_bits*s_i*s_j, rounding down. Returns
+    # G_int: (n, r) and the factors as numerator and denominator: (n, n),
+    # U = (G_int g G_int^T)*num//den. For m = 2 the denominators are 1 and
+    # the factors the shifts of the original PreTransformWeights.
+    _, G, s, _ = _cook_toom(m, r)
+    scale = [ [ s_i*s_j*2**frac_bits for s_j in s ] for s_i in s ]
+    num = [ [ e.numerator for e in row ] for row in scale ]
+    den = [ [ e.denominator for e in row ] for row in scale ]
+    return np.array(G, dtype=np.int64), np.array(num, dtype=np.int64), \
+            np.array(den, dtype=np.int64)
+
+def transform_schedule(L):
+    # Schedule of a transform unit computing Y = L X L^T while X arrives
+    # one element per cycle in row-major order. Returns, per input
+    # element, the (output index, coefficient) pairs it is accumulated
+    # into and, per output element (row-major), the index of the input
+    # after which it is final.
+    L = np.asarray(L)
+    p, q = L.shape
+    terms = []
+    for e in range(q*q):
+        r, c = e//q, e % q
+        terms.append([ (i*p + j, int(L[i, r]*L[j, c]))
+                       for i in range(p) for j in range(p)
+                       if L[i, r]*L[j, c] != 0 ])
+    final = [0]*(p*p)
+    for e, outs in enumerate(terms):
+        for o, _ in outs:
+            final[o] = e
+    return terms, final
@@ -0,0 +1,94 @@
+import os
+import pytest
+import nnsim.cache
+from nnsim.cache import ResultCache, run_tb_cached
+from models.ws_2d.tb import WSArchTB
+
+def test_cache_hit(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path))
+    result = run_tb_cached(cache, WSArchTB, {'out_chn' : 4})
+    assert result['clk_ticks'] == 188
+    assert result['finish_msg'] == 'Success'
+    assert len(cache.entries()) == 1
+
+    # A hit must not simulate again
+    def no_sim(*args, **kwargs):
+        raise AssertionError("simulated on a cache hit")
+    monkeypatch.setattr(nnsim.cache, 'Simulator', no_sim)
+    assert run_tb_cached(cache, WSArchTB, {'out_chn' : 4}) == result
+    with pytest.raises(AssertionError):
+        run_tb_cached(cache, WSArchTB, {'out_chn' : 4}, seed=1)
+
+def test_cache_unfinished(tmp_path):
+    # A run cut off before it finished is not stored
+    cache = ResultCache(str(tmp_path))
+    result = run_tb_cached(cache, WSArchTB, {'out_chn' : 4}, nticks=10)
+    assert result['finish_msg'] is None
+    assert cache.entries() == []
+
+def test_cache_none(tmp_path):
+    # A stored None is a hit, not a miss
+    cache = ResultCache(str(tmp_path))
+    cache.put('k0', None)
+    assert cache.get('k0') is None
+    with pytest.raises(KeyError):
+        cache.get('k1')
+
+def test_cache_key(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = cache.key(WSArchTB, {'out_chn' : 4}, 0, None)
+    assert key == cache.key(WSArchTB, {'out_chn' : 4}, 0, None)
+    assert key != cache.key(WSArchTB, {'out_chn' : 8}, 0, None)
+    assert key != cache.key(WSArchTB, {'out_chn' : 4}, 1, None)
+    assert key != cache.key(WSArchTB, {'out_chn' : 4}, 0, 100)
+
+def test_cache_lru_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path), max_entries=2)
+    for i in range(3):
+        cache.put('k%d' % i, i)
+        # Make sure mtimes are ordered even on coarse filesystems
+        os.utime(cache.entry('k%d' % i), (i, i))
+    with pytest.raises(KeyError):
+        cache.get('k0')
+    assert len(cache.entries()) == 2
+
+    # Touching k1 makes k2 the least recently used entry
+    assert cache.get('k1') == 1
+    cache.put('k3', 3)
+    with pytest.raises(KeyError):
+        cache.get('k2')
+    assert cache.get('k1') == 1 and cache.get('k3') == 3
+
+def test_cache_size_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1)
+    cache.put('k0', list(range(100)))
+    assert cache.entries() == []
+
+def test_cache_evict_only_over_bound(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path), max_entries=3)
+    cache.put('k0', 0)
+    listings = []
+    entries = cache.entries
+    def counted_entries():
+        listings.append(1)
+        return entries()
+    monkeypatch.setattr(cache, 'entries', counted_entries)
+    # Storing (or overwriting) below the bound does not list the cache
+    cache.put('k1', 1)
+    cache.put('k1', 1)
+    cache.put('k2', 2)
+    assert listings == []
+    cache.put('k3', 3)
+    assert len(listings) == 1
+    assert len(entries()) == 3
+
+def test_cache_get_evicted(tmp_path, monkeypatch):
+    # An entry removed between the read and the LRU touch is a miss
+    cache = ResultCache(str(tmp_path))
+    cache.put('k0', 0)
+    def utime(path, *args):
+        os.remove(path)
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(nnsim.cache.os, 'utime', utime)
+    with pytest.raises(KeyError):
+        cache.get('k0')
@@ -1,11 +1,11 @@
 import pytest, random
 from nnsim.module import Module
-from nnsim.channel import Channel
+from nnsim.channel import Channel, ChannelBank, ChannelError
 import nnsim.simulator as sim
 
 class ChannelTB(Module):
-    def instantiate(self):
-        self.channel = Channel(4)
+    def instantiate(self, channel=None):
+        self.channel = Channel(4) if channel is None else channel
         self.push_count = 0
         self.free_count = 0
         self.test_size = 100
@@ -38,3 +38,77 @@ class ChannelTB(Module):
 def test_channel():
     channel_tb = ChannelTB()
     sim.run_tb(channel_tb, 100, True)
+
+class BankTB(ChannelTB):
+    # Owns a bank and exercises one of its channels through a view
+    def instantiate(self, bank, i):
+        self.bank = bank
+        ChannelTB.instantiate(self, bank[i])
+
+class CountingBank(ChannelBank):
+    def instantiate(self, *args):
+        ChannelBank.instantiate(self, *args)
+        self.commits = 0
+
+    def __ntick__(self):
+        self.commits += 1
+        ChannelBank.__ntick__(self)
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_channel_bank_view(compiled):
+    bank = CountingBank(3, 4)
+    channel_tb = BankTB(bank, 1)
+    assert channel_tb.channel.sub_modules == []
+    sim.run_tb(channel_tb, 100, True, compiled=compiled)
+    assert not bank.valid(0) and not bank.valid(2)
+    # The owner commits the bank once per cycle, not once per view
+    assert 0 < bank.commits <= 100
+
+def test_channel_bank_masks():
+    bank = ChannelBank(4, 2)
+    simulator = sim.Simulator(bank, False)
+    simulator.reset()
+    bank[0].push(1)
+    bank[2].push(2)
+    # Pushes only become visible after the commit
+    assert not bank.valid_mask().any()
+    with pytest.raises(ChannelError):
+        bank[0].push(3)
+    simulator.run(1)
+    assert list(bank.valid_mask()) == [True, False, True, False]
+    bank[2].push(4)
+    simulator.run(1)
+    assert list(bank.vacancy_mask()) == [True, True, False, True]
+    assert bank[2].pop() == 2 and bank[2].peek(1) == 4
+
+def test_channel_bank_groups():
+    bank = ChannelBank((2, 3), 2)
+    simulator = sim.Simulator(bank, False)
+    simulator.reset()
+    # One value per row, fanned out to every column of that row
+    bank.multicast_push((slice(0, 2), slice(0, 3)), [[10], [20]])
+    simulator.run(1)
+    bank.broadcast_push((1, slice(1, 3)), 7)
+    simulator.run(1)
+    assert not bank.all_vacant((1, slice(0, 3)))
+    assert bank.all_vacant((0, slice(0, 3)))
+    assert not bank.all_valid((slice(0, 2), 0), 1)
+    assert bank.all_valid((1, slice(1, 3)), 1)
+    assert [bank[0][x].pop() for x in range(3)] == [10, 10, 10]
+    assert [bank[1][x].peek(1) for x in range(1, 3)] == [7, 7]
+    with pytest.raises(ChannelError):
+        bank.broadcast_push((1, slice(0, 3)), 0)
+
+def test_channel_bank_masked():
+    bank = ChannelBank((2, 2), 2)
+    simulator = sim.Simulator(bank, False)
+    simulator.reset()
+    mask = [[True, False], [False, True]]
+    bank.masked_push(mask, [1, 2])
+    with pytest.raises(ChannelError):
+        bank.masked_pop(mask)
+    simulator.run(1)
+    assert list(bank.masked_peek(mask)) == [1, 2]
+    assert list(bank.masked_pop([[False, False], [False, True]])) == [2]
+    simulator.run(1)
+    assert bank[0].all_valid(0) and not bank[1].all_valid(slice(0, 2))
@@ -1,5 +1,5 @@
 import pytest
-from nnsim.costs import CostModel
+from nnsim.costs import CostModel, EnergyTable
 
 def test_default_cost():
     cm = CostModel()
@@ -10,3 +10,77 @@ def test_default_cost():
     cm.count("GB", 30)
     cm.count("DRAM", 10)
     assert cm.energy(True) == 2470
+
+def test_bitwidth_scaling():
+    cm = CostModel()
+    cm.init(bitwidth=16)
+    assert cm.cost["ALU"] == 0.5
+    assert cm.cost["MUL"] == 0.25
+    assert cm.cost["RF"] == 0.5
+    cm.count("MUL", 100)
+    cm.count("ALU", 100)
+    assert cm.energy(False) == 75
+
+def test_memory_and_node_scaling():
+    cm = CostModel().init(buffer_kb=400)
+    assert cm.cost["GB"] == 12
+    assert cm.cost["RF"] == 1
+    cm = CostModel().init(node=28)
+    assert cm.cost["ALU"] == pytest.approx(28/65.)
+    assert cm.cost["GB"] == pytest.approx(6*28/65.)
+    assert cm.cost["DRAM"] == 200
+
+def test_energy_table(tmpdir):
+    path = tmpdir.join("gb.csv")
+    path.write("size_bytes,bitwidth,energy\n1024,32,2\n4096,32,4\n")
+    table = EnergyTable.load(str(path))
+    assert table.energy(1024) == 2
+    assert table.energy(2048) == 3
+    assert table.energy(2048, 16) == 1.5
+    assert table.energy(16384) == 8
+    cm = CostModel().init(buffer_kb=2, tables={ "GB" : str(path) })
+    assert cm.cost["GB"] == 3
+
+def test_stats():
+    stats = [ { 'pe_mac' : 10, 'pe_rf_rd' : 5, 'pe_chn_push' : 10 },
+              { 'size' : (16, 4), 'ifmap_glb_rd' : 4, 'dram_rd' : 2 },
+              { 'post_tr_alu_comp' : 3, 'noc_multicast' : 7 } ]
+    raw_stats = CostModel().init().stats(stats)
+    assert raw_stats['pe_comp_energy'] == 20
+    assert raw_stats['tr_alu_comp_energy'] == 3
+    assert raw_stats['total_mem_acc'] == 11
+    assert raw_stats['total_noc_multicasts'] == 7
+    # The 16 x 4 word GLB (256B) costs 6*sqrt(256B/100kB) per access
+    assert raw_stats['glb_energy'] == pytest.approx(4*0.3)
+    assert raw_stats['total_energy'] == \
+            pytest.approx(20 + 3 + 5 + 4*0.3 + 2*200)
+    # Without a size the GLB is the reference 100kB one, and integer
+    # counts at whole costs give integer energies
+    stats[1]['size'] = None
+    raw_stats = CostModel().init().stats(stats)
+    assert raw_stats['total_energy'] == 20 + 3 + 5 + 4*6 + 2*200
+    assert isinstance(raw_stats['total_energy'], int)
+    # A GLB of size 0 only passes data through
+    stats[1]['size'] = (0, 0)
+    raw_stats = CostModel().init().stats(stats)
+    assert raw_stats['glb_mem_acc'] == 0
+    stats[1]['size'] = (16, 4)
+    # Per-prefix models, e.g. a 16 bit PE datapath
+    cm = CostModel().init()
+    raw_stats = cm.stats(stats, [ ('pe_', cm.derive(bitwidth=16)) ])
+    assert raw_stats['pe_comp_energy'] == 7.5
+    assert raw_stats['rf_energy'] == 2.5
+    assert repr(cm.derive(node=28)) == repr(CostModel().init(node=28))
+
+def test_dram_access_pattern():
+    # Row activations and refreshes of the DRAM model add to the words,
+    # its other counters carry no energy
+    cm = CostModel().init()
+    words = { 'dram_rd' : 16, 'dram_wr' : 16 }
+    dram = { 'dram_row_miss' : 2, 'dram_row_hit' : 6, 'dram_refresh' : 1,
+             'dram_burst' : 8, 'dram_bus_cycles' : 40 }
+    raw_stats = cm.stats([ words, dram ])
+    assert raw_stats['dram_mem_acc'] == 32
+    assert raw_stats['dram_energy'] == 32*cm.cost["DRAM"] + \
+            2*cm.cost["DRAM_ACT"] + cm.cost["DRAM_REF"]
+    assert raw_stats['total_energy'] == raw_stats['dram_energy']
@@ -0,0 +1,94 @@
+import pytest
+from nnsim.module import Module
+from nnsim.reg import Reg
+from nnsim.channel import Channel
+from nnsim.dram import DRAM
+import nnsim.simulator as sim
+from nnsim.cache import run_tb_cached
+from models.ws_2d.tb import WSArchTB
+
+class StreamTB(Module):
+    # Reads words 0..n-1 through the DRAM and records the cycle each one
+    # arrives in
+    def instantiate(self, trace, n, **dram):
+        self.trace = trace
+        self.n = n
+        self.src_chn = Channel()
+        self.rd_chn = Channel()
+        self.wr_chn = Channel()
+        self.dst_chn = Channel()
+        self.dram = DRAM(self.src_chn, self.rd_chn, self.wr_chn, self.dst_chn,
+                **dram)
+        self.cycle = Reg(0)
+        self.sent = Reg(0)
+
+    def tick(self):
+        cycle = self.cycle.rd()
+        self.cycle.wr(cycle + 1)
+        sent = self.sent.rd()
+        if sent < self.n and self.src_chn.vacancy():
+            self.src_chn.push(sent)
+            self.sent.wr(sent + 1)
+        if self.rd_chn.valid():
+            self.trace.append((cycle, self.rd_chn.pop()))
+            if len(self.trace) == self.n:
+                raise sim.Finish("done")
+
+def stream(n, compiled=True, event_driven=False, **dram):
+    trace = []
+    tb = StreamTB(trace, n, **dram)
+    sim.run_tb(tb, 1000, compiled=compiled, event_driven=event_driven)
+    return trace, tb.dram.raw_stats
+
+@pytest.mark.parametrize("compiled, event_driven", [
+    (False, False), (True, False), (True, True)])
+def test_burst_timing(compiled, event_driven):
+    # One 4 word burst to a closed bank: t_rcd + t_cas, then a word per
+    # cycle. The next burst hits the open row and only pays t_cas.
+    trace, stats = stream(8, compiled, event_driven, word_bytes=8,
+            bandwidth=8, burst_len=4, t_cas=2, t_rcd=3)
+    assert [ d for _, d in trace ] == list(range(8))
+    cycles = [ c for c, _ in trace ]
+    assert [ b - a for a, b in zip(cycles, cycles[1:]) ] == \
+            [1, 1, 1, 3, 1, 1, 1]
+    assert stats['dram_row_miss'] == 1
+    assert stats['dram_row_hit'] == 1
+    assert stats['dram_burst'] == 2
+
+def test_bandwidth():
+    # Half a word per cycle
+    trace, stats = stream(4, word_bytes=8, bandwidth=4, burst_len=4)
+    cycles = [ c for c, _ in trace ]
+    assert [ b - a for a, b in zip(cycles, cycles[1:]) ] == [2, 2, 2]
+    assert stats['dram_bus_idle'] == 4
+
+def test_row_misses_and_refresh():
+    # A burst per row opens a row every time, a refresh closes them all
+    _, stats = stream(16, word_bytes=8, burst_len=4, row_bytes=32, banks=2)
+    assert stats['dram_row_miss'] == 4
+    assert stats['dram_row_hit'] == 0
+    _, stats = stream(16, word_bytes=8, burst_len=4, refresh_interval=20,
+            refresh_cycles=5)
+    assert stats['dram_refresh'] > 0
+    assert stats['dram_row_miss'] > 1
+
+def test_ws_2d_dram():
+    # The ideal link is unchanged, a slower DRAM costs cycles, and the
+    # same words cost more energy when every burst opens a row
+    results = {}
+    for name, dram in (('ideal', None), ('fast', {'bandwidth' : 16}),
+            ('slow', {'bandwidth' : 4}),
+            ('rows', {'bandwidth' : 16, 'row_bytes' : 64})):
+        result = run_tb_cached(None, WSArchTB, { 'dram' : dram }, nticks=5000)
+        assert result['finish_msg'] == "Success"
+        results[name] = result
+    assert results['ideal']['clk_ticks'] == 351
+    assert results['fast']['clk_ticks'] < results['slow']['clk_ticks']
+    stats = { name : result['stats'] for name, result in results.items() }
+    assert stats['rows']['/tb/dram_mem_acc'] == \
+            stats['fast']['/tb/dram_mem_acc'] == \
+            stats['ideal']['/tb/dram_mem_acc']
+    assert stats['rows']['/tb/dram/dram_row_miss'] > \
+            stats['fast']['/tb/dram/dram_row_miss']
+    assert stats['rows']['/tb/dram_energy'] > \
+            stats['fast']['/tb/dram_energy'] > stats['ideal']['/tb/dram_energy']
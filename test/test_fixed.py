@@ -0,0 +1,30 @@
+import pytest
+import numpy as np
+from nnsim.fixed import rescale, fit, Precision, FixedPointError
+
+def test_rescale():
+    x = np.array([-3, -2, -1, 0, 1, 2, 3])
+    assert list(rescale(x, 2)) == [-2, -1, -1, 0, 0, 1, 1]
+    assert list(rescale(x, 2, 'nearest')) == [-1, -1, 0, 0, 1, 1, 2]
+    assert rescale(7, 1) == 7
+
+def test_fit():
+    x = np.array([-200, -128, 127, 128, 300])
+    assert list(fit(x)) == list(x)
+    assert list(fit(x, 8)) == [-128, -128, 127, 127, 127]
+    assert list(fit(x, 8, 'wrap')) == [56, -128, 127, -128, 44]
+
+def test_precision():
+    p = Precision(psum=16, rounding='nearest')
+    assert p.width('psum') == 16
+    assert p.width('ifmap') is None
+    assert p.width('ifmap', 32) == 32
+    assert p.quantize('ifmap', 2**40) == 2**40
+    assert p.quantize('psum', 2**40) == 2**15 - 1
+    assert p.quantize('weight', 3, 2) == 2
+    assert p == Precision(psum=16, rounding='nearest')
+    assert p != Precision(psum=16)
+    with pytest.raises(FixedPointError):
+        Precision(rounding='up')
+    with pytest.raises(FixedPointError):
+        Precision(ifmap=1)
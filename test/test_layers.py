@@ -0,0 +1,90 @@
+import os
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from nnsim.layers import save_layer, save_manifest, load_manifest, \
+    open_layer, layer_shape
+from nnsim.cache import ResultCache, run_tb_cached
+from nnsim.channel import Channel
+from nnsim.reference import conv, conv_cols
+from models.ws_2d.tb import WSArchTB
+from models.ws_2d.stimulus import Stimulus
+
+def make_layer(path):
+    # A 4x4x4 -> 8 channel 3x3 layer saved under path with its manifest
+    rng = np.random.RandomState(0)
+    ifmap = rng.randint(-20, 20, (4, 4, 4))
+    weights = rng.randint(-20, 20, (3, 3, 4, 8))
+    bias = rng.randint(-20, 20, 8)
+    entry = save_layer(str(path), 'conv1', ifmap, weights, bias)
+    manifest = os.path.join(str(path), 'net.json')
+    save_manifest(manifest, [entry])
+    return manifest, ifmap, weights, bias
+
+def test_roundtrip(tmp_path):
+    manifest, ifmap, weights, bias = make_layer(tmp_path)
+    layer, = load_manifest(manifest)
+    assert layer['name'] == 'conv1'
+    layer_ifmap, layer_weights, layer_bias = open_layer(layer)
+    assert isinstance(layer_ifmap, np.memmap)
+    np.testing.assert_array_equal(layer_ifmap, ifmap)
+    np.testing.assert_array_equal(layer_weights, weights)
+    np.testing.assert_array_equal(layer_bias, bias)
+    assert layer_shape(layer) == ((4, 4), (3, 3), 4, 8)
+
+def test_channel_mismatch(tmp_path):
+    manifest, ifmap, weights, bias = make_layer(tmp_path)
+    entry = save_layer(str(tmp_path), 'bad', ifmap[:, :, :2], weights, bias)
+    save_manifest(manifest, [entry])
+    layer, = load_manifest(manifest)
+    with pytest.raises(ValueError):
+        layer_shape(layer)
+
+def test_ws_2d_layer(tmp_path):
+    manifest, _, _, _ = make_layer(tmp_path)
+    layer, = load_manifest(manifest)
+    result = run_tb_cached(None, WSArchTB, { 'layer' : layer }, nticks=20000)
+    assert result['finish_msg'] == "Success"
+
+def test_layer_not_materialised(tmp_path):
+    # Loading a layer neither copies the ifmap nor allocates the ofmap or
+    # the reference: only a column of outputs is held at a time
+    rng = np.random.RandomState(0)
+    entry = save_layer(str(tmp_path), 'big', rng.randint(-20, 20,
+        (128, 128, 32)), rng.randint(-20, 20, (3, 3, 32, 32)),
+        rng.randint(-20, 20, 32))
+    manifest = os.path.join(str(tmp_path), 'net.json')
+    save_manifest(manifest, [entry])
+    layer, = load_manifest(manifest)
+    ifmap, _, _ = open_layer(layer)
+    stimulus = Stimulus(8, 4, 4, Channel(), Channel())
+    tracemalloc.start()
+    try:
+        stimulus.configure(None, None, None, None, layer)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert stimulus.deserializer.ofmap is None
+    assert peak < ifmap.nbytes//16
+
+def test_conv_cols():
+    rng = np.random.RandomState(0)
+    weights = rng.randint(-20, 20, (3, 3, 4, 8))
+    ifmap = np.random.RandomState(1).randint(-20, 20, (5, 6, 4))
+    bias = np.random.RandomState(2).randint(-20, 20, (5, 6, 8))
+    for b in (rng.randint(-20, 20, 8), bias):
+        reference = conv(ifmap, weights, b)
+        for y0, y1 in ((0, 1), (2, 4), (5, 6), (0, 6)):
+            np.testing.assert_array_equal(
+                    conv_cols(ifmap, weights, b, y0, y1),
+                    reference[:, y0:y1])
+
+def test_cache_sees_tensor_changes(tmp_path):
+    manifest, _, _, _ = make_layer(tmp_path)
+    cache = ResultCache(str(tmp_path / 'cache'))
+    layer, = load_manifest(manifest)
+    key = cache.key(WSArchTB, { 'layer' : layer }, 0, None)
+    np.save(layer['bias'], np.zeros(16, dtype=np.int64))
+    assert cache.key(WSArchTB, { 'layer' : layer }, 0, None) != key
@@ -0,0 +1,194 @@
+import pytest
+import numpy as np
+from nnsim.module import Module, ModuleList
+from nnsim.reg import Reg
+from nnsim.ram import SRAM, BankedSRAM, RequestTracker, RAMError, RD, WR
+import nnsim.simulator as sim
+from nnsim.cache import run_tb_cached, collect_stats
+from models.ws_2d.tb import WSArchTB
+from models.ws_2d_passes.tb import WSArchTB as PassesTB
+from models.ws_2d_winograd_on_chip.tb import WSArchTB as OnChipTB
+from models.ws_2d_winograd_post_on.tb import WSArchTB as PostOnTB
+from models.ws_2d_winograd_off.tb import WSArchTB as OffTB
+
+def test_bank_mapping():
+    low = BankedSRAM(64, nbanks=4)
+    assert [ low.bank(a) for a in range(0, 32, 4) ] == [0]*8
+    xor = BankedSRAM(64, nbanks=4, interleave='xor')
+    assert sorted(xor.bank(a) for a in range(0, 16, 4)) == [0, 1, 2, 3]
+    assert sorted(xor.bank(a) for a in range(4)) == [0, 1, 2, 3]
+    with pytest.raises(RAMError):
+        BankedSRAM(64, nbanks=3, interleave='xor')
+
+def test_bank_conflict_stalls():
+    sram = BankedSRAM(16, nbanks=2, nports=2)
+    assert sram.request(WR, 2, 7, port=1)
+    assert not sram.request(RD, 4, port=0) # bank 0 is busy
+    sram.__ntick__()
+    assert sram.request(RD, 2, port=0)
+    assert sram.request(WR, 3, 8, port=1)
+    sram.__ntick__()
+    assert sram.response(0) == 7
+    assert sram.raw_stats['bank0_wr'] == 1
+    assert sram.raw_stats['bank0_rd'] == 1
+    assert sram.raw_stats['bank1_wr'] == 1
+    assert sram.raw_stats['bank0_conflict'] == 1
+    assert sram.raw_stats['bank_conflict'] == 1
+    # A second request on the same port is still a protocol error
+    sram.request(RD, 0, port=0)
+    with pytest.raises(RAMError):
+        sram.request(RD, 1, port=0)
+
+def test_banked_psum_glb():
+    # One bank serializes the PE psum writes with the reads and costs
+    # cycles; enough banks take them all in parallel
+    cycles = {}
+    for banks in (None, 1, 4):
+        result = run_tb_cached(None, WSArchTB, { 'psum_glb_banks' : banks },
+                nticks=5000)
+        assert result['finish_msg'] == "Success"
+        cycles[banks] = result['clk_ticks']
+        if banks is not None:
+            conflicts = result['stats']['/tb/chip/psum_glb/sram/bank_conflict']
+            assert (conflicts > 0) == (banks == 1)
+    assert cycles[1] > cycles[4] == cycles[None]
+
+def test_response_is_not_overwritten():
+    # Responses are fresh arrays, a later read does not change them
+    sram = SRAM(4, 2)
+    sram.data[:] = [[1, 2], [3, 4], [5, 6], [7, 8]]
+    sram.request(RD, 1)
+    sram.__ntick__()
+    first = sram.response()
+    sram.request(RD, 2)
+    sram.__ntick__()
+    assert list(first) == [3, 4]
+    assert list(sram.response()) == [5, 6]
+
+def test_response_sees_no_later_write():
+    # Nor does a write to the address of a response still in flight, and
+    # the writer may reuse its buffer before the write lands
+    sram = SRAM(4, 2)
+    sram.data[:] = [[1, 2], [3, 4], [5, 6], [7, 8]]
+    sram.request(RD, 1)
+    sram.__ntick__()
+    first = sram.response()
+    word = np.array([9, 9])
+    sram.request(WR, 1, word)
+    word[:] = 0
+    sram.__ntick__()
+    assert list(first) == [3, 4]
+    assert list(sram.data[1]) == [9, 9]
+
+class LatencyTB(Module):
+    # Reads address n in cycle n (zeros for odd n served by the client)
+    # through a tracker and records when each response comes back
+    def instantiate(self, trace, latency, depth):
+        self.trace = trace
+        self.sram = SRAM(16, latency=latency)
+        self.sram.data[:, 0] = np.arange(16)*10
+        self.tracker = RequestTracker(self.sram, depth)
+        self.cycle = Reg(0)
+
+    def tick(self):
+        cycle = self.cycle.rd()
+        self.cycle.wr(cycle + 1)
+        if cycle < 8 and self.tracker.can_issue():
+            if cycle % 2:
+                self.tracker.skip(-1)
+            else:
+                self.tracker.read(cycle)
+        if self.tracker.valid():
+            self.trace.append((cycle, self.tracker.pop()))
+        if cycle == 30:
+            raise sim.Finish("done")
+
+@pytest.mark.parametrize("compiled, event_driven", [
+    (False, False), (True, False), (True, True)])
+def test_latency(compiled, event_driven):
+    # Fixed latency: one response per cycle, 3 cycles after its request
+    trace = []
+    sim.run_tb(LatencyTB(trace, 3, 4), 40, compiled=compiled,
+            event_driven=event_driven)
+    assert trace == [ (c + 3, c*10 if c % 2 == 0 else -1) for c in range(8) ]
+
+def test_variable_latency():
+    # Slow reads hold back everything behind them, the order is kept
+    trace = []
+    latency = lambda address: 6 if address == 2 else 1
+    sim.run_tb(LatencyTB(trace, latency, 8), 40, compiled=True)
+    assert [ d for _, d in trace ] == [0, -1, 20, -1, 40, -1, 60, -1]
+    assert [ c for c, _ in trace ][2:4] == [8, 9]
+
+def test_tracker_depth():
+    # Two outstanding requests cannot cover a 3 cycle latency
+    trace = []
+    tb = LatencyTB(trace, 3, 2)
+    sim.run_tb(tb, 40, compiled=True)
+    # Requests in cycles 0 and 1, the next ones only in 4 and 5
+    assert trace == [ (3, 0), (4, -1), (7, 40), (8, -1) ]
+    assert tb.tracker.raw_stats['max_outstanding'] == 2
+    assert tb.tracker.raw_stats['full_stall'] > 0
+
+class RegionTB(Module):
+    def instantiate(self, trace):
+        # Reads alternate between two SRAMs of different latency
+        self.trace = trace
+        self.srams = ModuleList()
+        for latency in (3, 1):
+            self.srams.append(SRAM(8, latency=latency))
+        self.tracker = RequestTracker(self.srams, 4)
+        self.cycle = Reg(0)
+
+    def setup(self):
+        for region, sram in enumerate(self.srams):
+            sram.data[:, 0] = np.arange(8) + 10*region
+
+    def tick(self):
+        cycle = self.cycle.rd()
+        self.cycle.wr(cycle + 1)
+        if cycle < 4:
+            self.tracker.read(cycle, cycle % 2)
+        if self.tracker.valid():
+            self.trace.append((cycle, self.tracker.pop()))
+        if cycle == 20:
+            raise sim.Finish("done")
+
+def test_tracker_regions():
+    # Responses of the faster SRAM wait for the older ones of the slower
+    trace = []
+    sim.run_tb(RegionTB(trace), 40, compiled=True)
+    assert trace == [ (3, 0), (4, 11), (5, 2), (6, 13) ]
+
+@pytest.mark.parametrize("tb_class, params", [(WSArchTB, {}),
+    (PassesTB, {}), (PassesTB, { 'prefetch' : True }), (OnChipTB, {}),
+    (PostOnTB, {}), (OffTB, {})])
+def test_glb_latency(tb_class, params):
+    # Enough outstanding reads hide the SRAM latency, too few do not
+    cycles = {}
+    for latency, outstanding in ((1, None), (4, None), (4, 2)):
+        result = run_tb_cached(None, tb_class, dict(params,
+            glb_latency=latency, glb_outstanding=outstanding), nticks=20000)
+        assert result['finish_msg'] == "Success"
+        cycles[latency, outstanding] = result['clk_ticks']
+    assert cycles[4, None] == cycles[1, None] < cycles[4, 2]
+
+def slow_rows(address):
+    # Every fourth GLB row takes 4 cycles, the others 1
+    return 4 if address % 4 == 0 else 1
+
+def test_glb_variable_latency():
+    # An address dependent latency needs the number of outstanding reads
+    with pytest.raises(ValueError):
+        WSArchTB(glb_latency=slow_rows)
+    fixed = run_tb_cached(None, WSArchTB, { 'glb_latency' : 1 }, nticks=5000)
+    tb = WSArchTB(glb_latency=slow_rows, glb_outstanding=2)
+    simulator = sim.Simulator(tb, False, True)
+    simulator.reset()
+    simulator.run(5000)
+    assert simulator.finish_msg == "Success"
+    assert simulator.clk_ticks > fixed['clk_ticks']
+    tb.finalize_stats()
+    stats = collect_stats(tb)
+    for key in ('/tb/chip/ifmap_glb/ifmap_glb_rd', '/tb/glb_mem_acc'):
+        assert stats[key] == fixed['stats'][key]
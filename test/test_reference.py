@@ -0,0 +1,115 @@
+import pytest
+import numpy as np
+from scipy.signal import correlate2d
+from nnsim.reference import conv, winograd_conv, WINOGRAD_B_T, WINOGRAD_G, \
+        WINOGRAD_A_T
+
+def conv_loop(x, W, b, mode):
+    # The per-channel-pair reference the stimuli used to compute
+    y = 0
+    for in_channel in range(W.shape[2]):
+        y = y + np.stack([ correlate2d(x[:, :, in_channel],
+            W[:, :, in_channel, k], mode=mode) for k in range(W.shape[3]) ],
+            axis=-1)
+    return y + b
+
+@pytest.mark.parametrize("mode", ["same", "valid"])
+@pytest.mark.parametrize("image_size, filter_size", [
+    ((4, 4), (3, 3)), ((5, 7), (3, 3)), ((6, 6), (2, 2)), ((7, 5), (4, 3)),
+    ((8, 8), (1, 1)), ((5, 5), (5, 5)),
+])
+def test_conv_matches_correlate2d(image_size, filter_size, mode):
+    rng = np.random.RandomState(0)
+    x = rng.randint(-100, 100, image_size + (3,))
+    W = rng.randint(-100, 100, filter_size + (3, 4))
+    b = rng.randint(-100, 100, 4)
+    y = conv(x, W, b, mode)
+    assert y.dtype == np.int64
+    assert np.array_equal(y, conv_loop(x, W, b, mode))
+
+def test_conv_exact_beyond_float():
+    # Products too large for a float64 GEMM fall back to int64
+    rng = np.random.RandomState(0)
+    x = rng.randint(-2**40, 2**40, (5, 5, 3), dtype=np.int64)
+    W = rng.randint(-2**20, 2**20, (3, 3, 3, 2), dtype=np.int64)
+    b = np.zeros(2, dtype=np.int64)
+    assert np.array_equal(conv(x, W, b), conv_loop(x, W, b, "same"))
+
+def winograd_loop(x, W, b):
+    # One 4x4 tile and one (c, k) pair at a time, like the original
+    # per-model reference
+    B_T, G, A_T = WINOGRAD_B_T, WINOGRAD_G, WINOGRAD_A_T
+    H, Wd, C = x.shape
+    K = W.shape[3]
+    xp = np.pad(x, ((1, H % 2 + 1), (1, Wd % 2 + 1), (0, 0)), 'constant')
+    y = np.zeros((xp.shape[0] - 2, xp.shape[1] - 2, K), dtype=np.int64)
+    for i in range(0, H, 2):
+        for j in range(0, Wd, 2):
+            for k in range(K):
+                M = np.zeros((4, 4), dtype=np.int64)
+                for c in range(C):
+                    U = (128*G.dot(W[:, :, c, k]).dot(G.T)).astype(np.int64)
+                    V = B_T.dot(xp[i:i+4, j:j+4, c]).dot(B_T.T)
+                    M += U*V
+                y[i:i+2, j:j+2, k] = A_T.dot(M).dot(A_T.T)//128 + b[k]
+    return y[:H, :Wd]
+
+@pytest.mark.parametrize("image_size", [(4, 4), (2, 2), (5, 7), (8, 6)])
+def test_winograd_conv(image_size):
+    rng = np.random.RandomState(0)
+    x = rng.randint(-30, 30, image_size + (4,))
+    W = rng.randint(-30, 30, (3, 3, 4, 8))
+    b = rng.randint(-30, 30, 8)
+    y, U, V, M = winograd_conv(x, W, b)
+    num_tiles = -(-image_size[0]//2)*-(-image_size[1]//2)
+    assert U.shape == (4, 4, 4, 8)
+    assert V.shape == (4, 4, 4, num_tiles)
+    assert M.shape == (4, 4, 8, num_tiles)
+    assert np.array_equal(y, winograd_loop(x, W, b))
+    # The scale is removed after the output transform, which is exact for
+    # F(2x2, 3x3)
+    assert np.array_equal(y, conv(x, W, b))
+
+@pytest.mark.parametrize("image_size", [(6, 6), (7, 5), (4, 4)])
+def test_winograd_conv_valid(image_size):
+    rng = np.random.RandomState(0)
+    x = rng.randint(-30, 30, image_size + (4,))
+    W = rng.randint(-30, 30, (3, 3, 4, 8))
+    b = rng.randint(-30, 30, 8)
+    y, U, V, M = winograd_conv(x, W, b, mode="valid")
+    ref = conv(x, W, b, "valid")
+    assert y.shape == ref.shape
+    num_tiles = -(-ref.shape[0]//2)*-(-ref.shape[1]//2)
+    assert V.shape == (4, 4, 4, num_tiles)
+    assert np.array_equal(y, ref)
+    with pytest.raises(ValueError):
+        winograd_conv(x, W, b, mode="full")
+
+@pytest.mark.parametrize("mode", ["same", "valid"])
+@pytest.mark.parametrize("m, frac_bits, tol", [(4, 7, 400), (4, 16, 2),
+                                               (6, 20, 100)])
+def test_winograd_conv_large_tiles(m, frac_bits, tol, mode):
+    # Larger tiles need more fraction bits in the transformed weights
+    rng = np.random.RandomState(0)
+    x = rng.randint(-30, 30, (9, 11, 4))
+    W = rng.randint(-30, 30, (3, 3, 4, 8))
+    b = rng.randint(-30, 30, 8)
+    y, U, V, M = winograd_conv(x, W, b, frac_bits, mode, m)
+    ref = conv(x, W, b, mode)
+    assert y.shape == ref.shape
+    assert U.shape == (m + 2, m + 2, 4, 8)
+    assert np.abs(y - ref).max() <= tol
+
+def test_precision_report():
+    from nnsim.reference import precision_report
+    from nnsim.fixed import Precision
+    rng = np.random.RandomState(0)
+    x = rng.randint(-128, 128, (8, 8, 4))
+    W = rng.randint(-128, 128, (3, 3, 4, 2))
+    b = rng.randint(-128, 128, 2)
+    report = precision_report(x, W, b, [ Precision(), Precision(psum=40),
+        Precision(psum=20) ], verbose=False)
+    # unbounded and wide enough datapaths are exact, a narrow psum is not
+    assert report[0][1]['max_abs'] == 0
+    assert report[1][1]['sqnr_db'] == float('inf')
+    assert report[2][1]['max_abs'] > 0
@@ -17,3 +17,13 @@ class RegTB(Module):
 def test_reg_rd_wr():
     reg_tb = RegTB()
     sim.run_tb(reg_tb, 10, True)
+
+def test_reg_dirty_list():
+    reg_tb = RegTB()
+    simulator = sim.Simulator(reg_tb, False, compiled=True)
+    simulator.reset()
+    simulator.__tick__()
+    assert simulator.dirty_list == [reg_tb.ra, reg_tb.rb]
+    simulator.__ntick__()
+    assert simulator.dirty_list == []
+    assert reg_tb.ra.rd() == 1 and reg_tb.rb.rd() == 10
@@ -0,0 +1,74 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from nnsim.results import ResultStore
+from nnsim.sweep import grid, sweep
+
+def test_result_store(tmp_path):
+    store = ResultStore(str(tmp_path))
+    store.append([
+        {'model' : 'a', 'cycles' : 10, '/tb/chip/pe_mac' : 4},
+        {'model' : 'b', 'cycles' : 20, '/tb/chip/pe_mac' : 8},
+    ])
+    store.append([
+        {'model' : 'a', 'cycles' : 30, 'result' : None, '/tb/size' : (2, 4)},
+    ])
+    assert len(store.shards()) == 2
+    assert len(store) == 3
+    assert store.columns() == ['model', 'cycles', '/tb/chip/pe_mac',
+            'result', '/tb/size']
+
+    rows = store.query(['cycles', '/tb/chip/pe_mac'], where={'model' : 'a'})
+    assert list(rows['cycles']) == [10, 30]
+    assert rows['/tb/chip/pe_mac'][0] == 4
+    assert np.isnan(rows['/tb/chip/pe_mac'][1])
+
+    rows = store.query()
+    assert list(rows['model']) == ['a', 'b', 'a']
+    # Tuples come back as rows of a 2-D column
+    assert rows['/tb/size'].shape == (3, 2)
+    assert np.isnan(rows['/tb/size'][:2]).all()
+    assert list(rows['/tb/size'][2]) == [2, 4]
+    # A column with no values at all has no type to go by
+    assert np.isnan(rows['result']).all()
+
+    rows = store.query(['cycles'], where={'model' : 'c'})
+    assert len(rows['cycles']) == 0
+
+def test_tuple_columns(tmp_path):
+    store = ResultStore(str(tmp_path))
+    store.append([{'image_size' : (4, 4), 'cycles' : 1},
+        {'image_size' : (4, 6), 'cycles' : 2}])
+    rows = store.query(['cycles', 'image_size'], where={'image_size' : (4, 6)})
+    assert list(rows['cycles']) == [2]
+    assert tuple(rows['image_size'][0]) == (4, 6)
+
+def append_rows(path, worker):
+    store = ResultStore(path)
+    for i in range(5):
+        store.append([{'worker' : worker, 'i' : i}])
+
+def test_concurrent_append(tmp_path):
+    # Appenders racing for the same shard index must not overwrite each
+    # other's shards
+    with ProcessPoolExecutor(4) as executor:
+        for f in [ executor.submit(append_rows, str(tmp_path), worker)
+                   for worker in range(4) ]:
+            f.result()
+    store = ResultStore(str(tmp_path))
+    assert len(store.shards()) == 20
+    rows = store.query()
+    assert sorted(zip(rows['worker'], rows['i'])) == \
+            [ (w, i) for w in range(4) for i in range(5) ]
+    # and no temporary files are left behind
+    assert all(p.name.startswith('shard-') for p in tmp_path.iterdir())
+
+def test_sweep_to_store(tmp_path):
+    store = ResultStore(str(tmp_path))
+    rows = sweep(['ws_2d'], grid(out_chn=[4, 8, 16]), max_workers=2,
+            store=store, shard_size=2)
+    assert len(store.shards()) == 2
+    stored = store.query(['out_chn', 'cycles'])
+    assert sorted(stored['out_chn']) == [4, 8, 16]
+    for row in rows:
+        idx = list(stored['out_chn']).index(row['out_chn'])
+        assert stored['cycles'][idx] == row['cycles']
@@ -0,0 +1,130 @@
+import pytest
+import numpy as np
+from nnsim.module import Module, ModuleList
+from nnsim.reg import Reg
+from nnsim.channel import Channel
+import nnsim.simulator as sim
+from nnsim.results import collect_stats
+from models.ws_2d.tb import WSArchTB
+
+class Producer(Module):
+    def instantiate(self, chn, limit=None):
+        self.chn = chn
+        self.limit = limit
+        self.count = Reg(0)
+
+    def tick(self):
+        if self.limit is not None and self.count.rd() == self.limit:
+            return
+        if self.chn.vacancy():
+            self.chn.push(self.count.rd())
+            self.count.wr(self.count.rd() + 1)
+
+class Consumer(Module):
+    def instantiate(self, chn, trace):
+        self.chn = chn
+        self.trace = trace
+
+    def tick(self):
+        if self.chn.valid() and (len(self.trace) % 3 != 2):
+            self.trace.append(self.chn.pop())
+        else:
+            self.trace.append(None)
+
+class PipeTB(Module):
+    def instantiate(self, trace):
+        self.chns = ModuleList()
+        self.producers = ModuleList()
+        self.consumers = ModuleList()
+        for i in range(4):
+            self.chns.append(Channel(2))
+            self.producers.append(Producer(self.chns[i]))
+            self.consumers.append(Consumer(self.chns[i], trace))
+
+def run_pipe(compiled):
+    trace = []
+    simulator = sim.Simulator(PipeTB(trace), False, compiled)
+    simulator.reset()
+    simulator.run(50)
+    return simulator, trace
+
+def test_compiled_matches_recursive():
+    _, ref_trace = run_pipe(False)
+    _, trace = run_pipe(True)
+    assert trace == ref_trace
+
+def test_compiled_schedule_skips_leaves():
+    simulator, _ = run_pipe(True)
+    # Only producers and consumers tick; Regs commit once despite being
+    # reachable through both the channel list and every producer/consumer
+    assert len(simulator.tick_list) == 8
+    assert len(simulator.state_list) == 4*2 + 4
+    assert len(simulator.ntick_list) == 0
+
+class Drain(Module):
+    def instantiate(self, chn, trace):
+        self.chn = chn
+        self.trace = trace
+        self.slow = Reg(False)
+
+    def tick(self):
+        # Pop every other cycle so the channel fills up and stalls producers
+        self.slow.wr(not self.slow.rd())
+        if self.chn.valid() and self.slow.rd():
+            self.trace.append(self.chn.pop())
+
+class BurstTB(Module):
+    def instantiate(self, trace, drains=True):
+        self.chns = ModuleList()
+        self.producers = ModuleList()
+        self.drains = ModuleList()
+        for i in range(4):
+            self.chns.append(Channel(2))
+            self.producers.append(Producer(self.chns[i], 3*i))
+            if drains:
+                self.drains.append(Drain(self.chns[i], trace))
+
+def run_burst(num_ticks, **kwargs):
+    trace = []
+    simulator = sim.Simulator(BurstTB(trace), False, **kwargs)
+    simulator.reset()
+    simulator.run(num_ticks)
+    return simulator, trace
+
+def test_event_driven_matches_recursive():
+    ref_sim, ref_trace = run_burst(100)
+    simulator, trace = run_burst(100, event_driven=True)
+    assert trace == ref_trace
+    assert simulator.clk_ticks == ref_sim.clk_ticks == 100
+
+def test_event_driven_idle():
+    # Drains toggle a Reg forever, so the design never goes idle
+    simulator, _ = run_burst(100, event_driven=True)
+    assert len(simulator.active) == 4
+
+    # Producers alone stop once their limit is reached
+    tb = BurstTB([], drains=False)
+    simulator = sim.Simulator(tb, False, event_driven=True)
+    simulator.reset()
+    simulator.run(1000)
+    assert simulator.clk_ticks == 1000
+    assert not simulator.active
+    for i in range(4):
+        assert tb.producers[i].count.rd() == min(3*i, 2)
+
+def run_ws_2d(**kwargs):
+    np.random.seed(0)
+    tb = WSArchTB(out_chn=16)
+    simulator = sim.Simulator(tb, False, **kwargs)
+    simulator.reset()
+    simulator.run(5000)
+    tb.finalize_stats()
+    return simulator, collect_stats(tb)
+
+def test_event_driven_ws_2d():
+    # A whole model gives the same cycles and stats either way
+    ref_sim, ref_stats = run_ws_2d(compiled=True)
+    simulator, stats = run_ws_2d(event_driven=True)
+    assert ref_sim.finish_msg == simulator.finish_msg == "Success"
+    assert simulator.clk_ticks == ref_sim.clk_ticks
+    assert stats == ref_stats
@@ -0,0 +1,45 @@
+import io
+from nnsim.sweep import grid, sweep, run_point, write_csv
+
+def test_grid():
+    points = grid(in_chn=[4, 8], out_chn=[8, 16], chn_per_word=[4])
+    assert len(points) == 4
+    assert points[0] == {'chn_per_word' : 4, 'in_chn' : 4, 'out_chn' : 8}
+    assert points[-1] == {'chn_per_word' : 4, 'in_chn' : 8, 'out_chn' : 16}
+
+def test_sweep_ws_2d():
+    rows = sweep(['ws_2d'], grid(out_chn=[4, 8]), max_workers=2)
+    assert [ row['out_chn'] for row in rows ] == [4, 8]
+    assert [ row['cycles'] for row in rows ] == [188, 351]
+    for row in rows:
+        assert row['model'] == 'ws_2d'
+        assert row['result'] == 'Success'
+        assert row['/tb/chip/pe_mac'] == 16*9*4*row['out_chn']
+
+    f = io.StringIO()
+    write_csv(rows, f)
+    lines = f.getvalue().splitlines()
+    assert len(lines) == 3
+    assert lines[0].startswith('model,out_chn,cycles,result,')
+
+def test_run_point_error():
+    row = run_point('ws_2d', {'num_banks' : 2})
+    assert row['result'].startswith('TypeError')
+    assert 'cycles' not in row
+
+def test_run_point_unsupported_shape():
+    # Shapes the winograd and no_pad models cannot run are rejected up
+    # front instead of hanging or failing halfway through
+    for model, params in (('ws_2d_winograd_off', {'in_chn' : 8}),
+            ('ws_2d_winograd_post_on', {'image_size' : (6, 6)}),
+            ('ws_2d_winograd_on_chip', {'out_chn' : 16}),
+            ('ws_2d_no_pad', {'chn_per_word' : 2})):
+        row = run_point(model, params)
+        assert row['result'].startswith('ValueError')
+    row = run_point('ws_2d_winograd_on_chip', {'image_size' : (6, 6)})
+    assert row['result'] == 'Success'
+
+def test_run_point_unfinished():
+    row = run_point('ws_2d', {}, nticks=100)
+    assert row['cycles'] == 100
+    assert row['result'] == 'Unfinished after 100 cycles'
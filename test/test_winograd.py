@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from nnsim.winograd import winograd_matrices, weight_transform, \
+        transform_schedule, default_frac_bits, FRAC_BITS
+from nnsim.reference import winograd_error
+
+def test_f2x2_matches_lavin_gray():
+    B_T, G, A_T = winograd_matrices(2)
+    assert np.array_equal(B_T, [ [1, 0, -1, 0], [0, 1, 1, 0],
+                                 [0, -1, 1, 0], [0, 1, 0, -1] ])
+    assert np.array_equal(G, [ [1, 0, 0], [0.5, 0.5, 0.5],
+                               [0.5, -0.5, 0.5], [0, 0, 1] ])
+    assert np.array_equal(A_T, [ [1, 1, 1, 0], [0, 1, -1, -1] ])
+    # The shifts of the original PreTransformWeights
+    G_int, num, den = weight_transform(2)
+    assert np.array_equal(num, [ [128, 64, 64, 128], [64, 32, 32, 64],
+                                 [64, 32, 32, 64], [128, 64, 64, 128] ])
+    assert np.all(den == 1)
+
+@pytest.mark.parametrize("m", [2, 3, 4, 6])
+def test_matrices_compute_correlation(m):
+    rng = np.random.RandomState(m)
+    B_T, G, A_T = winograd_matrices(m)
+    n = m + 2
+    assert B_T.shape == (n, n) and G.shape == (n, 3) and A_T.shape == (m, n)
+    d = rng.normal(size=(n, n))
+    g = rng.normal(size=(3, 3))
+    y = A_T.dot((G.dot(g).dot(G.T))*(B_T.dot(d).dot(B_T.T))).dot(A_T.T)
+    ref = [ [ np.sum(d[i:i+3, j:j+3]*g) for j in range(m) ]
+            for i in range(m) ]
+    assert np.allclose(y, ref)
+
+def test_transform_schedule():
+    B_T, _, A_T = winograd_matrices(2)
+    terms, final = transform_schedule(B_T)
+    assert sum(len(t) for t in terms) == 64
+    # v00 = D00 - D02 - D20 + D22
+    assert [ (e, c) for e, t in enumerate(terms) for o, c in t if o == 0 ] \
+            == [ (0, 1), (2, -1), (8, -1), (10, 1) ]
+    assert final[:6] == [10, 10, 10, 11, 10, 10]
+    terms, final = transform_schedule(A_T)
+    assert len(terms) == 16 and final == [10, 11, 14, 15]
+
+@pytest.mark.parametrize("m", [2, 3, 4, 6])
+def test_default_frac_bits(m):
+    # The default fraction bits keep every tile size accurate, 7 bits do
+    # not for F(6x6)
+    rng = np.random.RandomState(0)
+    x = rng.normal(0, 10, (8, 8, 4)).astype(np.int64)
+    W = rng.normal(0, 10, (3, 3, 4, 8)).astype(np.int64)
+    b = rng.normal(0, 10, 8).astype(np.int64)
+    err = winograd_error(x, W, b, default_frac_bits(m), m=m)
+    assert err['max_abs'] <= 2 and err['sqnr_db'] > 50
+    if m == 6:
+        assert winograd_error(x, W, b, FRAC_BITS, m=m)['sqnr_db'] < 0
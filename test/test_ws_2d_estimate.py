@@ -0,0 +1,31 @@
+import pytest
+from models.ws_2d.estimate import estimate, validate, cycles_to_us
+
+@pytest.mark.parametrize("image_size, filter_size, in_chn, out_chn, chn_per_word", [
+    ((4, 4), (3, 3), 4, 8, 4),
+    ((3, 5), (1, 1), 4, 4, 4),
+    ((5, 5), (3, 3), 8, 8, 4),
+    ((2, 2), (5, 5), 2, 8, 2),
+    # Shapes where the psum round trip, the weight stream or a full PE
+    # channel bounds the iterations
+    ((4, 4), (3, 3), 16, 4, 4),
+    ((7, 3), (1, 1), 8, 4, 4),
+    ((2, 2), (3, 3), 8, 16, 4),
+    ((1, 1), (5, 5), 2, 2, 2),
+    ((6, 6), (1, 1), 16, 16, 4),
+    ((8, 8), (3, 3), 2, 4, 2),
+    ((1, 1), (7, 7), 8, 2, 2),
+])
+def test_estimate_matches_simulation(image_size, filter_size, in_chn,
+        out_chn, chn_per_word):
+    layer = (image_size, filter_size, in_chn, out_chn, out_chn, in_chn,
+            chn_per_word)
+    assert estimate(*layer) == validate(*layer)
+
+def test_cycles_to_us():
+    assert cycles_to_us(400) == 2.0
+    assert cycles_to_us(400, clock_mhz=100) == 4.0
+
+def test_estimate_rejects_multi_pass():
+    with pytest.raises(ValueError):
+        estimate((4, 4), (3, 3), 8, 16, 8, 4, 4)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from nnsim.reference import conv
+from models.ws_2d.network import Network, plan_passes, channel_slice, relu
+
+def test_plan_passes():
+    assert plan_passes(4, 8, 8, 4) == [ (0, 0) ]
+    assert plan_passes(8, 16, 8, 4) == [ (0, 0), (0, 4), (8, 0), (8, 4) ]
+    assert plan_passes(6, 12, 8, 4) == [ (0, 0), (0, 4), (8, 0), (8, 4) ]
+
+def test_channel_slice_pads():
+    x = np.arange(12).reshape(2, 6)
+    np.testing.assert_array_equal(channel_slice(x, 1, 4, 4),
+            [ [4, 5, 0, 0], [10, 11, 0, 0] ])
+
+def test_network(capsys):
+    rng = np.random.RandomState(0)
+    ifmap = rng.randint(-10, 10, (4, 4, 4))
+    layers = [ ('conv1', rng.randint(-10, 10, (3, 3, 4, 8)),
+                rng.randint(-10, 10, 8)),
+               ('conv2', rng.randint(-10, 10, (3, 3, 8, 6)),
+                rng.randint(-10, 10, 6)) ]
+    network = Network(arr_x=8, arr_y=4, chn_per_word=4)
+    activation = lambda ofmap: relu(ofmap, 4)
+    rows = network.run(ifmap, layers, activation, nticks=20000)
+
+    assert [ row['layer'] for row in rows ] == [ 'conv1', 'conv2', 'total' ]
+    assert [ row['passes'] for row in rows[:2] ] == [ 1, 2 ]
+    for row in rows:
+        assert row['result'] == "Success"
+    # Every pass has the shape of the single-layer testbench
+    assert [ row['cycles'] for row in rows ] == [ 351, 702, 1053 ]
+    assert rows[0]['total_energy'] + rows[1]['total_energy'] == \
+            pytest.approx(rows[2]['total_energy'])
+
+    # The chained ofmaps match the reference network
+    expected = activation(conv(ifmap, *layers[0][1:]))
+    ofmap, _, result = network.run_layer(expected, *layers[1][1:])
+    assert result == "Success"
+    np.testing.assert_array_equal(ofmap, conv(expected, *layers[1][1:]))
+    assert "Success" in capsys.readouterr().out
+
+def test_channel_mismatch():
+    network = Network()
+    with pytest.raises(ValueError):
+        network.run(np.zeros((4, 4, 4), dtype=np.int64),
+                [ ('conv1', np.zeros((3, 3, 8, 8), dtype=np.int64),
+                   np.zeros(8, dtype=np.int64)) ])
+
+def test_ifmap_too_large():
+    # The GLBs are sized for the image_size given to the Network
+    network = Network(image_size=(4, 4))
+    with pytest.raises(ValueError):
+        network.run(np.zeros((6, 6, 4), dtype=np.int64),
+                [ ('conv1', np.zeros((3, 3, 4, 8), dtype=np.int64),
+                   np.zeros(8, dtype=np.int64)) ])
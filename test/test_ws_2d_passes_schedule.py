@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from nnsim.simulator import Simulator
+from nnsim.cache import run_tb_cached, collect_stats
+from models.ws_2d_passes.schedule import plan_passes, dram_traffic, schedule
+from models.ws_2d_passes.tb import WSArchTB
+
+def test_plan_passes():
+    assert plan_passes(8, 16, 8, 4, 'output_outer') == \
+            [ (0, 0), (0, 4), (8, 0), (8, 4) ]
+    assert plan_passes(8, 16, 8, 4, 'input_outer') == \
+            [ (0, 0), (8, 0), (0, 4), (8, 4) ]
+    # Partial groups are padded, not dropped
+    assert len(plan_passes(6, 10, 8, 4)) == 4
+    with pytest.raises(ValueError):
+        plan_passes(8, 16, 8, 4, 'diagonal')
+
+def test_schedule():
+    passes, traffic = schedule((4, 4), (3, 3), 16, 16, 8, 4, 4)
+    assert passes == plan_passes(16, 16, 8, 4, 'output_outer')
+    assert traffic['psum_spill_wr'] == 3*2*16*8
+    assert traffic['ifmap_rd'] == 2*16*16
+    passes, _ = schedule((4, 4), (3, 3), 16, 16, 8, 4, 4, 'input_outer')
+    assert passes == plan_passes(16, 16, 8, 4, 'input_outer')
+    with pytest.raises(ValueError):
+        schedule((4, 4), (3, 3), 16, 16, 6, 4, 4)
+
+@pytest.mark.parametrize("params", [{}, { 'in_chn' : 12, 'out_chn' : 20,
+    'arr_x' : 8, 'arr_y' : 4, 'order' : 'output_outer' }, { 'in_chn' : 12,
+    'out_chn' : 20, 'arr_x' : 8, 'arr_y' : 4, 'order' : 'input_outer' }])
+def test_simulated_traffic(params):
+    # The TB's prediction is the traffic the datapath really moves
+    np.random.seed(0)
+    tb = WSArchTB(**params)
+    sim = Simulator(tb, False, True)
+    sim.reset()
+    sim.run(20000)
+    tb.finalize_stats()
+    assert sim.finish_msg == "Success"
+    stats = collect_stats(tb)
+    assert stats['/tb/chip/dram_rd'] == tb.traffic['dram_rd']
+    assert stats['/tb/chip/dram_wr'] == tb.traffic['dram_wr']
+    assert tb.traffic == dram_traffic(tb.image_size, tb.filter_size,
+            tb.in_chn, tb.out_chn, tb.arr_x, tb.arr_y)
+
+@pytest.mark.parametrize("dram", [None, { 'bandwidth' : 8 }])
+def test_prefetch(dram):
+    # Double buffering moves the same data in fewer cycles. Without a spill
+    # to wait for between two passes, input_outer hides most of its loads,
+    # also behind a bandwidth bound DRAM. The GLBs hold two regions, so the
+    # same accesses cost more energy.
+    overlap = {}
+    for order in ('output_outer', 'input_outer'):
+        params = { 'in_chn' : 12, 'out_chn' : 20, 'arr_x' : 8, 'arr_y' : 4,
+                   'order' : order, 'dram' : dram }
+        base = run_tb_cached(None, WSArchTB, params, nticks=20000)
+        params['prefetch'] = True
+        result = run_tb_cached(None, WSArchTB, params, nticks=20000)
+        assert result['finish_msg'] == "Success"
+        assert result['clk_ticks'] < base['clk_ticks']
+        for key in ('/tb/chip/dram_rd', '/tb/chip/dram_wr', '/tb/glb_mem_acc'):
+            assert result['stats'][key] == base['stats'][key]
+        assert result['stats']['/tb/glb_energy'] > \
+                base['stats']['/tb/glb_energy']
+        overlap[order] = result['stats']['/tb/prefetch_overlap']
+    assert overlap['output_outer'] > 0
+    assert overlap['input_outer'] > overlap['output_outer']
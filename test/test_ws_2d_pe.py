@@ -0,0 +1,25 @@
+import numpy as np
+from nnsim.simulator import Simulator
+from nnsim.cache import collect_stats
+from models.ws_2d.tb import WSArchTB
+
+def run(batched_pe, **params):
+    np.random.seed(0)
+    tb = WSArchTB(batched_pe=batched_pe, **params)
+    sim = Simulator(tb, False, True)
+    sim.reset()
+    sim.run(5000)
+    tb.finalize_stats()
+    return sim, tb
+
+def test_batched_pe_array():
+    # The batched array is cycle-equivalent to one PE module per location
+    for params in ({}, { 'image_size' : (5, 3), 'in_chn' : 8,
+            'out_chn' : 4 }):
+        sim, tb = run(False, **params)
+        batched_sim, batched_tb = run(True, **params)
+        assert sim.finish_msg == batched_sim.finish_msg == "Success"
+        assert sim.clk_ticks == batched_sim.clk_ticks
+        np.testing.assert_array_equal(tb.stimulus.deserializer.ofmap,
+                batched_tb.stimulus.deserializer.ofmap)
+        assert collect_stats(tb) == collect_stats(batched_tb)
@@ -0,0 +1,41 @@
+import numpy as np
+from models.ws_2d.serdes import input_stream
+
+def word_list(ifmap, weights, bias, arr_x, arr_y, chn_per_word):
+    # Word order of the original element-by-element serializer
+    in_sets = arr_y//chn_per_word
+    out_sets = arr_x//chn_per_word
+    words = []
+    for fmap_idx in range(ifmap.shape[0]*ifmap.shape[1]):
+        x = fmap_idx % ifmap.shape[0]
+        y = fmap_idx // ifmap.shape[0]
+        for s in range(in_sets + out_sets):
+            if s < in_sets:
+                words.append([ ifmap[x, y, c] for c in
+                    range(s*chn_per_word, (s + 1)*chn_per_word) ])
+            else:
+                words.append([ bias[c] for c in range((s - in_sets)*chn_per_word,
+                    (s - in_sets + 1)*chn_per_word) ])
+    for iteration in range(weights.shape[0]*weights.shape[1]):
+        f_x = iteration % weights.shape[0]
+        f_y = iteration // weights.shape[0]
+        for k in range(arr_x):
+            for s in range(in_sets):
+                words.append([ weights[f_x, f_y, c, k] for c in
+                    range(s*chn_per_word, (s + 1)*chn_per_word) ])
+    return words
+
+def test_input_stream_order(tmp_path):
+    rng = np.random.RandomState(0)
+    ifmap = rng.randint(-50, 50, (3, 5, 8))
+    weights = rng.randint(-50, 50, (3, 2, 8, 4))
+    bias = rng.randint(-50, 50, 4)
+    ref = word_list(ifmap, weights, bias, 4, 8, 2)
+    words = list(input_stream(ifmap, weights, bias, 4, 8, 2))
+    assert [ list(w) for w in words ] == ref
+
+    # Memory-mapped tensors stream the same words
+    np.save(str(tmp_path / 'ifmap.npy'), ifmap)
+    ifmap = np.load(str(tmp_path / 'ifmap.npy'), mmap_mode='r')
+    words = list(input_stream(ifmap, weights, bias, 4, 8, 2))
+    assert [ list(w) for w in words ] == ref
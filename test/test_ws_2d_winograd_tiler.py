@@ -0,0 +1,98 @@
+import pytest
+
+from nnsim.cache import run_tb_cached
+from models.ws_2d_winograd_on_chip.tiler import tile_counts, tile_groups, \
+        tile_routing
+from nnsim.fixed import Precision
+from models.ws_2d_winograd_on_chip.tb import WSArchTB
+from models.ws_2d_winograd_post_on.tb import WSArchTB as PostOnTB
+
+def test_4x4_routing():
+    # The table the tiler used to hard code for a padded 4x4 ifmap
+    groups = tile_groups((4, 4), 1)
+    assert groups == [ [ (0, 0), (0, 1), (1, 0), (1, 1) ] ]
+    pixels, tile_chn_list, zero = tile_routing((4, 4), groups[0], 1)
+    assert pixels == [ (x, y) for y in range(4) for x in range(4) ]
+    assert tile_chn_list[0] == [0]
+    assert tile_chn_list[5] == [0, 1, 2, 3]
+    assert tile_chn_list[15] == [3]
+    # Tile 0 starts one pixel above and left of the ifmap
+    assert [ e for e in range(16) if zero[0][e] ] == [0, 1, 2, 3, 4, 8, 12]
+
+def test_groups():
+    assert tile_counts((5, 7), 1) == (3, 4)
+    assert tile_counts((6, 6), 0) == (2, 2)
+    groups = tile_groups((5, 3), 1)
+    assert groups == [ [ (0, 0), (0, 1), (1, 0), (1, 1) ],
+                       [ (2, 0), (2, 1), None, None ] ]
+    # A slot past the edge reads nothing and is all padding
+    pixels, tile_chn_list, zero = tile_routing((5, 3), groups[1], 1)
+    assert len(pixels) == 2*3
+    assert all(zero[2]) and all(zero[3])
+    assert all(t in (0, 1) for chns in tile_chn_list for t in chns)
+
+@pytest.mark.parametrize("params", [{ 'image_size' : (5, 7) },
+    { 'image_size' : (6, 6), 'mode' : "valid" },
+    { 'image_size' : (6, 6), 'm' : 6 }])
+def test_simulate(params):
+    result = run_tb_cached(None, WSArchTB, params, nticks=5000)
+    assert result['finish_msg'] == "Success"
+
+@pytest.mark.parametrize("tb_class, stats", [
+    (WSArchTB, { 'clk_ticks' : 193,
+        '/tb/chip/post_tr_alu_comp' : 1792,
+        '/tb/chip/post_tr_rf_wr' : 1152,
+        '/tb/chip/pre_tr_weights_rf_rd' : 2720,
+        '/tb/chip/pre_tr_weights_rf_wr' : 2208,
+        # Pushed v's are charged to the right RF port, 1216/1312 in the
+        # original unit
+        '/tb/chip/pre_tr_ifmap_rf_rd' : 1264,
+        '/tb/chip/pre_tr_ifmap_rf_wr' : 1264,
+        '/tb/rf_mem_acc' : 11808, '/tb/rf_energy' : 11808,
+        '/tb/comp_energy' : 9472 }),
+    (PostOnTB, { 'clk_ticks' : 213,
+        '/tb/chip/post_tr_alu_comp' : 1792,
+        '/tb/chip/post_tr_ifmap_rf_wr' : 1152,
+        '/tb/rf_mem_acc' : 4352, '/tb/rf_energy' : 4352,
+        '/tb/comp_energy' : 5888 })])
+def test_f2x2_stats(tb_class, stats):
+    # The transform units are generated for any m, but F(2x2, 3x3) keeps
+    # the cycles and accounting of the original hand-written units (bar one
+    # fix)
+    result = run_tb_cached(None, tb_class, {}, nticks=5000)
+    assert result['finish_msg'] == "Success"
+    result['stats']['clk_ticks'] = result['clk_ticks']
+    for key, value in stats.items():
+        assert result['stats'][key] == value, key
+
+def test_larger_tiles():
+    # F(4x4, 3x3) tiles: 36 element tiles with stride 4
+    assert tile_counts((9, 7), 1, 4) == (3, 2)
+    pixels, tile_chn_list, zero = tile_routing((8, 8),
+            tile_groups((8, 8), 1, 4)[0], 1, 4)
+    assert len(pixels) == 64
+    assert len(zero[0]) == 36
+    assert tile_chn_list[pixels.index((3, 3))] == [0, 1, 2, 3]
+
+    # Same layer, fewer PE MACs per output for the larger tile
+    macs = {}
+    for m in (2, 4):
+        params = { 'image_size' : (8, 8), 'm' : m }
+        result = run_tb_cached(None, WSArchTB, params, nticks=20000)
+        assert result['finish_msg'] == "Success"
+        macs[m] = result['stats']['/tb/chip/pe_mac']
+    assert macs[2]*9 == macs[4]*16
+
+def test_precision():
+    # A narrower datapath still matches its own fixed-point reference and
+    # costs less compute and RF energy
+    narrow = Precision(ifmap=12, weight=12, psum=24, ofmap=16,
+            rounding='nearest')
+    energy = {}
+    for precision in (None, narrow):
+        params = { 'image_size' : (8, 8), 'precision' : precision }
+        result = run_tb_cached(None, WSArchTB, params, nticks=5000)
+        assert result['finish_msg'] == "Success"
+        energy[precision] = result['stats']['/tb/comp_energy'] + \
+                result['stats']['/tb/rf_energy']
+    assert energy[narrow] < energy[None]